@@ -0,0 +1,193 @@
+# The drop simulator has to rebuild its sampling structures every time it loads a table. AliasTables precomputes a
+# Walker/Vose alias table for the main and pre-roll drops of every table, so each roll can be drawn in constant time:
+# pick a slot uniformly, then keep it or take its alias depending on a second uniform draw.
+# The weights are integers out of a fixed total of 2^32, so every threshold fits in a 64 bit integer (a least common
+# denominator of the rarities can need more than 64 bits). The exact rarity of each slot is rounded to the total by
+# largest remainder, so the weights add up to exactly the total, the probability left over goes to a nothing slot
+# (always the last slot), and each slot keeps the slot if a uniform integer in [0, total) is below its threshold. The
+# exact rarities are kept next to the weights, and the float probability of each slot is included for consumers that
+# draw floats.
+import json
+import logging
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+
+SAMPLED_DROP_TYPES = {'': 'main', 'pre-roll': 'pre-roll'}  # drop type -> name of its alias table
+TOTAL = 2 ** 32  # the weights of an alias table add up to TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+class MixedRolls(ValueError):
+    # the rows of a drop type are not all rolled the same number of times, so they can not be drawn from one alias table
+    pass
+
+
+# build_alias_table builds a Vose alias table from integer weights. Returns the threshold and alias of every slot and
+# the total the thresholds are out of: slot i is kept if a uniform integer in [0, total) is below threshold[i], if not
+# alias[i] is taken instead
+def build_alias_table(weights):
+    n = len(weights)
+    total = sum(weights)
+    scaled = [weight * n for weight in weights]  # each slot holds total, out of total * n overall
+
+    threshold = [total] * n
+    alias = list(range(n))
+    small = [i for i in range(n) if scaled[i] < total]
+    large = [i for i in range(n) if scaled[i] >= total]
+
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        threshold[s] = scaled[s]
+        alias[s] = l
+        scaled[l] -= total - scaled[s]  # l fills the rest of slot s
+        if scaled[l] < total:
+            small.append(l)
+        else:
+            large.append(l)
+
+    return threshold, alias, total
+
+
+# scale_weights rounds exact probabilities to integer weights out of total. Each weight is rounded down and the units
+# lost to rounding go to the probabilities with the largest remainders, so probabilities adding up to 1 give weights
+# adding up to exactly the total, and no weight is off by more than one
+def scale_weights(probabilities, total=TOTAL):
+    scaled = [probability * total for probability in probabilities]
+    weights = [int(weight) for weight in scaled]  # exact fractions, rounded down
+    lost = int(sum(scaled)) - sum(weights)
+    by_remainder = sorted(range(len(scaled)), key=lambda i: scaled[i] - weights[i], reverse=True)
+    for i in by_remainder[:lost]:
+        weights[i] += 1
+    return weights
+
+
+# sampling_table builds the alias table of the rows of one drop type of a table. The rows need exact rarities in the
+# rarity-numerator and rarity-denominator columns, and the same roll count. Returns None if no row has an exact rarity,
+# raises MixedRolls if the rows are not all rolled the same number of times
+def sampling_table(table, positions):
+    rows = table.iloc[positions]
+    exact = rows['rarity-numerator'].notna() & rows['rarity-denominator'].notna()
+    positions = [position for position, is_exact in zip(positions, exact) if is_exact]
+    rows = rows[exact.to_numpy()]
+    if rows.empty:
+        return None
+
+    rolls = pd.Series(1, index=rows.index)
+    if 'rolls' in rows.columns:
+        rolls = rows['rolls'].fillna(1).astype(int)
+    if rolls.nunique() > 1:
+        usual = rolls.mode().iloc[0]
+        raise MixedRolls('rows rolled ' + ', '.join(str(r) for r in sorted(rolls.unique())) + ' times, not ' +
+                         str(usual) + ' times like the rest: ' + ', '.join(rows['name'][rolls != usual].astype(str)))
+
+    numerators = [int(numerator) for numerator in rows['rarity-numerator']]
+    denominators = [int(denominator) for denominator in rows['rarity-denominator']]
+    rarities = [Fraction(numerator, denominator) for numerator, denominator in zip(numerators, denominators)]
+
+    overfull = sum(rarities) > 1  # the rarities add up to more than 1, there is no room for a nothing slot
+    if overfull:
+        weights = scale_weights([rarity / sum(rarities) for rarity in rarities])
+        nothing = 0
+    else:
+        weights = scale_weights(rarities + [1 - sum(rarities)])
+        nothing = weights.pop()
+    threshold, alias, total = build_alias_table(weights if overfull else weights + [nothing])
+
+    return {
+        'rolls': int(rolls.iloc[0]),
+        'rows': positions,  # position of the row of each item slot in the data of the table
+        'ids': [int(item_id) for item_id in rows['id']],
+        'numerators': numerators,  # exact rarity of each item is numerator / denominator
+        'denominators': denominators,
+        'weights': weights,  # rarity of each item rounded to weight / total
+        'nothing': nothing,  # weight of the nothing slot, the last slot
+        'overfull': overfull,
+        'total': total,
+        'threshold': threshold,
+        'alias': alias,
+        'probability': [t / total for t in threshold],
+    }
+
+
+# sampling_tables builds the alias table of the main and pre-roll drops of a table, keyed by main and pre-roll
+def sampling_tables(table):
+    drop_types = table['drop-type'].fillna('').to_numpy()
+    tables = {}
+    for drop_type, name in SAMPLED_DROP_TYPES.items():
+        positions = [position for position, row_type in enumerate(drop_types) if row_type == drop_type]
+        if positions:
+            try:
+                alias_table = sampling_table(table, positions)
+            except MixedRolls as e:
+                logger.warning('no %s alias table: %s', name, e)
+                continue
+            if alias_table is not None:
+                tables[name] = alias_table
+    return tables
+
+
+# table_json_with_sampling returns the json of a table with its alias tables added under sampling. The alias tables of a
+# table with references to sub-tables are built from its flat table, SubTables.expand_table of it, and their rows are
+# positions in the flat table
+def table_json_with_sampling(table, flat=None):
+    data = json.loads(table.to_json(orient='table'))
+    data['sampling'] = sampling_tables(table if flat is None else flat)
+    return json.dumps(data)
+
+
+class AliasSampler:
+    # reference sampler for one alias table, draws slots in constant time per roll. Slot len(rows) is the nothing slot
+
+    def __init__(self, alias_table, seed=None):
+        self.threshold = np.array(alias_table['threshold'], dtype=np.int64)
+        self.alias = np.array(alias_table['alias'], dtype=np.int64)
+        self.total = alias_table['total']
+        self.rng = np.random.default_rng(seed)
+
+    # draw returns the slot of each of count rolls
+    def draw(self, count):
+        slots = self.rng.integers(len(self.threshold), size=count)
+        keep = self.rng.integers(self.total, size=count) < self.threshold[slots]
+        return np.where(keep, slots, self.alias[slots])
+
+
+# exact_probabilities returns the exact probability of every slot of an alias table as fractions, the nothing slot last
+# unless the table is overfull. The rarities of an overfull table are scaled to add up to 1
+def exact_probabilities(alias_table):
+    rarities = [Fraction(numerator, denominator)
+                for numerator, denominator in zip(alias_table['numerators'], alias_table['denominators'])]
+    if alias_table['overfull']:
+        return [rarity / sum(rarities) for rarity in rarities]
+    return rarities + [1 - sum(rarities)]
+
+
+# slot_probabilities returns the probability of every slot the way an alias table draws it, out of total * slots
+def slot_probabilities(alias_table):
+    slots = len(alias_table['threshold'])
+    kept = [Fraction(0)] * slots
+    for slot, (threshold, alias) in enumerate(zip(alias_table['threshold'], alias_table['alias'])):
+        kept[slot] += Fraction(threshold, alias_table['total'] * slots)
+        kept[alias] += Fraction(alias_table['total'] - threshold, alias_table['total'] * slots)
+    return kept
+
+
+# check_alias_table draws trials rolls from an alias table and compares the frequency of each slot with its exact
+# rarity. Returns a list of (slot, expected, sampled) and the largest difference in standard errors
+def check_alias_table(alias_table, trials=1000000, seed=None):
+    probabilities = exact_probabilities(alias_table)
+
+    counts = np.bincount(AliasSampler(alias_table, seed).draw(trials), minlength=len(probabilities))
+    comparison = []
+    worst = 0.0
+    for slot, probability in enumerate(probabilities):
+        expected = float(probability)
+        sampled = counts[slot] / trials
+        error = np.sqrt(expected * (1 - expected) / trials)
+        if error > 0:
+            worst = max(worst, abs(sampled - expected) / error)
+        comparison.append((slot, expected, sampled))
+    return comparison, worst
@@ -0,0 +1,249 @@
+# The builders in TableBuilder only cover the drop sources listed there. BestiaryCrawler builds a table for every
+# monster page on the wiki, listed from a wiki category or from a local file with one page per line, using the generic
+# monster builder and rules. Pages are built by a bounded pool of workers, and the outcome of every page is kept in a
+# checkpoint file, so a crawl of thousands of pages that is interrupted picks up where it stopped. A page that fails to
+# build is put in quarantine with its error instead of aborting the crawl, and is not tried again unless asked.
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import BuildReport
+import TableBuilder
+import WikiFetcher
+from DropTypeClassifier import get_rules
+from ItemResolver import get_resolver, items_snapshot_hash
+from PageCache import write_atomic
+from SubTables import prune_subtables
+
+CATEGORY = 'Monsters'
+OUTPUT_SUBDIR = 'monsters'  # crawled tables are written here inside the output directory
+CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crawl_checkpoint.json')
+
+SAVE_EVERY = 5.0  # most seconds between checkpoint writes
+REPORT_EVERY = 10.0  # most seconds between progress reports
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    # outcome of every page crawled so far:
+    # built: the table of the page was built, or was already up to date
+    # empty: the page has no drop tables
+    # quarantine: page -> error of the page that failed to build
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.saved = time.monotonic()
+
+        self.built = set()
+        self.empty = set()
+        self.quarantine = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.built = set(data.get('built', []))
+            self.empty = set(data.get('empty', []))
+            self.quarantine = data.get('quarantine', {})
+
+    # is_done returns true if a page does not have to be crawled again
+    def is_done(self, page, retry_quarantined=False):
+        with self.lock:
+            if page in self.built or page in self.empty:
+                return True
+            return page in self.quarantine and not retry_quarantined
+
+    # record stores the outcome of a page, the checkpoint is written to disk at most every SAVE_EVERY seconds
+    def record(self, page, outcome, error=None):
+        with self.lock:
+            self.built.discard(page)
+            self.empty.discard(page)
+            self.quarantine.pop(page, None)
+            if outcome == 'quarantine':
+                self.quarantine[page] = error
+            else:
+                getattr(self, outcome).add(page)
+            if time.monotonic() - self.saved >= SAVE_EVERY:
+                self.save()
+
+    # save writes the checkpoint to disk, must be called with the lock held. The build manifest and page cache are
+    # flushed first, so every page the checkpoint has as built is recorded in them too
+    def save(self):
+        TableBuilder.flush()
+        write_atomic(self.path, json.dumps({
+            'built': sorted(self.built),
+            'empty': sorted(self.empty),
+            'quarantine': dict(sorted(self.quarantine.items())),
+        }, indent=1))
+        self.saved = time.monotonic()
+
+    # flush writes the checkpoint to disk now
+    def flush(self):
+        with self.lock:
+            self.save()
+
+
+class Progress:
+    # counts the pages crawled by this run and reports the throughput at most every REPORT_EVERY seconds
+
+    def __init__(self, total):
+        self.total = total
+        self.counts = {'built': 0, 'empty': 0, 'quarantine': 0}
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+        self.reported = self.start
+
+    # done returns the number of pages crawled by this run
+    def done(self):
+        return sum(self.counts.values())
+
+    # pages_per_minute returns the throughput of this run so far
+    def pages_per_minute(self):
+        elapsed = time.monotonic() - self.start
+        return self.done() / elapsed * 60 if elapsed > 0 else 0.0
+
+    # update counts the outcome of a page and reports the progress if it is time to
+    def update(self, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+            if time.monotonic() - self.reported >= REPORT_EVERY or self.done() == self.total:
+                self.report()
+
+    # report logs the progress of the run, must be called with the lock held
+    def report(self):
+        self.reported = time.monotonic()
+        rate = self.pages_per_minute()
+        left = (self.total - self.done()) / rate if rate else float('inf')
+        logger.info('crawled %d/%d pages (%d built, %d empty, %d quarantined), %.1f pages/min, %.0f min left',
+                    self.done(), self.total, self.counts['built'], self.counts['empty'], self.counts['quarantine'],
+                    rate, left)
+
+
+# list_file_pages reads the pages to crawl from a file with one page per line, blank lines and lines starting with #
+# are ignored
+def list_file_pages(path):
+    with open(path, encoding='utf-8') as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+# file_name returns the name of the json file of a crawled page, inside the crawl subdirectory of the output directory
+def file_name(page):
+    return OUTPUT_SUBDIR + '/' + page.lower().replace(' ', '_').replace('/', '_')
+
+
+# crawl_page builds the table of one page, returns the outcome and the error if the page failed to build
+def crawl_page(page, force=False):
+    try:
+        TableBuilder.table_to_json(TableBuilder.build_monster_table, page, file_name(page), force=force)
+        return 'built', None
+    except Exception as e:
+        try:
+            if not TableBuilder.read_drop_tables(page):  # the page has no drops, that is not a failure
+                return 'empty', None
+        except Exception:
+            pass
+        return 'quarantine', type(e).__name__ + ': ' + str(e)
+
+
+# crawl builds the table of every page not already done in the checkpoint, with at most max_workers pages in flight
+def crawl(pages, checkpoint_path=CHECKPOINT_PATH, max_workers=None, force=False, retry_quarantined=False):
+    checkpoint = Checkpoint(checkpoint_path)
+    pages = [page for page in dict.fromkeys(pages) if not checkpoint.is_done(page, retry_quarantined)]
+    logger.info('%d pages to crawl', len(pages))
+    if not pages:
+        return checkpoint
+
+    # load everything the workers share before they start, so they do not race to load it
+    get_resolver()
+    items_snapshot_hash()
+    get_rules('monster')
+    TableBuilder.get_manifest()
+
+    max_workers = max_workers or WikiFetcher.settings['max_workers']
+    progress = Progress(len(pages))
+    remaining = iter(pages)
+    in_flight = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while True:
+                # keep the pool busy without queueing every page at once
+                while len(in_flight) < max_workers * 2:
+                    page = next(remaining, None)
+                    if page is None:
+                        break
+                    in_flight[pool.submit(crawl_page, page, force)] = page
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    page = in_flight.pop(future)
+                    outcome, error = future.result()
+                    if error is not None:
+                        logger.warning('quarantined %s: %s', page, error)
+                    checkpoint.record(page, outcome, error)
+                    progress.update(outcome)
+    except KeyboardInterrupt:
+        for future in in_flight:
+            future.cancel()
+        logger.warning('interrupted, run again to resume from %s', checkpoint_path)
+        raise
+    finally:
+        checkpoint.flush()
+    prune_subtables(TableBuilder.output_dir)
+    TableBuilder.export_tables()  # the bundle and the database hold the crawled tables too
+    return checkpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Builds the drop table of every monster page on the osrs wiki')
+    parser.add_argument('--category', default=CATEGORY, help='wiki category listing the pages to crawl')
+    parser.add_argument('--pages', default=None, help='file with one page per line to crawl instead of a category')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help='file the progress of the crawl is kept in')
+    parser.add_argument('--workers', type=int, default=WikiFetcher.settings['max_workers'],
+                        help='most pages crawled at once')
+    parser.add_argument('--retry-quarantined', action='store_true', help='crawl quarantined pages again')
+    parser.add_argument('--offline', action='store_true', help='crawl entirely from the page cache, no network')
+    parser.add_argument('--cache-dir', default=WikiFetcher.settings['cache_dir'], help='directory of the page cache')
+    parser.add_argument('--backend', choices=['html', 'wikitext'], default=TableBuilder.source_backend,
+                        help='read the drop tables from the rendered wiki pages or from their wikitext')
+    parser.add_argument('--output-dir', default=TableBuilder.output_dir,
+                        help='directory the ' + OUTPUT_SUBDIR + ' directory of json files is written to')
+    parser.add_argument('--force', action='store_true', help='build every table, even if its inputs did not change')
+    parser.add_argument('--bundle', action='store_true',
+                        help='also pack every table into a single memory mappable ' + TableBuilder.bundle_name +
+                             ' file')
+    parser.add_argument('--database', nargs='?', default=None, const='', metavar='PATH',
+                        help='also export every table into a SQLite database, drop_tables.sqlite next to this script '
+                             'if no path is given')
+    parser.add_argument('--log-level', choices=BuildReport.LOG_LEVELS, default='info', help='how much is logged')
+    parser.add_argument('--report', default=None,
+                        help='write a report of the time and counters of every page to this .json or .ndjson file')
+    args = parser.parse_args()
+
+    TableBuilder.source_backend = args.backend
+    TableBuilder.output_dir = args.output_dir
+    TableBuilder.bundle_tables = args.bundle
+    if args.database is not None:
+        from TableDatabase import DATABASE_PATH
+        TableBuilder.database_path = args.database or DATABASE_PATH
+    BuildReport.configure_logging(args.log_level)
+    report = BuildReport.configure(args.report)
+    WikiFetcher.configure(offline=args.offline, cache_dir=args.cache_dir, max_workers=args.workers)
+
+    pages = list_file_pages(args.pages) if args.pages else WikiFetcher.fetch_category(args.category)
+    try:
+        checkpoint = crawl(pages, args.checkpoint, args.workers, args.force, args.retry_quarantined)
+    finally:
+        report.write()
+    logger.info('%d built, %d empty, %d quarantined', len(checkpoint.built), len(checkpoint.empty),
+                len(checkpoint.quarantine))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# BuildManifest records the inputs each output file was built from: a hash of the wiki page, a hash of the osrsbox
+# items db and the version of the cleaning and classification rules. A table only has to be built again when one of
+# its inputs changed, so a rebuild where nothing changed skips every table and leaves the output files untouched.
+# The manifest is written to disk every SAVE_EVERY records and when it is flushed, not on every table. A table whose
+# record was not written yet, i.e., when the process is killed, is only built again on the next run.
+import hashlib
+import json
+import os
+import threading
+
+from PageCache import write_atomic
+
+SAVE_EVERY = 50  # records before the manifest is written to disk
+
+
+class BuildManifest:
+    # output files are recorded by their path relative to output_dir, or by their file name if output_dir is not given
+
+    def __init__(self, path, output_dir=None):
+        self.path = path
+        self.output_dir = output_dir
+        self.lock = threading.Lock()
+        self.unsaved = 0  # records not written to disk yet
+
+        self.outputs = {}  # output file name -> inputs it was built from
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.outputs = json.load(f)
+
+    # key returns the name an output file is recorded under
+    def key(self, output_path):
+        if self.output_dir is None:
+            return os.path.basename(output_path)
+        return os.path.relpath(output_path, self.output_dir).replace(os.sep, '/')
+
+    # is_current returns true if the output file exists and was built from exactly these inputs
+    def is_current(self, output_path, inputs):
+        with self.lock:
+            recorded = self.outputs.get(self.key(output_path))
+        return recorded == inputs and os.path.exists(output_path)
+
+    # record stores the inputs an output file was just built from, the manifest is written to disk every SAVE_EVERY
+    # records
+    def record(self, output_path, inputs):
+        with self.lock:
+            self.outputs[self.key(output_path)] = inputs
+            self.unsaved += 1
+            if self.unsaved >= SAVE_EVERY:
+                self.save()
+
+    # flush writes the manifest to disk now if it has records that are not written yet
+    def flush(self):
+        with self.lock:
+            if self.unsaved:
+                self.save()
+
+    # save writes the manifest to disk, must be called with the lock held
+    def save(self):
+        write_atomic(self.path, json.dumps(self.outputs, indent=1, sort_keys=True))
+        self.unsaved = 0
+
+
+# page_hash returns the sha256 of the html of a wiki page
+def page_hash(html):
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+# write_if_changed writes text or bytes to a file only if the file does not already hold exactly that, returns true if
+# the file was written
+def write_if_changed(path, data):
+    if os.path.exists(path):
+        if isinstance(data, bytes):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    return False
+        else:
+            with open(path, encoding='utf-8') as f:
+                if f.read() == data:
+                    return False
+    write_atomic(path, data)
+    return True
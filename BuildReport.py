@@ -0,0 +1,197 @@
+# BuildReport records where the time of a build goes. Stages (fetch, parse, clean, resolve, classify, serialize, ...)
+# are timed and counters (rows parsed, names resolved, bytes fetched, cache hits, ...) are counted for the drop source
+# being built by the current thread, or for the run itself outside of any drop source, i.e., while prefetching pages.
+# One drop source can also be profiled with cProfile and tracemalloc. The report is written as a single json file, or
+# as ndjson with a line for every drop source as soon as it is done, so a long crawl can be followed while it runs.
+import cProfile
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_TOP = 20  # allocation sites kept in the memory profile of a drop source
+
+LOG_LEVELS = ['debug', 'info', 'warning', 'error']
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+logger = logging.getLogger(__name__)
+
+_current = threading.local()  # .entry is the entry of the drop source being built by this thread
+
+
+class BuildReport:
+
+    def __init__(self, path=None, profile_source=None, profile_path=None):
+        self.path = path
+        self.ndjson = path is not None and path.endswith('.ndjson')
+        self.profile_source = profile_source  # drop source to profile, None for none
+        self.profile_path = profile_path or 'profile.prof'
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.start = time.perf_counter()
+
+        self.run = new_entry()  # everything outside of a drop source
+        self.sources = {}  # drop source -> entry
+        if self.ndjson:
+            open(path, 'w', encoding='utf-8').close()
+
+    # entry returns the entry things are recorded in by the current thread
+    def entry(self):
+        return getattr(_current, 'entry', None) or self.run
+
+    # add_time adds seconds to a stage
+    def add_time(self, stage, seconds):
+        entry = self.entry()
+        with self.lock:
+            entry['stages'][stage] = entry['stages'].get(stage, 0.0) + seconds
+
+    # count adds n to a counter
+    def count(self, counter, n=1):
+        entry = self.entry()
+        with self.lock:
+            entry['counters'][counter] = entry['counters'].get(counter, 0) + n
+
+    # set marks something about the drop source being built, i.e., that it was skipped
+    def set(self, key, value):
+        entry = self.entry()
+        with self.lock:
+            entry[key] = value
+
+    # finish records that a drop source is done, and writes its line if the report is ndjson
+    def finish(self, drop_source, entry):
+        counters = entry['counters']
+        if 'rows-parsed' in counters and 'rows-written' in counters:
+            counters['rows-dropped'] = counters['rows-parsed'] - counters['rows-written']
+        with self.lock:
+            self.sources[drop_source] = entry
+            if self.ndjson:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(dict({'event': 'source', 'source': drop_source}, **entry)) + '\n')
+
+    # totals returns every stage and counter summed over the run and every drop source
+    def totals(self):
+        totals = new_entry()
+        with self.lock:
+            for entry in [self.run] + list(self.sources.values()):
+                for kind in ('stages', 'counters'):
+                    for key, value in entry[kind].items():
+                        totals[kind][key] = totals[kind].get(key, 0) + value
+        del totals['seconds']
+        return totals
+
+    # summary returns the report of the whole run
+    def summary(self):
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.started)),
+            'seconds': time.perf_counter() - self.start,
+            'run': self.run,
+            'totals': self.totals(),
+        }
+
+    # write writes the report to its path, the lines of the drop sources are already written if it is ndjson
+    def write(self):
+        if self.path is None:
+            return
+        if self.ndjson:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(dict({'event': 'run'}, **self.summary())) + '\n')
+            return
+        report = self.summary()
+        with self.lock:
+            report['sources'] = self.sources
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+
+    # log_summary logs where the time of the run went and what was counted
+    def log_summary(self):
+        totals = self.totals()
+        with self.lock:
+            skipped = sum(1 for entry in self.sources.values() if entry.get('skipped'))
+            built = len(self.sources) - skipped
+        logger.info('%d tables built, %d skipped in %.2f seconds', built, skipped, time.perf_counter() - self.start)
+        for name, seconds in sorted(totals['stages'].items(), key=lambda stage_time: -stage_time[1]):
+            logger.info('  %s: %.3f seconds', name, seconds)
+        for name, value in sorted(totals['counters'].items()):
+            logger.info('  %s: %d', name, value)
+
+
+# new_entry returns an empty entry of the report
+def new_entry():
+    return {'seconds': 0.0, 'stages': {}, 'counters': {}}
+
+
+_report = BuildReport()
+
+
+# configure starts a new report, written to path, with profile_source profiled into profile_path
+def configure(path=None, profile_source=None, profile_path=None):
+    global _report
+    _report = BuildReport(path, profile_source, profile_path)
+    return _report
+
+
+# configure_logging sends the log of a run to stderr at the given level, one of LOG_LEVELS
+def configure_logging(level):
+    logging.basicConfig(level=level.upper(), format=LOG_FORMAT)
+
+
+# get_report returns the report of the current run
+def get_report():
+    return _report
+
+
+# stage times the code inside it as a stage of the drop source being built
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _report.add_time(name, time.perf_counter() - start)
+
+
+# count adds n to a counter of the drop source being built
+def count(counter, n=1):
+    _report.count(counter, n)
+
+
+# source records everything inside it under a drop source, and profiles it if it is the drop source to profile
+@contextmanager
+def source(drop_source):
+    report = _report
+    entry = new_entry()
+    previous = getattr(_current, 'entry', None)
+    _current.entry = entry
+
+    profiler = None
+    if drop_source == report.profile_source:
+        profiler = cProfile.Profile()
+        tracemalloc.start()
+        profiler.enable()
+
+    start = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        entry['seconds'] = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            entry['memory'] = memory_profile()
+            tracemalloc.stop()
+            profiler.dump_stats(report.profile_path)
+            entry['profile'] = report.profile_path
+        _current.entry = previous
+        report.finish(drop_source, entry)
+
+
+# memory_profile returns the peak traced memory and the lines that allocated the most memory still held
+def memory_profile():
+    current, peak = tracemalloc.get_traced_memory()
+    top = tracemalloc.take_snapshot().statistics('lineno')[:PROFILE_TOP]
+    return {
+        'current-bytes': current,
+        'peak-bytes': peak,
+        'top': [{'where': str(stat.traceback), 'bytes': stat.size, 'count': stat.count} for stat in top],
+    }
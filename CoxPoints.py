@@ -0,0 +1,115 @@
+# The quantity of every non unique cox drop and the chance of a unique both depend on the points of the raid, but the
+# cox table used to hard code the quantities of a 30k point raid. CoxPoints models them as functions of the points:
+# each non unique item is dropped once for every POINTS_PER_ITEM[item] points, up to the points cap of the non unique
+# loot, and every UNIQUE_POINTS points add 1% to the chance of a unique, up to the unique points cap. The model is
+# precomputed into a grid in GRID_STEP steps from 0 up to the cap, so any point total is served by an index into the
+# grid.
+import numpy as np
+
+DEFAULT_POINTS = 30000  # points of the quantities of the cox table
+LOOT_POINTS_CAP = 131071  # points past this do not add to the non unique loot
+UNIQUE_POINTS = 8676  # points per 1% chance of a unique
+UNIQUE_POINTS_CAP = 570000  # points past this do not add to the chance of a unique
+GRID_STEP = 1000
+
+# points per item of every non unique drop. These are fitted, not the per item values documented on the wiki: each is
+# the largest whole number that gives the quantity the table was built with at 30k points, so a 30k point table is
+# unchanged but other point totals can be off from the game, i.e., ranarr is likely 800 in game, not 789. The grid says
+# so in its points-per-item-fitted field
+POINTS_PER_ITEM = {
+    'Death rune': 36,
+    'Blood rune': 32,
+    'Soul rune': 20,
+    'Rune arrow': 14,
+    'Dragon arrow': 202,
+    'Grimy ranarr weed': 789,
+    'Grimy toadflax': 526,
+    'Grimy irit leaf': 162,
+    'Grimy avantoe': 326,
+    'Grimy kwuarm': 379,
+    'Grimy snapdragon': 1304,
+    'Grimy cadantine': 333,
+    'Grimy lantadyme': 250,
+    'Grimy dwarf weed': 200,
+    'Grimy torstol': 810,
+    'Silver ore': 20,
+    'Coal': 20,
+    'Gold ore': 44,
+    'Mithril ore': 32,
+    'Adamantite ore': 166,
+    'Runite ore': 2000,
+    'Uncut sapphire': 188,
+    'Uncut emerald': 142,
+    'Uncut ruby': 243,
+    'Uncut diamond': 508,
+    'Lizardman fang': 28,
+    'Pure essence': 2,
+    'Saltpetre': 24,
+    'Teak plank': 96,
+    'Mahogany plank': 238,
+    'Dynamite': 54,
+}
+
+
+# loot_quantities returns the quantity of every item of a name column at the given points, NaN for the items that are
+# not non unique drops
+def loot_quantities(names, points=DEFAULT_POINTS):
+    return np.floor(min(points, LOOT_POINTS_CAP) / names.map(POINTS_PER_ITEM))
+
+
+# unique_chance returns the chance of a unique at each of an array of points
+def unique_chance(points):
+    return np.minimum(points, UNIQUE_POINTS_CAP) / (UNIQUE_POINTS * 100)
+
+
+# grid_points returns the points of every step of the grid, starting at 0
+def grid_points(step=GRID_STEP, cap=UNIQUE_POINTS_CAP):
+    return np.arange(0, cap + step, step)
+
+
+# points_grid returns the grid of a built cox table: the unique chance and the quantity of every non unique drop of the
+# table at every step of the points, in columns
+def points_grid(table, step=GRID_STEP, cap=UNIQUE_POINTS_CAP):
+    points = grid_points(step, cap)
+    loot_points = np.minimum(points, LOOT_POINTS_CAP)
+    items = []
+    for name, item_id in zip(table['name'], table['id']):
+        if name in POINTS_PER_ITEM:
+            items.append({
+                'id': int(item_id),
+                'name': name,
+                'points-per-item': POINTS_PER_ITEM[name],
+                'quantity': (loot_points // POINTS_PER_ITEM[name]).tolist(),
+            })
+    return {
+        'step': step,
+        'cap': cap,
+        'loot-points-cap': LOOT_POINTS_CAP,
+        'points-per-item-fitted': True,  # see POINTS_PER_ITEM
+        'points': points.tolist(),
+        'unique-chance': unique_chance(points).tolist(),
+        'items': items,
+    }
+
+
+class PointsGrid:
+    # reader of a points grid, looks up the unique chance and quantities of a point total in constant time
+
+    def __init__(self, grid):
+        self.step = grid['step']
+        self.unique_chances = np.array(grid['unique-chance'])
+        self.ids = np.array([item['id'] for item in grid['items']], dtype=np.int64)
+        self.quantity_grid = np.array([item['quantity'] for item in grid['items']], dtype=np.int64).reshape(
+            len(grid['items']), len(self.unique_chances))
+
+    # index returns the step of the grid of a point total, rounded down to a step and kept within the grid
+    def index(self, points):
+        return min(max(int(points) // self.step, 0), len(self.unique_chances) - 1)
+
+    # unique_chance returns the chance of a unique at a point total
+    def unique_chance(self, points):
+        return float(self.unique_chances[self.index(points)])
+
+    # quantities returns a dict of item id -> quantity at a point total
+    def quantities(self, points):
+        return dict(zip(self.ids.tolist(), self.quantity_grid[:, self.index(points)].tolist()))
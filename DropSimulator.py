@@ -0,0 +1,266 @@
+# DropSimulator simulates kills (or caskets, raids, chests) of a built table in batches of numpy draws, to check the
+# accuracy of the tables after a rebuild and to benchmark sampling strategies, without loading them into the plugin.
+# Each kill follows the drop types of the table:
+# pre-roll: one roll over the pre-roll drops, if it hits the kill gets that drop instead of its main drops
+# main: rolls rolls over the main drops, rolls is the roll count (N × a/b) all main drops share, or set by hand
+# tertiary: each tertiary drop is rolled on its own
+# always: always dropped
+# The pre-roll rarities of the cox table are each unique's share of a unique, not a chance per raid. Its pre-roll hits
+# with the unique chance of the points of the raid, see CoxPoints, and then draws the unique by those shares.
+# The pre-roll and main rolls draw from alias tables in constant time per roll (method 'alias'), or by a binary search
+# of the cumulative rarities (method 'cdf').
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from AliasTables import AliasSampler, MixedRolls, exact_probabilities, sampling_table
+from SubTables import expand_table
+
+CHUNK = 1000000  # kills simulated at once, bounds the memory used
+HISTOGRAM_BINS = 20
+
+
+class RollSampler:
+    # draws the slot of rolls over a group of drops, slot len(rows) is nothing. With a chance, the rarities of the drops
+    # are their shares of a hit: a roll hits with that chance and then draws a drop by the shares
+
+    def __init__(self, table, positions, method, rng, chance=None):
+        if chance is not None:
+            table = share_table(table, positions)
+        self.table = sampling_table(table, positions)
+        self.rows = self.table['rows'] if self.table else []
+        self.method = method
+        self.rng = rng
+        self.chance = chance
+        if self.table is None:
+            return
+
+        if method == 'alias':
+            self.sampler = AliasSampler(self.table)
+            self.sampler.rng = rng
+        elif method == 'cdf':
+            weights = self.table['weights'] + [self.table['nothing']]
+            self.cumulative = np.cumsum(weights, dtype=float) / sum(weights)
+        else:
+            raise ValueError('unknown sampling method: ' + method)
+
+    # probabilities returns the chance each roll drops each item
+    def probabilities(self):
+        if self.table is None:
+            return []
+        probabilities = [float(probability) for probability in exact_probabilities(self.table)[:len(self.rows)]]
+        if self.chance is not None:
+            probabilities = [self.chance * probability for probability in probabilities]
+        return probabilities
+
+    # hit_chance returns the chance each roll hits an item, not nothing
+    def hit_chance(self):
+        return sum(self.probabilities())
+
+    # draw returns the slot of each of count rolls
+    def draw(self, count):
+        if self.table is None:
+            return np.full(count, len(self.rows), dtype=np.int64)  # no drops, every roll is nothing
+        if self.chance is None:
+            return self.draw_slots(count)
+        slots = np.full(count, len(self.rows), dtype=np.int64)
+        hits = self.rng.random(count) < self.chance
+        slots[hits] = self.draw_slots(int(hits.sum()))
+        return slots
+
+    # draw_slots returns the slot of each of count rolls by the alias table or the cumulative rarities
+    def draw_slots(self, count):
+        if self.method == 'alias':
+            return self.sampler.draw(count)
+        return np.minimum(np.searchsorted(self.cumulative, self.rng.random(count), side='right'), len(self.rows))
+
+
+# share_table returns a table with the exact rarities of the rows at positions scaled to add up to 1, each row's share
+# of a hit
+def share_table(table, positions):
+    from fractions import Fraction
+
+    rows = table.iloc[positions]
+    exact = rows['rarity-numerator'].notna() & rows['rarity-denominator'].notna()
+    rarities = {position: Fraction(int(numerator), int(denominator)) for position, is_exact, numerator, denominator
+                in zip(positions, exact, rows['rarity-numerator'], rows['rarity-denominator']) if is_exact}
+    total = sum(rarities.values())
+    if not total:
+        return table
+    table = table.copy()
+    for position, rarity in rarities.items():
+        share = rarity / total
+        table.iloc[position, table.columns.get_loc('rarity-numerator')] = share.numerator
+        table.iloc[position, table.columns.get_loc('rarity-denominator')] = share.denominator
+    return table
+
+
+class SimulationResult:
+    # counts: one row for every drop of the table, with the times it was dropped and the expected and sampled drops per
+    # kill. histograms: row position -> (counts, bin edges) of the quantity of each drop
+
+    def __init__(self, counts, histograms, trials, seconds):
+        self.counts = counts
+        self.histograms = histograms
+        self.trials = trials
+        self.seconds = seconds
+
+
+# load_table reads a json file written by the table builders, a table with references to sub-tables is expanded into
+# a flat table with the sub-tables next to it
+def load_table(path):
+    return expand_table(pd.read_json(path, orient='table'), os.path.dirname(os.path.abspath(path)))
+
+
+# quantity_ranges returns the min and max quantity of every row, 1 where the quantity is unknown
+def quantity_ranges(table):
+    low = pd.Series(1, index=table.index)
+    if 'quantity-min' in table.columns:
+        low = pd.to_numeric(table['quantity-min'], errors='coerce').astype(float).fillna(1)
+    high = low
+    if 'quantity-max' in table.columns:
+        high = pd.to_numeric(table['quantity-max'], errors='coerce').astype(float).fillna(1)
+    low = low.to_numpy().astype(np.int64)
+    return low, np.maximum(low, high.to_numpy().astype(np.int64))
+
+
+# simulate simulates trials kills of a table and returns a SimulationResult. rolls overrides the number of main rolls
+# per kill, i.e., for clue caskets. unique_chance is the chance the pre-roll hits, for the cox table whose pre-roll
+# rarities are shares of a unique, see cox_unique_chance
+def simulate(table, trials, rolls=None, method='alias', seed=None, unique_chance=None):
+    start = time.perf_counter()
+    table = table.reset_index(drop=True)
+    rng = np.random.default_rng(seed)
+
+    drop_types = table['drop-type'].fillna('').to_numpy()
+    positions = {drop_type: [i for i, row_type in enumerate(drop_types) if row_type == drop_type]
+                 for drop_type in ('', 'pre-roll', 'tertiary', 'always')}
+    pre_roll = RollSampler(table, positions['pre-roll'], method, rng, unique_chance)
+    main = RollSampler(table, positions[''], method, rng)
+    if rolls is None:
+        rolls = main.table['rolls'] if main.table else 1
+    tertiary = [(i, table['rarity'].iloc[i]) for i in positions['tertiary'] if pd.notna(table['rarity'].iloc[i])]
+
+    low, high = quantity_ranges(table)
+    drops = np.zeros(len(table), dtype=np.int64)
+    quantities = np.zeros(len(table), dtype=np.int64)
+    histograms = {i: np.zeros(HISTOGRAM_BINS, dtype=np.int64) for i in range(len(table))}
+    edges = {i: np.linspace(low[i], high[i] + 1, HISTOGRAM_BINS + 1) for i in range(len(table))}
+
+    # add_drops records count drops of row i, with a random quantity for each
+    def add_drops(i, count):
+        if count == 0:
+            return
+        drops[i] += count
+        if low[i] == high[i]:
+            quantities[i] += count * low[i]
+            histograms[i][0] += count
+            return
+        drawn = rng.integers(low[i], high[i] + 1, size=count)
+        quantities[i] += drawn.sum()
+        histograms[i] += np.histogram(drawn, bins=edges[i])[0]
+
+    # add_slots records the drops of a batch of rolls over a group of drops
+    def add_slots(sampler, slots):
+        counts = np.bincount(slots, minlength=len(sampler.rows) + 1)
+        for slot, i in enumerate(sampler.rows):
+            add_drops(i, int(counts[slot]))
+
+    done = 0
+    while done < trials:
+        kills = min(CHUNK, trials - done)
+        done += kills
+
+        main_kills = kills
+        if pre_roll.table is not None:
+            slots = pre_roll.draw(kills)
+            add_slots(pre_roll, slots)
+            main_kills = int((slots == len(pre_roll.rows)).sum())  # kills whose pre-roll was nothing
+
+        if main.table is not None:
+            add_slots(main, main.draw(main_kills * rolls))
+
+        for i, rarity in tertiary:
+            add_drops(i, int(rng.binomial(kills, rarity)))
+
+        for i in positions['always']:
+            add_drops(i, kills)
+
+    expected = expected_drops(table, positions, pre_roll, main, rolls)
+    counts = pd.DataFrame({
+        'name': table['name'],
+        'id': table['id'] if 'id' in table.columns else None,
+        'drop-type': drop_types,
+        'drops': drops,
+        'quantity': quantities,
+        'expected': expected,
+        'sampled': drops / trials,
+    })
+    counts['error'] = (counts['sampled'] - expected) / np.sqrt(np.maximum(expected * (1 - np.minimum(expected, 1)),
+                                                                         1e-300) / trials)
+    histograms = {i: (histograms[i], edges[i]) for i in range(len(table)) if drops[i]}
+    return SimulationResult(counts, histograms, trials, time.perf_counter() - start)
+
+
+# expected_drops returns the expected drops per kill of every row of a table
+def expected_drops(table, positions, pre_roll, main, rolls):
+    expected = np.zeros(len(table))
+    for sampler, scale in ((pre_roll, 1.0), (main, (1 - pre_roll.hit_chance()) * rolls)):
+        for probability, i in zip(sampler.probabilities(), sampler.rows):
+            expected[i] = scale * probability
+    for i in positions['tertiary']:
+        expected[i] = table['rarity'].iloc[i] if pd.notna(table['rarity'].iloc[i]) else 0.0
+    for i in positions['always']:
+        expected[i] = 1.0
+    return expected
+
+
+# cox_unique_chance returns the chance of a unique at a point total, read from the points grid written next to the cox
+# table, or None if the table at path is not the cox table or one of its variants
+def cox_unique_chance(path, points):
+    import TableBuilder
+    from CoxPoints import PointsGrid
+    from TableVariants import split_variant
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    if split_variant(name)[0] != TableBuilder.cox_file:
+        return None
+    grid_path = os.path.join(os.path.dirname(os.path.abspath(path)), TableBuilder.cox_grid_file + '.json')
+    if not os.path.exists(grid_path):
+        raise FileNotFoundError('the cox table needs its points grid, ' + grid_path + ' does not exist')
+    with open(grid_path, encoding='utf-8') as f:
+        return PointsGrid(json.load(f)).unique_chance(points)
+
+
+def main():
+    from CoxPoints import DEFAULT_POINTS
+
+    parser = argparse.ArgumentParser(description='Simulates kills of a built drop table')
+    parser.add_argument('table', help='json file written by the table builder')
+    parser.add_argument('--trials', type=int, default=1000000, help='kills to simulate')
+    parser.add_argument('--rolls', type=int, default=None, help='main rolls per kill, i.e., for clue caskets')
+    parser.add_argument('--method', choices=['alias', 'cdf'], default='alias', help='how rolls are sampled')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--points', type=int, default=DEFAULT_POINTS,
+                        help='points of each raid, for the cox table, the chance of a unique grows with the points')
+    args = parser.parse_args()
+
+    try:
+        unique_chance = cox_unique_chance(args.table, args.points)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    try:
+        result = simulate(load_table(args.table), args.trials, args.rolls, args.method, args.seed, unique_chance)
+    except MixedRolls as e:
+        parser.error('the drops of a roll are not all rolled the same number of times, ' + str(e))
+    pd.set_option('display.max_rows', None, 'display.width', 200)
+    print(result.counts.to_string())
+    print(str(result.trials) + ' kills in ' + '%.2f' % result.seconds + ' seconds')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# pd.read_html turns every table on a wiki page into a DataFrame, including navboxes and infoboxes, and the builders
+# then throw most of them away. DropTableExtractor parses the page once with lxml and only reads the rows of drop
+# tables: tables with the wiki item-drops class, or tables whose header row holds every column of the drop schema.
+# Every other table is dropped after looking at its first row. The heading of the section each table is in, i.e.,
+# Tertiary or Pre-roll, is kept as a section column.
+# Columns are named the way pd.read_html names them (Unnamed: 0 for an empty header, Item.1 for a repeated one), so
+# the builders can use the extracted tables just like the ones pd.read_html returned.
+import lxml.etree
+import pandas as pd
+
+DROP_TABLE_CLASS = 'item-drops'
+DROP_SCHEMA = ('Item', 'Quantity', 'Rarity')  # header columns of a drop table
+
+HEADINGS = ('h2', 'h3', 'h4', 'h5', 'h6')
+
+# elements whose text is not part of the page, i.e., the [edit] links of headings
+SKIPPED = '//script | //style | //*[contains(concat(" ", normalize-space(@class), " "), " mw-editsection ")]'
+ROWS = lxml.etree.XPath('./tr | ./thead/tr | ./tbody/tr | ./tfoot/tr')
+CELLS = lxml.etree.XPath('./td | ./th')
+PARSER = lxml.etree.HTMLParser()  # plain etree elements, lxml.html element classes make every lookup slower
+
+
+# drop removes an element and its text from a tree, the text after the element is kept
+def drop(element):
+    parent = element.getparent()
+    if element.tail:
+        previous = element.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or '') + element.tail
+        else:
+            parent.text = (parent.text or '') + element.tail
+    parent.remove(element)
+
+
+# text returns the text of an element with its whitespace collapsed
+def text(element):
+    return ' '.join(''.join(element.itertext()).split())
+
+
+# span returns the value of a colspan or rowspan attribute
+def span(value):
+    if value is None:
+        return 1
+    try:
+        return max(int(value), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+# fill_row_spans adds the cells of the rows above that span into the next column of a row
+def fill_row_spans(row, row_spans):
+    while row_spans and len(row) in row_spans:
+        rows_left, cell_text = row_spans.pop(len(row))
+        if rows_left > 1:
+            row_spans[len(row)] = (rows_left - 1, cell_text)
+        row.append(cell_text)
+
+
+# read_rows yields the cells of every row of a table, with the cells that span several columns or rows repeated in
+# each of them
+def read_rows(table):
+    row_spans = {}  # column -> (rows left, text) of cells spanning into the rows below
+    for tr in ROWS(table):
+        row = []
+        for cell in CELLS(tr):
+            cell_text = text(cell)
+            rowspan = span(cell.get('rowspan'))
+            for _ in range(span(cell.get('colspan'))):
+                fill_row_spans(row, row_spans)
+                if rowspan > 1:
+                    row_spans[len(row)] = (rowspan - 1, cell_text)
+                row.append(cell_text)
+        fill_row_spans(row, row_spans)
+        if row:
+            yield row
+
+
+# read_table returns the header and rows of a table if it is a drop table, None if it is not
+def read_table(table, schema):
+    rows = read_rows(table)
+    header = next(rows, None)
+    if header is None:
+        return None
+    wanted = DROP_TABLE_CLASS in (table.get('class') or '').split() or all(column in header for column in schema)
+    if not wanted:
+        return None
+    return column_names(header), list(rows)
+
+
+# column_names names the columns of a header row the way pd.read_html does, empty columns are Unnamed: i and repeated
+# columns are given a .n suffix, i.e., Item, Item.1
+def column_names(header):
+    names = []
+    seen = {}
+    for i, name in enumerate(header):
+        if not name:
+            name = 'Unnamed: ' + str(i)
+        if name in seen:
+            seen[name] += 1
+            name = name + '.' + str(seen[name])
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+# find_drop_tables returns the section, header and rows of every drop table on a page, in the order they are on the
+# page. Tables nested in tables are read as part of the cell they are in
+def find_drop_tables(html, schema=DROP_SCHEMA):
+    if not html.strip():
+        return []
+    root = lxml.etree.fromstring(html, PARSER)
+    if root is None:
+        return []
+    for element in root.xpath(SKIPPED):
+        drop(element)
+    for br in root.iter('br'):
+        br.tail = ' ' + (br.tail or '')
+
+    found = []
+    section = ''  # heading of the current section
+    for element in root.iter('table', *HEADINGS):
+        if next(element.iterancestors('table'), None) is not None:
+            continue  # inside a table, read as part of its cell
+        if element.tag != 'table':
+            section = text(element)
+            continue
+        table = read_table(element, schema)
+        if table is not None and table[1]:
+            found.append((section,) + table)
+    return found
+
+
+# extract_drop_tables returns a list with a DataFrame for every drop table on a wiki page, with the section heading
+# above each table in a section column. schema is the header columns a table without the item-drops class needs to be
+# kept
+def extract_drop_tables(html, schema=DROP_SCHEMA):
+    tables = []
+    for section, header, rows in find_drop_tables(html, schema):
+        rows = [row[:len(header)] + [''] * (len(header) - len(row)) for row in rows]  # pad or cut to the header
+        table = pd.DataFrame(rows, columns=header)
+        table['section'] = section
+        tables.append(table)
+    return tables
@@ -0,0 +1,348 @@
+# DropTableService serves built drop tables over http, so every simulator instance on a machine can share one warm
+# cache instead of each reading the json files. A table is served from an in-memory LRU cache, else from the json
+# file in the output directory, else it is built on the spot with the builder of its drop source (or the generic
+# monster builder for any other page) and written to the output directory like any other build. Concurrent requests
+# for a table that is not cached are coalesced into a single build. A variant of a table, see TableVariants, is asked
+# for by the name of its json file and is built along with the table. Every response has an ETag and requests with a
+# matching If-None-Match get a 304. With --offline every page is read from the page cache, no network is used.
+# A name with no table or no wiki page is a 404, a page that could not be fetched a 502 and a table that could not be
+# built a 500. A failed build is not tried again for FAILURE_TTL seconds, every request in that time gets its error.
+#
+#   GET  /tables/<drop source>       the table of a drop source, the json written by the builders
+#   GET  /tables                     every drop source with a builder
+#   POST /batch {"sources": [...]}   many tables at once: {"tables": {source: table},
+#                                    "errors": {source: {"status": status, "error": error}}}
+#   GET  /health                     cache statistics
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+import BestiaryCrawler
+import BuildReport
+import TableBuilder
+import WikiFetcher
+from PageCache import CacheMiss
+from TableVariants import get_variants, split_variant, variant_name
+
+CACHE_SIZE = 256  # tables kept in memory
+MAX_BATCH = 500  # most tables asked for by one batch request
+FAILURE_TTL = 30.0  # seconds a failed build is remembered before the drop source is built again
+
+logger = logging.getLogger(__name__)
+
+
+class TableNotFound(Exception):
+    pass
+
+
+class CachedTable:
+    # the json of a table as it is served, with the file it was read from
+
+    def __init__(self, body, path):
+        self.body = body
+        self.path = path
+        self.mtime = os.stat(path).st_mtime_ns
+        self.etag = '"' + hashlib.sha256(body).hexdigest() + '"'
+
+    # is_fresh returns true if the file the table was read from did not change since, i.e., by a rebuild
+    def is_fresh(self):
+        try:
+            return os.stat(self.path).st_mtime_ns == self.mtime
+        except OSError:
+            return False
+
+
+class TableStore:
+    # finds the table of a drop source in memory, on disk or by building it, in that order
+
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # json file name -> CachedTable, least recently used first
+        self.building = {}  # drop source -> Future of the build in progress
+        self.failures = {}  # drop source -> (time the failure expires, error) of recently failed builds
+        self.lock = threading.Lock()
+        self.stats = {'memory': 0, 'disk': 0, 'build': 0, 'coalesced': 0, 'errors': 0, 'failures-cached': 0}
+        self.builders = {drop_source: build for build, drop_sources in TableBuilder.groups.values()
+                         for drop_source in drop_sources}
+
+    # target returns the drop source of a requested name, the name of the json file asked for and the name of the json
+    # file of the table of the drop source. The requested name can be a drop source, the name of its json file or any
+    # monster page, or one of those with the name of a variant appended
+    def target(self, name):
+        base, variant = split_variant(name)
+        builtin = base in self.builders or base in TableBuilder.all_output_names
+        if not builtin and variant not in get_variants(base, TableBuilder.rule_groups['build_monster_table']):
+            base, variant = name, ''
+        if base in TableBuilder.all_output_names and base not in TableBuilder.all_drop_sources:
+            base = TableBuilder.all_drop_sources[TableBuilder.all_output_names.index(base)]
+        if base in self.builders:
+            file_name = TableBuilder.cox_file if base == TableBuilder.cox else base
+        else:
+            file_name = BestiaryCrawler.file_name(base)
+        return base, variant_name(file_name, variant), file_name
+
+    # count adds one to a statistic
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    # remember puts a table in the memory cache, dropping the least recently used table if it is full
+    def remember(self, file_name, table):
+        with self.lock:
+            self.cache[file_name] = table
+            self.cache.move_to_end(file_name)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    # get returns the CachedTable of a requested name and where it was found: memory, disk or build
+    def get(self, name):
+        drop_source, file_name, table_file_name = self.target(name)
+
+        with self.lock:
+            table = self.cache.get(file_name)
+            if table is not None and table.is_fresh():
+                self.cache.move_to_end(file_name)
+                self.stats['memory'] += 1
+                return table, 'memory'
+
+        path = TableBuilder.output_path(file_name)
+        if os.path.exists(path):
+            table = read_table(path)
+            self.remember(file_name, table)
+            self.count('disk')
+            return table, 'disk'
+
+        self.build(drop_source)
+        if not os.path.exists(path):
+            path = TableBuilder.output_path(table_file_name)  # the variant has the same rows as the table
+        if not os.path.exists(path):
+            error = TableNotFound('no table could be built for ' + name)
+            self.failed(drop_source, error)
+            raise error
+        table = read_table(path)
+        self.remember(file_name, table)
+        return table, 'build'
+
+    # failed records that a drop source could not be built, it is not built again for FAILURE_TTL seconds
+    def failed(self, drop_source, error):
+        with self.lock:
+            self.stats['errors'] += 1
+            self.failures[drop_source] = (time.monotonic() + FAILURE_TTL, error)
+
+    # build builds the table of a drop source and its variants, a request for a drop source that is already being built
+    # waits for that build. A drop source whose build failed less than FAILURE_TTL seconds ago fails with the same error
+    # without building it again. The pages of the drop source are fetched again, not taken from the pages kept in
+    # memory, so a long running service sees pages that changed since it last read them
+    def build(self, drop_source):
+        with self.lock:
+            failure = self.failures.get(drop_source)
+            if failure is not None:
+                expires, error = failure
+                if time.monotonic() < expires:
+                    self.stats['failures-cached'] += 1
+                    raise error
+                del self.failures[drop_source]
+            future = self.building.get(drop_source)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.building[drop_source] = future
+            else:
+                self.stats['coalesced'] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            WikiFetcher.forget_page(WikiFetcher.page_url(drop_source))
+            WikiFetcher.forget_page(WikiFetcher.wikitext_url(drop_source))
+            if drop_source == TableBuilder.cox:
+                TableBuilder.cox_table_to_json()  # writes the points grid along with the table
+            else:
+                build = TableBuilder.source_builder(drop_source)
+                file_name = drop_source if build is not TableBuilder.build_monster_table else \
+                    BestiaryCrawler.file_name(drop_source)
+                TableBuilder.table_to_json(build, drop_source, file_name)
+            self.count('build')
+            future.set_result(None)
+        except Exception as e:
+            self.failed(drop_source, e)
+            future.set_exception(e)
+            raise
+        finally:
+            TableBuilder.flush()
+            with self.lock:
+                del self.building[drop_source]
+
+
+# read_table reads the json file of a table as it is served
+def read_table(path):
+    with open(path, 'rb') as f:
+        return CachedTable(f.read(), path)
+
+
+# error_message returns what a client is told about a table that could not be found or built
+def error_message(e):
+    return type(e).__name__ + ': ' + str(e)
+
+
+# error_status returns the http status of a table that could not be found or built: 404 if there is no table or no
+# wiki page, 502 if the wiki page could not be fetched, 500 if the table could not be built
+def error_status(e):
+    import requests
+
+    if isinstance(e, (TableNotFound, CacheMiss)):
+        return 404
+    if isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code == 404:
+        return 404
+    if isinstance(e, requests.RequestException):
+        return 502
+    return 500
+
+
+# log_error logs why there is no table for a requested name, a table that could not be built with its traceback
+def log_error(name, e):
+    if error_status(e) == 500:
+        logger.error('building %s failed: %s', name, error_message(e), exc_info=e)
+    else:
+        logger.info('no table for %s: %s', name, error_message(e))
+
+
+class Handler(BaseHTTPRequestHandler):
+    store = None  # the TableStore shared by every request, set by serve
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def log_message(self, format, *args):
+        logger.debug('%s %s', self.address_string(), format % args)
+
+    # send sends a json body with an ETag, or a 304 if the client already has it
+    def send(self, status, body, etag=None, source=None):
+        if etag is not None and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        if etag is not None:
+            self.send_header('ETag', etag)
+        if source is not None:
+            self.send_header('X-Served-From', source)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # send_error_json sends an error as json
+    def send_error_json(self, status, message):
+        self.send(status, json.dumps({'error': message}).encode('utf-8'))
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/health':
+            with self.store.lock:
+                health = dict(self.store.stats, cached=len(self.store.cache))
+            self.send(200, json.dumps(health).encode('utf-8'))
+        elif path in ('/tables', '/tables/'):
+            body = json.dumps(sorted(self.store.builders)).encode('utf-8')
+            self.send(200, body, '"' + hashlib.sha256(body).hexdigest() + '"')
+        elif path.startswith('/tables/'):
+            name = unquote(path[len('/tables/'):])
+            try:
+                table, source = self.store.get(name)
+            except Exception as e:
+                log_error(name, e)
+                self.send_error_json(error_status(e), error_message(e))
+                return
+            self.send(200, table.body, table.etag, source)
+        else:
+            self.send_error_json(404, 'unknown path: ' + path)
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/batch':
+            self.send_error_json(404, 'unknown path: ' + self.path)
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            names = list(dict.fromkeys(request['sources']))
+        except (ValueError, KeyError, TypeError):
+            self.send_error_json(400, 'expected {"sources": [...]}')
+            return
+        if len(names) > MAX_BATCH:
+            self.send_error_json(400, 'at most ' + str(MAX_BATCH) + ' sources per batch')
+            return
+
+        # get returns the table of one name, or the error it failed with
+        def get(name):
+            try:
+                return self.store.get(name)[0]
+            except Exception as e:
+                log_error(name, e)
+                return e
+
+        with ThreadPoolExecutor(max_workers=WikiFetcher.settings['max_workers']) as pool:
+            results = list(pool.map(get, names))
+
+        # the json files are put in the response as they are, without decoding them
+        tables = [json.dumps(name).encode('utf-8') + b':' + result.body
+                  for name, result in zip(names, results) if isinstance(result, CachedTable)]
+        errors = {name: {'status': error_status(result), 'error': error_message(result)}
+                  for name, result in zip(names, results) if not isinstance(result, CachedTable)}
+        body = b'{"tables":{' + b','.join(tables) + b'},"errors":' + json.dumps(errors).encode('utf-8') + b'}'
+        self.send(200, body, '"' + hashlib.sha256(body).hexdigest() + '"')
+
+
+# serve serves the tables until interrupted
+def serve(host, port, cache_size=CACHE_SIZE):
+    # load everything the request threads share before they start, so they do not race to load it
+    from DropTypeClassifier import get_rules
+    from ItemResolver import get_resolver, items_snapshot_hash
+    get_resolver()
+    items_snapshot_hash()
+    for group in set(TableBuilder.rule_groups.values()):
+        get_rules(group)
+    TableBuilder.get_manifest()
+
+    Handler.store = TableStore(cache_size)
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    logger.info('serving drop tables from %s on http://%s:%d', TableBuilder.output_dir, host, server.server_port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serves drop tables over http, building them on demand')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='tables kept in memory')
+    parser.add_argument('--offline', action='store_true', help='build entirely from the page cache, no network')
+    parser.add_argument('--cache-dir', default=WikiFetcher.settings['cache_dir'], help='directory of the page cache')
+    parser.add_argument('--backend', choices=['html', 'wikitext'], default=TableBuilder.source_backend,
+                        help='read the drop tables from the rendered wiki pages or from their wikitext')
+    parser.add_argument('--output-dir', default=TableBuilder.output_dir,
+                        help='directory the json files are read from and built into')
+    parser.add_argument('--log-level', choices=BuildReport.LOG_LEVELS, default='info', help='how much is logged')
+    args = parser.parse_args()
+
+    TableBuilder.source_backend = args.backend
+    TableBuilder.output_dir = args.output_dir
+    BuildReport.configure_logging(args.log_level)
+    WikiFetcher.configure(offline=args.offline, cache_dir=args.cache_dir)
+    serve(args.host, args.port, args.cache_size)
+
+
+if __name__ == '__main__':
+    main()
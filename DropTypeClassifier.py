@@ -0,0 +1,94 @@
+# DropTypeClassifier decides the drop type of every row of a table: 'always', 'tertiary', 'pre-roll' or '' for main
+# drops. The rules live in drop_type_rules.json, one rule set per group of drop sources (or per drop source), instead
+# of chains of __contains__ checks in every builder. Each drop type of a rule set can have:
+# contains: the item name contains any of these
+# equals: the item name is any of these
+# regex: the item name matches any of these regular expressions
+# section: the heading of the section the drop is in matches any of these regular expressions
+# The rules of a drop type are compiled once into a single alternation regex and applied to the whole name column in
+# one vectorized call, so classifying does not get slower as rules are added. Drop types are tried in the order they
+# are listed, the first one that matches wins. If always is set, drops with a rarity of 1 are 'always' drops before
+# any other rule is tried.
+import hashlib
+import json
+import os
+import re
+
+from BuildReport import stage
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'drop_type_rules.json')
+
+_rule_sets = None  # rule set name -> DropTypeRules, see get_rules
+
+
+class DropTypeRules:
+
+    def __init__(self, rules):
+        self.always = rules.get('always', False)
+        self.hash = hashlib.sha256(json.dumps(rules, sort_keys=True).encode('utf-8')).hexdigest()
+
+        self.types = []  # (drop type, name pattern, section pattern), in the order they are tried
+        for drop_type, type_rules in rules.get('types', {}).items():
+            self.types.append((drop_type, name_pattern(type_rules), section_pattern(type_rules)))
+
+    # classify returns the drop type of every row of a table with name and rarity columns, and a section column if
+    # any of the rules use it
+    def classify(self, table):
+        import pandas as pd
+
+        drop_types = pd.Series('', index=table.index, dtype=object)
+        classified = pd.Series(False, index=table.index)
+
+        if self.always:
+            classified = table['rarity'] == 1.0  # if 100% rarity
+            drop_types[classified] = 'always'
+
+        for drop_type, names, sections in self.types:
+            matched = pd.Series(False, index=table.index)
+            if names is not None:
+                matched |= table['name'].str.contains(names, regex=True)
+            if sections is not None and 'section' in table.columns:
+                matched |= table['section'].fillna('').str.contains(sections, regex=True)
+            matched &= ~classified
+            drop_types[matched] = drop_type
+            classified |= matched
+
+        return drop_types
+
+
+# name_pattern compiles the contains, equals and regex rules of a drop type into a single regex, None if it has none
+def name_pattern(type_rules):
+    alternatives = [re.escape(text) for text in type_rules.get('contains', [])]
+    alternatives += ['^' + re.escape(text) + '$' for text in type_rules.get('equals', [])]
+    alternatives += ['(?:' + pattern + ')' for pattern in type_rules.get('regex', [])]
+    if not alternatives:
+        return None
+    return re.compile('|'.join(alternatives))
+
+
+# section_pattern compiles the section rules of a drop type into a single regex, None if it has none
+def section_pattern(type_rules):
+    alternatives = ['(?:' + pattern + ')' for pattern in type_rules.get('section', [])]
+    if not alternatives:
+        return None
+    return re.compile('|'.join(alternatives))
+
+
+# get_rules returns the compiled rule set of a drop source, or of its group if the drop source has no rule set of its
+# own. The rules file is only read and compiled the first time
+def get_rules(group, drop_source=None):
+    global _rule_sets
+    if _rule_sets is None:
+        with open(RULES_PATH, encoding='utf-8') as f:
+            _rule_sets = {name: DropTypeRules(rules) for name, rules in json.load(f).items()}
+    if drop_source in _rule_sets:
+        return _rule_sets[drop_source]
+    return _rule_sets[group]
+
+
+# classify_table adds the drop-type column to a table using the rules of a drop source or its group
+def classify_table(table, group, drop_source=None):
+    with stage('classify'):
+        table = table.copy()
+        table['drop-type'] = get_rules(group, drop_source).classify(table).to_numpy()
+        return table
@@ -0,0 +1,143 @@
+# The builders used to call items.load() for every table and then scan all ~25k osrsbox items for every row of the
+# wiki table until the names matched. ItemResolver keeps a dictionary of item name -> id for every non duplicate item,
+# so resolving a whole name column is a single lookup per row. Loading the osrsbox items db takes about a second, so
+# the dictionary is saved to a small pickle snapshot the first time and read from it on every run after, until the
+# installed osrsbox version changes.
+import hashlib
+import logging
+import os
+import pickle
+import re
+
+import osrsbox
+
+from BuildReport import count, stage
+from PageCache import write_atomic
+
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'item_ids.pickle')
+SNAPSHOT_FORMAT = 1  # bump when the contents of the snapshot change
+
+logger = logging.getLogger(__name__)
+
+# items whose osrsbox id is not the id the drop simulator needs
+SPECIAL_IDS = {
+    'Coins': 995,  # specific coin id needed
+}
+
+# suffixes the wiki adds to item names that the osrsbox db does not have, i.e., "Zombie head (Treasure Trails)" is
+# "Zombie head" in the osrsbox db
+NAME_SUFFIXES = re.compile(r'\s*[(]Treasure Trails[)]')
+
+_resolver = None  # shared resolver, see get_resolver
+_snapshot = None  # snapshot of the osrsbox items db, see get_snapshot
+
+
+class ItemResolver:
+
+    def __init__(self, all_items=None):
+        # name -> id of the first non duplicate item with that name, from the snapshot unless items are given
+        self.ids = dict(get_snapshot()['ids'] if all_items is None else item_ids(all_items))
+        self.ids.update(SPECIAL_IDS)
+
+        self.unresolved = set()  # every name that could not be resolved by this resolver
+
+    # clean_names removes the wiki only suffixes from a column of item names
+    @staticmethod
+    def clean_names(names):
+        return names.astype(str).str.replace(NAME_SUFFIXES, "", regex=True).str.strip()
+
+    # resolve returns the id of a single item name, or None if the name is not in the osrsbox db
+    def resolve(self, name):
+        return self.ids.get(NAME_SUFFIXES.sub("", str(name)).strip())
+
+    # resolve_names resolves a whole column of item names in one call, unresolved names are NaN
+    def resolve_names(self, names):
+        return self.clean_names(names).map(self.ids)
+
+    # resolve_table adds an id column to a table with a name column. Rows whose name can not be resolved are reported
+    # and removed so the id column always lines up with the table
+    def resolve_table(self, table, drop_source=''):
+        with stage('resolve'):
+            table = table.copy()
+            table['name'] = self.clean_names(table['name'])
+            ids = table['name'].map(self.ids)
+
+            missing = ids.isna()
+            count('names-resolved', int((~missing).sum()))
+            count('names-unresolved', int(missing.sum()))
+            if missing.any():
+                names = sorted(set(table.loc[missing, 'name']))
+                self.unresolved.update(names)
+                logger.info('unresolved items in %s: %s', drop_source, ', '.join(names))
+                table = table[~missing]
+                ids = ids[~missing]
+
+            table['id'] = ids.astype(int).to_numpy()
+            return table
+
+
+# get_resolver returns the resolver shared by every builder, the osrsbox items db is only loaded the first time
+def get_resolver():
+    global _resolver
+    if _resolver is None:
+        _resolver = ItemResolver()
+    return _resolver
+
+
+# set_resolver makes every builder resolve ids with the given resolver, i.e., one loaded from a pinned snapshot
+def set_resolver(resolver):
+    global _resolver
+    _resolver = resolver
+
+
+# item_ids returns a dictionary of name -> id of the first non duplicate item with that name
+def item_ids(all_items):
+    ids = {}
+    for item in all_items:
+        if item.duplicate is False and item.name not in ids:
+            ids[item.name] = int(item.id)
+    return ids
+
+
+# build_snapshot loads the osrsbox items db and returns its snapshot: the osrsbox version, the sha256 of the items db
+# file and the id of every item name
+def build_snapshot():
+    from osrsbox import items_api as items
+    from osrsbox.items_api import all_items as items_file
+
+    with stage('items-load'):
+        sha256 = hashlib.sha256()
+        with open(items_file.PATH_TO_ITEMS_COMPLETE_JSON, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha256.update(chunk)
+        return {
+            'format': SNAPSHOT_FORMAT,
+            'osrsbox': osrsbox.__version__,
+            'sha256': sha256.hexdigest(),
+            'ids': item_ids(items.load()),
+        }
+
+
+# get_snapshot returns the snapshot of the osrsbox items db. It is read from SNAPSHOT_PATH, and only built again from
+# the items db if there is no snapshot or it was built from another osrsbox version
+def get_snapshot():
+    global _snapshot
+    if _snapshot is None:
+        snapshot = None
+        if os.path.exists(SNAPSHOT_PATH):
+            with open(SNAPSHOT_PATH, 'rb') as f:
+                snapshot = pickle.load(f)
+        current = snapshot is not None and snapshot.get('format') == SNAPSHOT_FORMAT and \
+            snapshot.get('osrsbox') == osrsbox.__version__
+        if not current:
+            logger.info('building the item snapshot for osrsbox %s', osrsbox.__version__)
+            snapshot = build_snapshot()
+            write_atomic(SNAPSHOT_PATH, pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL))
+        _snapshot = snapshot
+    return _snapshot
+
+
+# items_snapshot_hash returns the sha256 of the osrsbox items db file, tables resolved against a different db have to be
+# built again
+def items_snapshot_hash():
+    return get_snapshot()['sha256']
@@ -0,0 +1,126 @@
+# PageCache stores the html of every wiki page fetched by the builders on disk, so pages do not have to be downloaded
+# again on every run. Pages are stored by the sha256 of their content, and an index maps each url to its content hash
+# along with the ETag and Last-Modified headers the wiki sent, which are used to revalidate the page with a
+# conditional GET. An unchanged page then only costs a 304 response. The cache directory can be checked in so tables
+# can be built with no network at all (offline mode).
+# The index is written to disk every SAVE_EVERY changes and when it is flushed, not on every page. A page whose entry
+# was not written yet, i.e., when the process is killed, is only downloaded again on the next run.
+import hashlib
+import json
+import os
+import threading
+import time
+
+SAVE_EVERY = 50  # changes to the index before it is written to disk
+
+
+class CacheMiss(Exception):
+    pass
+
+
+class PageCache:
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.lock = threading.Lock()
+        self.unsaved = 0  # changes to the index not written to disk yet
+
+        self.index = {}  # url -> {'sha256', 'etag', 'last_modified', 'fetched', 'revision'}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+
+    # object_path returns the path of the file holding the page with the given content hash
+    def object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], sha256 + '.html')
+
+    # entry returns the index entry of a url, or None if the url is not cached
+    def entry(self, url):
+        with self.lock:
+            entry = self.index.get(url)
+        if entry is not None and os.path.exists(self.object_path(entry['sha256'])):
+            return entry
+        return None
+
+    # get returns the cached html of a url, raises CacheMiss if the url is not cached
+    def get(self, url):
+        entry = self.entry(url)
+        if entry is None:
+            raise CacheMiss(url + ' is not in the page cache at ' + self.cache_dir)
+        with open(self.object_path(entry['sha256']), encoding='utf-8') as f:
+            return f.read()
+
+    # validators returns the headers needed to revalidate the cached page of a url with a conditional GET
+    def validators(self, url):
+        entry = self.entry(url)
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    # put stores the html of a url along with the validators of the response it came from
+    def put(self, url, html, etag=None, last_modified=None):
+        sha256 = hashlib.sha256(html.encode('utf-8')).hexdigest()
+        path = self.object_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, html)
+
+        with self.lock:
+            self.index[url] = {
+                'sha256': sha256,
+                'etag': etag,
+                'last_modified': last_modified,
+                'fetched': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            }
+            self.changed()
+        return sha256
+
+    # touch records that the cached page of a url was revalidated by a 304 response
+    def touch(self, url):
+        with self.lock:
+            self.index[url]['fetched'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            self.changed()
+
+    # set_revision records the version of the wiki page the cached page of a url is, see WikiFetcher.check_revisions
+    def set_revision(self, url, revision):
+        with self.lock:
+            if url in self.index and self.index[url].get('revision') != revision:
+                self.index[url]['revision'] = revision
+                self.changed()
+
+    # changed counts a change to the index and writes the index to disk every SAVE_EVERY changes, must be called with
+    # the lock held
+    def changed(self):
+        self.unsaved += 1
+        if self.unsaved >= SAVE_EVERY:
+            self.save()
+
+    # flush writes the index to disk now if it has changes that are not written yet
+    def flush(self):
+        with self.lock:
+            if self.unsaved:
+                self.save()
+
+    # save writes the index to disk, must be called with the lock held
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        write_atomic(self.index_path, json.dumps(self.index, indent=1, sort_keys=True))
+        self.unsaved = 0
+
+
+# write_atomic writes text or bytes to a file so readers never see a half written file
+def write_atomic(path, data):
+    tmp_path = path + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+    if isinstance(data, bytes):
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+    else:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+    os.replace(tmp_path, path)
@@ -0,0 +1,262 @@
+# PipelineBenchmark times every stage of building a table on its own, with no network: parsing the drop tables out of
+# the page, cleaning them up, resolving item ids, classifying drop types, deriving variants and serializing the table.
+# The pages are the real wiki pages of a few representative drop sources, recorded with the record command into a
+# local fixtures directory that is not checked in. Each page is built by the real builder of its drop source, i.e., the
+# clue and cox builders with their own cleaning, and ids are resolved against a pinned snapshot of the osrsbox items db,
+# so two runs only differ by the code being measured. The stages of a build are the ones the builder
+# records in the BuildReport. Synthetic pages with 10x to 1000x the rows of a normal page are built by the monster
+# builder and show how each stage scales, a stage that is slower per row at 1000x than at 10x does not scale linearly.
+# Results are written as json and two results files can be compared to find regressions between commits.
+#
+#   python PipelineBenchmark.py record            records the fixtures, needs the network or the page cache
+#   python PipelineBenchmark.py run -o a.json     runs the benchmarks
+#   python PipelineBenchmark.py compare a.json b.json
+import argparse
+import html as html_text
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+
+import BuildReport
+import TableBuilder
+import WikiFetcher
+from AliasTables import table_json_with_sampling
+from ItemResolver import ItemResolver, items_snapshot_hash, set_resolver
+from TableBundle import pack_bundle
+from TableVariants import derive_variants, tag_table
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_fixtures')
+ITEMS_SNAPSHOT = os.path.join(FIXTURES_DIR, 'items.json')
+
+# one representative drop source of each builder
+FIXTURES = [TableBuilder.hard, TableBuilder.cox, TableBuilder.tob, TableBuilder.graardor, TableBuilder.hydra]
+
+SCALES = [10, 100, 1000]  # row multiples of the synthetic pages
+BASE_ROWS = 50  # rows of a synthetic page at 1x
+SECTION_ROWS = 50  # rows of each drop table of a synthetic page
+
+# cells of the synthetic pages, in the formats found on the wiki
+QUANTITIES = ['1', '5', '25–35', '1,000', '15,000–20,000', '10 (noted)', '2–4 (noted)', 'N/A']
+RARITIES = ['Always', '1/128', '2 × 5/128', '1/2,000', '6/128; 1/20', '1/512[d 1]', '3/25.6', '1/40–1/100']
+
+
+# fixture_path returns the path of the recorded page of a drop source in a fixtures directory
+def fixture_path(drop_source, fixtures_dir=FIXTURES_DIR):
+    return os.path.join(fixtures_dir, drop_source.replace(' ', '_') + '.html')
+
+
+# record writes the page of every fixture drop source and a snapshot of the osrsbox items db to the fixtures directory
+def record():
+    from osrsbox import items_api as items
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    snapshot = {
+        'sha256': items_snapshot_hash(),
+        'items': [[int(item.id), item.name] for item in items.load() if item.duplicate is False],
+    }
+    with open(ITEMS_SNAPSHOT, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    print('recorded ' + str(len(snapshot['items'])) + ' items')
+
+    for drop_source, html in WikiFetcher.fetch_pages(FIXTURES).items():
+        with open(fixture_path(drop_source), 'w', encoding='utf-8') as f:
+            f.write(html)
+        print('recorded ' + drop_source)
+
+
+# load_snapshot returns the items of the pinned osrsbox snapshot, in the form ItemResolver reads them
+def load_snapshot():
+    with open(ITEMS_SNAPSHOT, encoding='utf-8') as f:
+        snapshot = json.load(f)
+    return [SimpleNamespace(id=item_id, name=name, duplicate=False) for item_id, name in snapshot['items']]
+
+
+# synthetic_page returns the html of a page with rows drop table rows, split into sections like a wiki page. Names
+# are taken from the item snapshot, with one in ten not in the snapshot so the unresolved path is measured too
+def synthetic_page(rows, names):
+    parts = ['<html><body>']
+    for start in range(0, rows, SECTION_ROWS):
+        parts.append('<h3><span class="mw-headline">Section ' + str(start // SECTION_ROWS) + '</span></h3>')
+        parts.append('<table class="wikitable item-drops"><tr><th></th><th>Item</th><th>Quantity</th>'
+                     '<th>Rarity</th><th>Price</th></tr>')
+        for i in range(start, min(start + SECTION_ROWS, rows)):
+            name = 'Unknown item ' + str(i) if i % 10 == 9 else html_text.escape(names[i * 7919 % len(names)])
+            parts.append('<tr><td><img/></td><td>' + name + '</td><td>' + QUANTITIES[i % len(QUANTITIES)] +
+                         '</td><td>' + RARITIES[i % len(RARITIES)] + '</td><td>1,000</td></tr>')
+        parts.append('</table>')
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+# time_stage runs stage repeat times and returns its result and the min and median seconds it took
+def time_stage(stage, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = stage()
+        times.append(time.perf_counter() - start)
+    return result, min(times), statistics.median(times)
+
+
+# time_build runs the builder of a drop source repeat times on a page, which is put in memory so it is not fetched.
+# Returns the table built, the rows parsed from the page and the min and median seconds of the whole build and of every
+# stage the builder recorded, stage -> (min, median)
+def time_build(build, drop_source, html, repeat):
+    WikiFetcher.remember_page(WikiFetcher.page_url(drop_source), html)
+    times = {}
+    table = None
+    rows = 0
+    for _ in range(repeat):
+        with BuildReport.source(drop_source) as entry:
+            table = build(drop_source)
+        times.setdefault('build', []).append(entry['seconds'])
+        for stage, seconds in entry['stages'].items():
+            times.setdefault(stage, []).append(seconds)
+        rows = entry['counters'].get('rows-parsed', 0)
+    WikiFetcher.forget_page(WikiFetcher.page_url(drop_source))
+    return table, rows, {stage: (min(seconds), statistics.median(seconds)) for stage, seconds in times.items()}
+
+
+# benchmark_page times every stage of building the table of one page with the builder of its drop source, returns a
+# result for each stage
+def benchmark_page(case, drop_source, html, repeat):
+    build = TableBuilder.source_builder(drop_source)
+    group = TableBuilder.rule_groups[build.__name__]
+    results = []
+
+    # add_result adds the time of one stage
+    def add_result(stage, rows, best, median):
+        results.append({'case': case, 'stage': stage, 'rows': rows, 'min': best, 'median': median,
+                        'per-row': best / rows if rows else None, 'repeat': repeat})
+
+    # add times one stage and returns the output of the stage
+    def add(stage, run, rows):
+        output, best, median = time_stage(run, repeat)
+        add_result(stage, rows, best, median)
+        return output
+
+    table, rows, stages = time_build(build, drop_source, html, repeat)
+    for stage, (best, median) in stages.items():
+        add_result(stage, rows, best, median)
+
+    add('variants', lambda: derive_variants(tag_table(table, drop_source, group), drop_source, group), len(table))
+    add('serialize-json', lambda: table.to_json(orient='table'), len(table))
+    add('serialize-alias', lambda: table_json_with_sampling(table), len(table))
+    add('serialize-bundle', lambda: pack_bundle({case: table}), len(table))
+    return results
+
+
+# run runs every benchmark and returns the results, the pages of the drop sources are read from fixtures_dir
+def run(repeat=5, scales=SCALES, fixtures_dir=FIXTURES_DIR):
+    resolver = ItemResolver(load_snapshot())
+    set_resolver(resolver)  # the builders resolve ids against the pinned snapshot
+    results = []
+
+    for drop_source in FIXTURES:
+        path = fixture_path(drop_source, fixtures_dir)
+        if not os.path.exists(path):
+            print('no fixture for ' + drop_source + ', run record first')
+            continue
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        results += benchmark_page(drop_source, drop_source, html, repeat)
+
+    names = sorted(resolver.ids)
+    for scale in scales:
+        case = 'synthetic-' + str(scale) + 'x'  # not a drop source of any builder, built by the monster builder
+        results += benchmark_page(case, case, synthetic_page(BASE_ROWS * scale, names),
+                                  max(1, repeat * 10 // scale))  # big pages are run fewer times
+    return results
+
+
+# git_commit returns the commit being benchmarked, None if it is not known
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# report returns the results of a run with what they were measured on
+def report(results):
+    with open(ITEMS_SNAPSHOT, encoding='utf-8') as f:
+        items_hash = json.load(f)['sha256']
+    return {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'items-snapshot': items_hash,
+        'results': results,
+    }
+
+
+# compare returns (case, stage, old seconds, new seconds, new / old) for every stage found in both results files
+def compare(old, new):
+    old_times = {(result['case'], result['stage']): result['min'] for result in old['results']}
+    comparison = []
+    for result in new['results']:
+        key = (result['case'], result['stage'])
+        if key in old_times and old_times[key] > 0:
+            comparison.append(key + (old_times[key], result['min'], result['min'] / old_times[key]))
+    return comparison
+
+
+# print_results prints the results of a run as a table
+def print_results(results):
+    table = pd.DataFrame(results)[['case', 'stage', 'rows', 'min', 'median', 'per-row']]
+    pd.set_option('display.max_rows', None, 'display.width', 200)
+    print(table.to_string(index=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks every stage of building a table')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help='record the fixture pages and the osrsbox items snapshot')
+    record_parser.add_argument('--offline', action='store_true', help='record the pages from the page cache')
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('-o', '--output', default=None, help='json file the results are written to')
+    run_parser.add_argument('--repeat', type=int, default=5, help='times each stage is run, the fastest is kept')
+    run_parser.add_argument('--scales', type=int, nargs='*', default=SCALES, help='row multiples of synthetic pages')
+    run_parser.add_argument('--fixtures-dir', default=FIXTURES_DIR, help='directory the recorded pages are read from')
+
+    compare_parser = commands.add_parser('compare', help='compare two results files')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=1.1,
+                                help='new / old ratio above which a stage is reported as a regression')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        WikiFetcher.configure(offline=args.offline)
+        record()
+    elif args.command == 'run':
+        results = run(args.repeat, args.scales, args.fixtures_dir)
+        print_results(results)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report(results), f, indent=1)
+    else:
+        with open(args.old, encoding='utf-8') as f:
+            old = json.load(f)
+        with open(args.new, encoding='utf-8') as f:
+            new = json.load(f)
+        for case, stage, old_time, new_time, ratio in compare(old, new):
+            flag = '  REGRESSION' if ratio > args.threshold else ''
+            print(case + ' ' + stage + ': ' + '%.4f' % old_time + 's -> ' + '%.4f' % new_time + 's (' +
+                  '%.2f' % ratio + 'x)' + flag)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+# Many drop sources have the same sub-tables in them: the rare drop table and the gem, herb and seed drop tables.
+# SubTables finds these sections in a built table and factors out the rate each one is rolled at. The rows left over
+# are identified by the hash of their contents, so every source with the same sub-table shares one copy of it. The
+# table keeps a single reference row in place of each sub-table, with the id of the sub-table in the subtable column
+# and the roll rate as its rarity. Each row of a sub-table is dropped at the roll rate times its own rarity, see
+# expand_table. Only sections of main or pre-roll drops are shared, their rows are one roll of the table. Tertiary drops
+# are each rolled on their own, so they always stay in the table. Sub-tables are kept in an in-process cache and written
+# once per process to the subtables directory of the output directory, and the ones no table references any more are
+# removed by prune_subtables.
+import hashlib
+import json
+import os
+import re
+import threading
+from fractions import Fraction
+
+import pandas as pd
+
+from BuildManifest import write_if_changed
+
+# headings of the sections that are shared between drop sources
+SHARED_SECTIONS = re.compile(r'rare drop table|gem drop table|herb drop table|seed drop table', re.IGNORECASE)
+SHARED_DROP_TYPES = {'', 'pre-roll'}  # drop types rolled once for the whole section, see DropSimulator
+SUBTABLE_DIR = 'subtables'  # where sub-tables are written inside the output directory
+SUBTABLE_COLUMNS = ['name', 'quantity', 'rarity', 'rolls', 'rarity-numerator', 'rarity-denominator', 'quantity-min',
+                    'quantity-max', 'id', 'drop-type']
+MIN_ROWS = 2  # sections with fewer rows are left in the table
+REFERENCE = re.compile(r'"subtable":"([0-9a-f]{16})"')  # a reference to a sub-table in the json of a table
+
+
+class SubTableCache:
+    # every sub-table seen by this process, by id, and the directories each one was written to
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tables = {}  # id -> sub-table
+        self.written = set()  # (directory, id) of every sub-table written
+
+    # add stores a sub-table and returns its id, a sub-table already in the cache is not stored again
+    def add(self, subtable):
+        subtable_id = content_id(subtable)
+        with self.lock:
+            self.tables.setdefault(subtable_id, subtable)
+        return subtable_id
+
+    # write writes a sub-table to a directory unless it was already written there by this process
+    def write(self, directory, subtable_id):
+        with self.lock:
+            if (directory, subtable_id) in self.written:
+                return
+            self.written.add((directory, subtable_id))
+            subtable = self.tables[subtable_id]
+        os.makedirs(directory, exist_ok=True)
+        write_if_changed(os.path.join(directory, subtable_id + '.json'), subtable.to_json(orient='table'))
+
+    # forget forgets that a sub-table was written to a directory, i.e., after it was removed
+    def forget(self, directory, subtable_id):
+        with self.lock:
+            self.written.discard((directory, subtable_id))
+
+
+_cache = SubTableCache()
+
+
+# get_cache returns the sub-table cache of this process
+def get_cache():
+    return _cache
+
+
+# content_id returns the id of a sub-table, the start of the sha256 of its rows
+def content_id(subtable):
+    rows = subtable[SUBTABLE_COLUMNS].astype(object).where(subtable[SUBTABLE_COLUMNS].notna(), None)
+    data = json.dumps(rows.values.tolist(), default=str, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+
+
+# exact_rarities returns the rarity of every row as a Fraction, None if any row has no exact rarity
+def exact_rarities(rows):
+    numerators = rows['rarity-numerator']
+    denominators = rows['rarity-denominator']
+    if numerators.isna().any() or denominators.isna().any() or (denominators == 0).any():
+        return None
+    return [Fraction(int(numerator), int(denominator)) for numerator, denominator in zip(numerators, denominators)]
+
+
+# set_rarities sets the rarity columns of rows from a list of Fractions
+def set_rarities(rows, rarities):
+    rows['rarity'] = [float(rarity) for rarity in rarities]
+    rows['rarity-numerator'] = [rarity.numerator for rarity in rarities]
+    rows['rarity-denominator'] = [rarity.denominator for rarity in rarities]
+
+
+# split_section returns the sub-table of the rows of a section and the rate it is rolled at, or None if the section
+# can not be shared: its rows are not all of one drop type rolled once for the section, or not all exact
+def split_section(rows):
+    drop_types = set(rows['drop-type'].fillna(''))
+    if len(drop_types) != 1 or not drop_types <= SHARED_DROP_TYPES:
+        return None
+    rarities = exact_rarities(rows)
+    if rarities is None or len(rows) < MIN_ROWS:
+        return None
+    rate = sum(rarities, Fraction(0))
+    if rate == 0:
+        return None
+
+    subtable = rows[SUBTABLE_COLUMNS].copy()
+    set_rarities(subtable, [rarity / rate for rarity in rarities])
+    subtable = subtable.sort_values(['name', 'id'], kind='stable').reset_index(drop=True)
+    return subtable, rate
+
+
+# reference_row returns the row that stands in for a sub-table in a table
+def reference_row(heading, subtable_id, subtable, rate, columns):
+    row = {column: None for column in columns}
+    row.update({
+        'name': heading,
+        'quantity': '1',
+        'rarity': float(rate),
+        'section': heading,
+        'rolls': 1,
+        'rarity-numerator': rate.numerator,
+        'rarity-denominator': rate.denominator,
+        'quantity-min': 1,
+        'quantity-max': 1,
+        'id': -1,  # not an item
+        'drop-type': subtable['drop-type'].fillna('').iloc[0],  # every row has the same, see split_section
+        'subtable': subtable_id,
+    })
+    return row
+
+
+# share_subtables replaces every shared section of a built table with a reference to its sub-table, and writes the
+# sub-tables to the subtables directory of output_dir
+def share_subtables(table, output_dir):
+    directory = os.path.join(output_dir, SUBTABLE_DIR)
+    table = table.reset_index(drop=True)
+    columns = list(table.columns) + ['subtable']
+
+    rows = []
+    shared = set()
+    for position, heading in enumerate(table['section']):
+        if heading in shared:
+            continue
+        if not isinstance(heading, str) or not SHARED_SECTIONS.search(heading):
+            rows.append(dict(table.iloc[position], subtable=None))
+            continue
+
+        section = table[table['section'] == heading]
+        split = split_section(section)
+        if split is None:
+            rows.append(dict(table.iloc[position], subtable=None))
+            continue
+
+        subtable, rate = split
+        subtable_id = _cache.add(subtable)
+        _cache.write(directory, subtable_id)
+        rows.append(reference_row(heading, subtable_id, subtable, rate, columns))
+        shared.add(heading)
+
+    return pd.DataFrame(rows, columns=columns).astype(table.dtypes.to_dict())
+
+
+# read_subtable reads a sub-table from the subtables directory of output_dir
+def read_subtable(output_dir, subtable_id):
+    return pd.read_json(os.path.join(output_dir, SUBTABLE_DIR, subtable_id + '.json'), orient='table')
+
+
+# expand_table turns a table with references to sub-tables back into a flat table, each reference is replaced by the
+# rows of its sub-table at the rarity they are dropped at
+def expand_table(table, output_dir):
+    if 'subtable' not in table.columns:
+        return table
+
+    parts = []
+    for _, row in table.iterrows():
+        if not isinstance(row['subtable'], str):
+            parts.append(row.to_frame().T)
+            continue
+        subtable = read_subtable(output_dir, row['subtable'])
+        rate = Fraction(int(row['rarity-numerator']), int(row['rarity-denominator']))
+        set_rarities(subtable, [rate * rarity for rarity in exact_rarities(subtable)])
+        subtable['section'] = row['section']
+        parts.append(subtable)
+
+    flat = pd.concat(parts, ignore_index=True).drop(columns='subtable')
+    return flat.astype({column: dtype for column, dtype in table.dtypes.items() if column in flat.columns})
+
+
+# prune_subtables removes every sub-table in the subtables directory of output_dir that no table in output_dir, or in
+# any of its subdirectories, references. Returns the ids of the sub-tables removed
+def prune_subtables(output_dir):
+    directory = os.path.join(output_dir, SUBTABLE_DIR)
+    if not os.path.isdir(directory):
+        return []
+
+    referenced = set()
+    for table_directory, directories, file_names in os.walk(output_dir):
+        if table_directory == output_dir and SUBTABLE_DIR in directories:
+            directories.remove(SUBTABLE_DIR)
+        for file_name in file_names:
+            if file_name.endswith('.json'):
+                with open(os.path.join(table_directory, file_name), encoding='utf-8') as f:
+                    referenced.update(REFERENCE.findall(f.read()))
+
+    removed = []
+    for file_name in sorted(os.listdir(directory)):
+        subtable_id = file_name[:-len('.json')]
+        if file_name.endswith('.json') and subtable_id not in referenced:
+            os.remove(os.path.join(directory, file_name))
+            _cache.forget(directory, subtable_id)
+            removed.append(subtable_id)
+    return removed
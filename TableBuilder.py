@@ -3,90 +3,259 @@
 # to scrape the wiki was too long for anyone to enjoy the plugin. This supplementary python script scrapes the wiki
 # and builds a json file for each table to be included in the plugin resources folder. The plugin will still use the
 # osrs-box api for all npcs, this is just for all non-npc tables not included in the osrs-box api.
-import pandas as pd
-import requests
-import re
-from osrsbox import items_api as items
+#
+# pandas, numpy and the page parsers are imported by the functions that need them, so listing the drop sources or
+# skipping tables whose inputs did not change starts without importing them.
+import argparse
+import logging
+import os
+import sys
+from BuildManifest import BuildManifest, page_hash, write_if_changed
+import BuildReport
+from BuildReport import count, stage
+from DropTypeClassifier import classify_table, get_rules
+from ItemResolver import get_resolver, items_snapshot_hash
+from TableVariants import derive_variants, get_variants, tag_table, variant_name
+import WikiFetcher
+from WikiFetcher import fetch_page, fetch_pages, fetch_wikitext
+
+# bump whenever the cleaning or classification rules change, every table is then built again
+RULES_VERSION = 8
+
+# where the drop tables are read from, 'html' for the rendered wiki page or 'wikitext' for the raw wikitext of the page
+source_backend = 'html'
+
+# add precomputed alias tables of the main and pre-roll drops to each json file, see AliasTables
+alias_tables = False
+
+# 'flat' writes every row of every table, 'shared' writes the sub-tables shared between drop sources once and has the
+# tables reference them, see SubTables
+output_format = 'flat'
+
+# pack every table into a single memory mappable bundle file as well, see TableBundle
+bundle_tables = False
+bundle_name = 'drop_tables.bundle'
+
+# also export every table into this SQLite database after building, None for no database, see TableDatabase
+database_path = None
+
+# where the json files and bundle are written, i.e., the resources folder of the drop simulator plugin
+output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output')
+manifest_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build_manifest.json')
+
+_manifest = None
+
+logger = logging.getLogger(__name__)
+
+beginner = 'beginner_casket'
+easy = 'easy_casket'
+medium = 'medium_casket'
+hard = 'hard_casket'
+elite = 'elite_casket'
+master = 'master_casket'
+
+all_clues = [beginner, easy, medium, hard, elite, master]
+
+barrows = 'barrows_chest'
+tob = 'theatre'
+unsired = 'unsired'
+guardians = 'grotesque_guardians'
+
+all_non_npc_tables = [barrows, tob, unsired, guardians]
+
+cox = 'chambers of xeric'
+cox_file = 'chambers'  # name of the json file of the cox table
+cox_grid_file = 'chambers_points'  # name of the json file of the points grid of the cox table, see CoxPoints
+cox_points = 30000  # points of the raid the quantities of the cox table are for
+
+kree = 'kree\'arra'
+graardor = 'graardor'
+kril = 'k\'ril'
+zilyana = 'zilyana'
+
+all_gwd_tables = [kree, graardor, kril, zilyana]
+
+zulrah = 'zulrah'  # not a slayer boss but fits well here
+kraken = 'kraken'
+thermy = 'thermonuclear_smoke_devil'
+cerberus = 'cerberus'
+sire = 'abyssal_sire'
+hydra = 'alchemical_hydra'
+
+all_slayer_boss_tables = [zulrah, kraken, thermy, cerberus, sire, hydra]
+
+# the drop type rule set of each builder, see drop_type_rules.json
+rule_groups = {
+    'build_clue_table': 'clue',
+    'build_non_npc_table': 'non_npc',
+    'build_cox_table': 'cox',
+    'build_gwd_boss_table': 'gwd_boss',
+    'build_slayer_boss_table': 'slayer_boss',
+    'build_monster_table': 'monster',
+}
+
+# every drop source with a table, in the order they are built
+all_drop_sources = all_clues + all_non_npc_tables + [cox] + all_gwd_tables + all_slayer_boss_tables
+
+# the name of the json file of every table, in the order they are built
+all_output_names = all_clues + all_non_npc_tables + [cox_file] + all_gwd_tables + all_slayer_boss_tables
+
+
+# get_manifest returns the build manifest, it is only read from disk the first time
+def get_manifest():
+    global _manifest
+    if _manifest is None:
+        _manifest = BuildManifest(manifest_path, output_dir)
+    return _manifest
+
+
+# flush writes the build manifest and the index of the page cache to disk, both are only written every so often while
+# tables are built
+def flush():
+    get_manifest().flush()
+    WikiFetcher.flush_cache()
+
+
+# output_path returns the path of the json file of a table
+def output_path(name):
+    return os.path.join(output_dir, name + '.json')
+
+
+# table_to_json builds the table of a drop source with the given builder and writes it to a json file named after the
+# drop source, or file_name if given. Every variant of the table that differs from it, see TableVariants, is derived
+# from the same build and written to a json file with the name of the variant appended. The table is only built if the
+# wiki page, the osrsbox items db or the rules changed since the file was last written, and each file is only rewritten
+# if its contents changed. Returns true if the table was built
+def table_to_json(build, drop_source, file_name=None, force=False):
+    with BuildReport.source(drop_source):  # every stage and counter below is recorded under the drop source
+        name = file_name or drop_source
+        path = output_path(name)
+        group = rule_groups[build.__name__]
+        backend = 'html' if build is build_cox_table else source_backend  # cox is always read from the rendered page
+        inputs = {
+            'builder': build.__name__,
+            'backend': backend,
+            'page': page_hash(fetch_page(drop_source) if backend == 'html' else fetch_wikitext(drop_source)),
+            'items': items_snapshot_hash(),
+            'rules': RULES_VERSION,
+            'classification': get_rules(group, drop_source).hash,
+            'alias-tables': alias_tables,
+        }
+        if build is build_cox_table:
+            inputs['cox-points'] = cox_points
+        if output_format != 'flat':
+            inputs['format'] = output_format
+
+        manifest = get_manifest()
+        if not force and manifest.is_current(path, inputs):
+            BuildReport.get_report().set('skipped', True)
+            logger.debug('skipping %s, nothing changed', drop_source)
+            return False
+
+        table = build(drop_source)  # every row of the page, each variant is a view of it
+        with stage('variants'):
+            variants = derive_variants(tag_table(table, drop_source, group), drop_source, group)
+        count('rows-written', len(variants['']))
+
+        for variant in get_variants(drop_source, group):
+            variant_path = output_path(variant_name(name, variant))
+            if variant not in variants:
+                if os.path.exists(variant_path):
+                    os.remove(variant_path)  # the variant has the same rows as the table now
+                continue
+            table = variants[variant]
+            if output_format == 'shared':
+                from SubTables import share_subtables
+                with stage('subtables'):
+                    table = share_subtables(table, output_dir)
+            with stage('serialize'):
+                if alias_tables:
+                    from AliasTables import table_json_with_sampling
+                    from SubTables import expand_table
+                    text = table_json_with_sampling(table, expand_table(table, output_dir))
+                else:
+                    text = table.to_json(orient='table')
+            with stage('write'):
+                os.makedirs(os.path.dirname(variant_path), exist_ok=True)
+                written = write_if_changed(variant_path, text)
+            logger.info('built %s, %d rows%s', variant_name(drop_source, variant), len(table),
+                        '' if written else ', unchanged')
+        manifest.record(path, inputs)
+        return True
+
+
+# fetch_sources downloads the pages of every drop source in parallel, html or wikitext depending on source_backend
+def fetch_sources(drop_sources):
+    if source_backend == 'wikitext':
+        return fetch_pages(drop_sources, fetch_wikitext)
+    return fetch_pages(drop_sources)
+
+
+# read_drop_tables returns every drop table of a drop source, with Item, Quantity, Rarity and section columns, read
+# from the rendered page or the wikitext of the page depending on source_backend
+def read_drop_tables(drop_source):
+    from DropTableExtractor import extract_drop_tables
+    from WikitextParser import parse_drop_tables
+
+    if source_backend == 'wikitext':
+        wikitext = fetch_wikitext(drop_source)
+        with stage('parse'):
+            tables = parse_drop_tables(wikitext)
+    else:
+        html = fetch_page(drop_source)
+        with stage('parse'):
+            tables = extract_drop_tables(html)  # only the drop tables on the page, with their section
+    count('rows-parsed', sum(len(table) for table in tables))
+    return tables
 
 
 # clean_up_table cleans up a table from the osrs wiki page - not applicable to clue tables or cox
 def clean_up_table(drop_source):
-    url = 'https://oldschool.runescape.wiki/w/' + drop_source
-    response = requests.get(url)
-
-    tables = []
-    html_tables = pd.read_html(response.text)
+    return clean_tables(read_drop_tables(drop_source))  # pages prefetched by fetch_sources are not downloaded again
 
-    for table in html_tables:  # for each table on the page
 
-        if len(table.columns) > 4:  # if there is more than four columns
-            if table.columns[4] == 'Price':  # if it is a table containing items
-                tables.append(table)  # it is a table we want
+# clean_tables joins the drop tables read from a page and cleans them up into a single table
+def clean_tables(tables):
+    import pandas as pd
+    from TableNormalizer import normalize_table
 
-    table = pd.concat(tables)  # join all needed tables together
+    with stage('clean'):
+        table = pd.concat(tables)  # join all needed tables together
 
-    del table['Unnamed: 0']  # delete unnamed column
-    del table['Price']  # delete price column
-    del table['High Alch']  # delete high alch column
-    table.columns = table.columns.str.lower()  # remove capitalization from each column name
-    table.columns = table.columns.str.replace("item", "name", regex=True)
-    table['rarity'] = table['rarity'].apply(lambda x: '1/1' if 'Always' in x else x)  # replaces always with 1/1
-    table = table[table.name != 'Nothing']  # remove nothing drop
-    table['rarity'] = table['rarity'].str.replace(',', "", regex=True)  # removes commas from rarity
-    table['rarity'] = table['rarity'].apply(lambda x: re.sub(r'^.*?\u00D7', "", x))  # removes rolls x from rarity
-    table['rarity'] = table['rarity'].apply(lambda x: re.sub("[\[].*?[\]]", "", x))  # removes annotations [~]
-    table['rarity'] = table['rarity'].apply(lambda x: re.sub(';.*$', "", x))  # remove row rarities from rarity, ;____
-    table['quantity'] = table['quantity'].apply(
-        lambda x: re.sub("[\(].*?[\)]", "", str(x)).strip())  # remove (noted)
-    table['quantity'] = table['quantity'].apply(
-        lambda x: re.sub(u"\u2013", "-", str(x)))  # replaces en dash with regular dash
-    table['quantity'] = table['quantity'].str.replace(',', "", regex=True)  # removes commas from quantity
-    table['rarity'] = table['rarity'].apply(lambda x: re.sub('\u2013.*$', "", x))  # removes rarity interval from rarity
-    table['rarity'] = table['rarity'].apply(pd.eval)  # evaluates each rarity as double
-    table['quantity'] = table['quantity'].apply(lambda x: re.sub('\..*$', "", x))  # remove decimals from quantity
+        table = table[['Item', 'Quantity', 'Rarity', 'section']]  # keep only the item, quantity and rarity columns
+        table.columns = table.columns.str.lower()  # remove capitalization from each column name
+        table.columns = table.columns.str.replace("item", "name", regex=True)
+        table = table[table.name != 'Nothing']  # remove nothing drop
+        table = normalize_table(table)  # cleans and parses each rarity and quantity
 
     return table
 
 
 # build_clue_table builds a clue table from the osrs wiki
 def build_clue_table(drop_source):
-    url = 'https://oldschool.runescape.wiki/w/' + drop_source
-    response = requests.get(url)
+    import pandas as pd
+    from TableNormalizer import normalize_table
 
     tables = []
-    html_tables = pd.read_html(response.text)
 
-    for table in html_tables:  # for each table on the page
+    for table in read_drop_tables(drop_source):  # for each drop table on the page
 
-        if table.columns[1] == 'Item':  # if it is a table containing items
-            if table.Rarity[0] != 'Common':  # if it is a table with only numeric entries
-                tables.append(table)  # it is a table we want
+        if table.Rarity[0] != 'Common':  # if it is a table with only numeric entries
+            tables.append(table)  # it is a table we want
 
     table = pd.concat(tables)  # join all needed tables together
 
-    del table['Unnamed: 0']  # delete unnamed column
-    del table['Price']  # delete price column
-    del table['High Alch']  # delete high alch column
+    table = table[['Item', 'Quantity', 'Rarity', 'section']]  # keep only the item, quantity and rarity columns
     table.columns = table.columns.str.lower()  # remove capitalization from each column name
     table.columns = table.columns.str.replace("item", "name", regex=True)
-    table['rarity'] = table['rarity'].apply(lambda x: '1/1' if 'Always' in x else x)  # replaces always with 1/1
-    table = table[table.rarity != '1/1']  # remove all always drops
-    table['rarity'] = table['rarity'].str.replace(',', "", regex=True)  # removes commas from rarity
-    table['rarity'] = table['rarity'].apply(lambda x: re.sub("[\[].*?[\]]", "", x))  # removes annotations [~]
-    table['quantity'] = table['quantity'].apply(
-        lambda x: re.sub("[\(].*?[\)]", "", str(x)).strip())  # remove (noted)
-    table['quantity'] = table['quantity'].apply(
-        lambda x: re.sub(u"\u2013", "-", str(x)))  # replaces en dash with regular dash
-    table['quantity'] = table['quantity'].str.replace(',', "", regex=True)  # removes commas from quantity
-    table['rarity'] = table['rarity'].apply(pd.eval)  # evaluates each rarity as double
+    with stage('clean'):
+        table = normalize_table(table)  # cleans and parses each rarity and quantity
+    table = table[table.rarity != 1.0]  # remove all always drops
 
     # Special cases
 
     # Hard clue table contains a "Zombie head (treasure trails), but the osrsbox api has the name as "Zombie head," so
-    # (treasure trails must be removed from the name
-
-    table['name'] = table['name'].apply(
-        lambda x: re.sub("[\(]Treasure Trails[\)]", "", str(x)).strip())  # remove (Treasure Trails)
+    # (treasure trails must be removed from the name. The item resolver takes care of this when resolving the ids
 
     # The mega-rare hard table includes 3 rows for super att, str, and def (4). All 3 are dropped together, so to keep
     # the simulation accurate, the 3 drops are replaced with a single row of the super attack box which contains all
@@ -98,408 +267,345 @@ def build_clue_table(drop_source):
 
     # store ids in a new column gathered from the osrs-box db
 
-    ids_to_be_added = []  # ids of each item
-    drop_types_to_be_added = []  # type of drop of each item
-
-    my_items = items.load()
-
-    # get the id of each item gathered from the wiki by using the osrs-box db
-
-    for row in table.iterrows():
-        for item in my_items:
-            if item.name == row[1]['name'] and item.duplicate is False:
-                print(item.name)
-
-                if item.name == 'Coins':  # special case for coins
-                    ids_to_be_added.append(995)  # specific coin id needed
-                else:
-                    ids_to_be_added.append(int(item.id))
-
-                # determine the drop type
-                # Determining the type for clue tables is easy:
-                # If it is a clue scroll drop or bloodhound, it is tertiary
-                # Everything else is a main drop
-
-                if item.name.__contains__("Clue scroll") or item.name == 'Bloodhound':
-                    drop_types_to_be_added.append('tertiary')  # tertiary
-                else:
-                    drop_types_to_be_added.append('')  # empty cases of this column are to be considered main drops
-                break
-
-    table['id'] = ids_to_be_added
-    table['drop-type'] = drop_types_to_be_added
+    table = get_resolver().resolve_table(table, drop_source)
+    table = classify_table(table, 'clue', drop_source)  # determine the drop type of each item
     return table
 
 
 # build_gwd_boss_table builds a gwd table from the osrs wiki
 def build_gwd_boss_table(drop_source):
-    table = clean_up_table(drop_source)
-    table = table[table.name != 'Super defence(3)']  # removes super def 3 from zilyana and kree
-    if drop_source != 'graardor':
-        table = table[table.name != 'Super restore(4)']  # remove super restore 4 from zilyana but not graardor
-    table = table[table.name != 'Super restore(3)']  # remove super restore 3 from kril
-    table = table[table.name != 'Super strength(3)']  # remove super strength 3 from kril
+    table = clean_up_table(drop_source)  # potions the simulator does not roll are tagged excluded, see TableVariants
     # store ids in a new column gathered from the osrs-box db
 
-    ids_to_be_added = []  # ids of each item
-    drop_types_to_be_added = []  # type of drop of each item
-
-    my_items = items.load()
-
-    # get the id of each item gathered from the wiki by using the osrs-box db
-
-    for row in table.iterrows():
-        for item in my_items:
-            if item.name == row[1]['name'] and item.duplicate is False:
-                print(item.name)
-
-                if item.name == 'Coins':  # special case for coins
-                    ids_to_be_added.append(995)  # specific coin id needed
-                else:
-                    ids_to_be_added.append(int(item.id))
-
-                if row[1]['rarity'] == 1.0:  # if 100% rarity
-                    drop_types_to_be_added.append('always')
-                    break
-                # determine the drop type
-                if item.name.__contains__('Pet') or \
-                        item.name.__contains__("Brimstone") or \
-                        item.name.__contains__('Clue') or \
-                        item.name.__contains__('Long') or \
-                        item.name.__contains__('Curved'):
-                    drop_types_to_be_added.append('tertiary')  # tertiary
-                else:
-                    drop_types_to_be_added.append('')  # main drop
-                break
-
-    table['id'] = ids_to_be_added
-    table['drop-type'] = drop_types_to_be_added
+    table = get_resolver().resolve_table(table, drop_source)
+    table = classify_table(table, 'gwd_boss', drop_source)  # determine the drop type of each item
     return table
 
 
 # build_non_npc_table builds a non_npc_table from the osrs wiki that is NOT a clue scroll drop table
 def build_non_npc_table(drop_source):
-    table = clean_up_table(drop_source)
-    table = table[table.name != 'Cabbage']  # remove cabbage drops from tob
-    table = table[table.name != 'Message (Theatre of Blood)']  # remove message drop from tob
-    table = table[table.name != 'Magic potion(2)']  # remove magic potion(2) from grotesque guardians
-    table = table[table.name != 'Ranging potion(2)']  # remove ranging potion(2) from grotesque guardians
-    table = table[table.name != 'Bludgeon axon']  # remove bludgeon axon from unsired
-    table = table[table.name != 'Bludgeon spine']  # remove bludgeon spine from unsired
+    table = clean_up_table(drop_source)  # raid specific rows are tagged, not removed, see TableVariants
 
     # store ids in a new column gathered from the osrs-box db
 
-    ids_to_be_added = []  # ids of each item
-    drop_types_to_be_added = []  # type of drop of each item
-
-    my_items = items.load()
-
-    # get the id of each item gathered from the wiki by using the osrs-box db
-
-    for row in table.iterrows():
-        for item in my_items:
-            if item.name == row[1]['name'] and item.duplicate is False:
-                print(item.name)
-
-                if item.name == 'Coins':  # special case for coins
-                    ids_to_be_added.append(995)  # specific coin id needed
-                else:
-                    ids_to_be_added.append(int(item.id))
-
-                if row[1]['rarity'] == 1.0:  # if 100% rarity
-                    drop_types_to_be_added.append('always')
-                    break;
-                # determine the drop type
-
-                if item.name.__contains__("Clue scroll") or \
-                        item.name.__contains__("zik") or \
-                        item.name.__contains__('Brimstone') or \
-                        item.name.__contains__('Noon') or \
-                        item.name.__contains__('Jar of stone'):
-                    drop_types_to_be_added.append('tertiary')  # tertiary
-                    # anything with 's in the name is possessive. i.e., Guthan's
-                elif item.name.__contains__("'s") or \
-                        item.name.__contains__('Justiciar') or \
-                        item.name.__contains__('Ghrazi') or \
-                        item.name.__contains__('Sanguinesti') or \
-                        item.name.__contains__('Avernic') or \
-                        item.name.__contains__('vitur') or \
-                        item.name.__contains__('Granite') or \
-                        item.name.__contains__('tourmaline'):
-                    drop_types_to_be_added.append('pre-roll')  # pre-roll
-                else:
-                    drop_types_to_be_added.append('')  # main drop
-                break
-
-    table['id'] = ids_to_be_added
-    table['drop-type'] = drop_types_to_be_added
+    table = get_resolver().resolve_table(table, drop_source)
+    table = classify_table(table, 'non_npc', drop_source)  # determine the drop type of each item
     return table
 
 
 # build_all_clue_tables builds all clue tables from the osrs wiki and writes each table to an individual json file
-def all_clue_tables_to_json():
-    beginner = 'beginner_casket'
-    easy = 'easy_casket'
-    medium = 'medium_casket'
-    hard = 'hard_casket'
-    elite = 'elite_casket'
-    master = 'master_casket'
-
-    all_clues = [beginner, easy, medium, hard, elite, master]
+def all_clue_tables_to_json(force=False):
+    fetch_sources(all_clues)  # download every page at once before building
 
     for clue in all_clues:  # for each clue scroll
-        clue_table = build_clue_table(clue)  # builds the table
-        clue_table.to_json(path_or_buf='C:/Users/Marshall/IdeaProjects/drop-simulator/src/main/resources/' + clue +
-                                       '.json',
-                           orient='table')
+        table_to_json(build_clue_table, clue, force=force)  # builds the table if its inputs changed
 
 
 # build_all_non_npc_tables_to_json builds all non_npc_tables from the osrs wiki and writes each table to an individual
 # json file
-def all_non_npc_tables_to_json():
-    barrows = 'barrows_chest'
-    tob = 'theatre'
-    unsired = 'unsired'
-    guardians = 'grotesque_guardians'
-
-    all_non_npc_tables = [barrows, tob, unsired, guardians]
+def all_non_npc_tables_to_json(force=False):
+    fetch_sources(all_non_npc_tables)  # download every page at once before building
 
     for table in all_non_npc_tables:
-        non_npc_table = build_non_npc_table(table)
-        non_npc_table.to_json(path_or_buf='C:/Users/Marshall/IdeaProjects/drop-simulator/src/main/resources/' + table +
-                                          '.json',
-                              orient='table')
+        table_to_json(build_non_npc_table, table, force=force)
 
 
 # all_gwd_boss_tables_to_json builds all gwd boss tables from the osrs wiki and writes each table to an individual .json
 # file
-def all_gwd_boss_tables_to_json():
-    kree = 'kree\'arra'
-    graardor = 'graardor'
-    kril = 'k\'ril'
-    zilyana = 'zilyana'
-
-    all_gwd_tables = [kree, graardor, kril, zilyana]
+def all_gwd_boss_tables_to_json(force=False):
+    fetch_sources(all_gwd_tables)  # download every page at once before building
 
     for table in all_gwd_tables:
-        gwd_table = build_gwd_boss_table(table)
-        gwd_table.to_json(path_or_buf='C:/Users/Marshall/IdeaProjects/drop-simulator/src/main/resources/' + table +
-                                      '.json',
-                          orient='table')
+        table_to_json(build_gwd_boss_table, table, force=force)
 
 
-# cox_table_to_json builds the tob table from the osrs wiki and writes the table to an individual json file
+# build_cox_table builds the cox table from the osrs wiki
 # cox needs its own method because it is unique, no other drop source is rolled like cox
-def cox_table_to_json():
-    url = 'https://oldschool.runescape.wiki/w/chambers of xeric'
-    response = requests.get(url)
+def build_cox_table(drop_source=cox):
+    import pandas as pd
+    from CoxPoints import loot_quantities
+    from DropTableExtractor import extract_drop_tables
+    from TableNormalizer import normalize_quantity, normalize_table
+
+    html = fetch_page(drop_source)
+    with stage('parse'):
+        page_tables = extract_drop_tables(html, ('Item', 'Rarity'))
+    count('rows-parsed', sum(len(table) for table in page_tables))
 
     tables = []
-    html_tables = pd.read_html(response.text)
-
-    for table in html_tables:  # for each table on the page
-
-        if len(table.columns) > 1:
-            if table.columns[1] == 'Item.1':  # if it is the pre-roll mess of a table on the wiki
-                del table['Item']  # delete the item column
-                del table['GE Price']  # delete ge price column
-                table.insert(1, 'quantity', str(1))
-                table.columns = ['name', 'quantity', 'rarity']
-                table['rarity'] = table['rarity'].apply(
-                    lambda x: re.sub(r'^.*?\(', "", x))  # removes everything before ( from rarity
-                table['rarity'] = table['rarity'].str.replace('%', "", regex=True)  # removes % from rarity
-                table['rarity'] = table['rarity'].str.replace(')', "", regex=True)  # removes ) from rarity
-                tables.append(table)
-        if len(table.columns) == 6:  # if there is more than four columns
-            if table.columns[4] == 'Price':  # if it is a table containing prices
-                del table['Unnamed: 0']  # delete unnamed column
-                del table['Price']  # delete price column
-                del table['High Alch']  # delete high alch column
-                table.columns = table.columns.str.lower()  # remove capitalization from each column name
-                table.columns = table.columns.str.replace("item", "name", regex=True)
-                tables.append(table)  # it is a table we want
+
+    for table in page_tables:  # for each table with items on the page
+
+        if 'Item.1' in table.columns:  # if it is the pre-roll mess of a table on the wiki
+            table = table[['Item.1', 'Rarity', 'section']]  # keep the item name and rarity columns
+            table.insert(1, 'quantity', str(1))
+            table.columns = ['name', 'quantity', 'rarity', 'section']
+            table['rarity'] = table['rarity'].str.extract(
+                r'[(](.*?%)[)]', expand=False)  # keeps only the percentage inside the () of the rarity
+            tables.append(table)
+        elif 'Quantity' in table.columns and 'Price' in table.columns:  # if it is a table containing prices
+            table = table[['Item', 'Quantity', 'Rarity', 'section']]  # keep only the item, quantity and rarity columns
+            table.columns = table.columns.str.lower()  # remove capitalization from each column name
+            table.columns = table.columns.str.replace("item", "name", regex=True)
+            tables.append(table)  # it is a table we want
 
     table = pd.concat(tables)
     pd.set_option("display.max_rows", None, "display.max_columns", None)
 
-    table['rarity'] = table['rarity'].apply(lambda x: '1/1' if 'Always' in x else x)  # replaces always with 1/1
-    table = table[table.rarity != '1/1']  # remove all always drops
-    table = table[table.name != 'Twisted ancestral colour kit']  # remove challenge mode only drop
-    table = table[table.name != 'Metamorphic dust']  # remove challenge mode only drop
-    table = table[table.name != 'Ancient tablet']  # remove ancient tablet drop
-    table['rarity'] = table['rarity'].str.replace(',', "", regex=True)  # removes commas from rarity
-    table['rarity'] = table['rarity'].apply(lambda x: re.sub(r'^.*?\u00D7', "", x))  # removes rolls x from rarity
-    table['rarity'] = table['rarity'].apply(lambda x: re.sub("[\[].*?[\]]", "", x))  # removes annotations [~]
-    table['quantity'] = table['quantity'].apply(
-        lambda x: re.sub("[\(].*?[\)]", "", str(x)).strip())  # remove (noted)
-    table['quantity'] = table['quantity'].apply(
-        lambda x: re.sub(u"\u2013", "-", str(x)))  # replaces en dash with regular dash
-    table['quantity'] = table['quantity'].str.replace(',', "", regex=True)  # removes commas from quantity
-    table['rarity'] = table['rarity'].apply(lambda x: re.sub('\u2013.*$', "", x))  # removes -1/6500 from rarity
-    table['rarity'] = table['rarity'].apply(pd.eval)  # evaluates each rarity as double
-    table['rarity'] = table['rarity'].apply(lambda x: x - 0.01 if x == 2.90 else x)  # subtracts 0.01 from mega rares
-    table['rarity'] = table['rarity'].apply(lambda x: x * .01 if x > 1 else x)  # converts to decimal
+    with stage('clean'):
+        table = normalize_table(table)  # cleans and parses each rarity and quantity
+    table = table[table.rarity != 1.0]  # remove all always drops
+    # challenge mode drops and the ancient tablet are tagged, not removed, see TableVariants
+
+    # subtracts 0.01% from mega rares, compared as a float since 2.9% and 2.90% have different numerators
+    mega_rare = table['rarity'] == 0.029
+    table.loc[mega_rare, 'rarity-numerator'] = 289
+    table.loc[mega_rare, 'rarity-denominator'] = 10000
+    table.loc[mega_rare, 'rarity'] = 289 / 10000
 
     # store ids in a new column gathered from the osrs-box db
 
-    ids_to_be_added = []  # ids of each item
-    drop_types_to_be_added = []  # type of drop of each item
-
-    my_items = items.load()
-
-    # translate assumed value of each quantity to rolled quantity at 30k points
-    table.loc[table.name == 'Death rune', 'quantity'] = "833"
-    table.loc[table.name == 'Blood rune', 'quantity'] = "937"
-    table.loc[table.name == 'Soul rune', 'quantity'] = "1500"
-    table.loc[table.name == 'Rune arrow', 'quantity'] = "2142"
-    table.loc[table.name == 'Dragon arrow', 'quantity'] = "148"
-    table.loc[table.name == 'Grimy ranarr weed', 'quantity'] = "38"
-    table.loc[table.name == 'Grimy toadflax', 'quantity'] = "57"
-    table.loc[table.name == 'Grimy irit leaf', 'quantity'] = "185"
-    table.loc[table.name == 'Grimy avantoe', 'quantity'] = "92"
-    table.loc[table.name == 'Grimy kwuarm', 'quantity'] = "79"
-    table.loc[table.name == 'Grimy snapdragon', 'quantity'] = "23"
-    table.loc[table.name == 'Grimy cadantine', 'quantity'] = "90"
-    table.loc[table.name == 'Grimy lantadyme', 'quantity'] = "120"
-    table.loc[table.name == 'Grimy dwarf weed', 'quantity'] = "150"
-    table.loc[table.name == 'Grimy torstol', 'quantity'] = "37"
-    table.loc[table.name == 'Silver ore', 'quantity'] = "1500"
-    table.loc[table.name == 'Coal', 'quantity'] = "1500"
-    table.loc[table.name == 'Gold ore', 'quantity'] = "681"
-    table.loc[table.name == 'Mithril ore', 'quantity'] = "937"
-    table.loc[table.name == 'Adamantite ore', 'quantity'] = "180"
-    table.loc[table.name == 'Runite ore', 'quantity'] = "15"
-    table.loc[table.name == 'Uncut sapphire', 'quantity'] = "159"
-    table.loc[table.name == 'Uncut emerald', 'quantity'] = "211"
-    table.loc[table.name == 'Uncut ruby', 'quantity'] = "123"
-    table.loc[table.name == 'Uncut diamond', 'quantity'] = "59"
-    table.loc[table.name == 'Lizardman fang', 'quantity'] = "1071"
-    table.loc[table.name == 'Pure essence', 'quantity'] = "15000"
-    table.loc[table.name == 'Saltpetre', 'quantity'] = "1250"
-    table.loc[table.name == 'Teak plank', 'quantity'] = "312"
-    table.loc[table.name == 'Mahogany plank', 'quantity'] = "126"
-    table.loc[table.name == 'Dynamite', 'quantity'] = "555"
-
-    # get the id of each item gathered from the wiki by using the osrs-box db
-
-    for row in table.iterrows():
-        for item in my_items:
-            if item.name == row[1]['name'] and item.duplicate is False:
-                print(item.name)
-
-                ids_to_be_added.append(int(item.id))
-
-                # determine the drop type
-                # Determining the type for clue tables is easy:
-                # If it is a clue scroll drop or bloodhound, it is tertiary
-                # Everything else is a main drop
-
-                if item.name.__contains__("Clue scroll") or item.name.__contains__("Olmlet"):
-                    drop_types_to_be_added.append('tertiary')  # tertiary
-                elif item.name.__contains__("Twisted") \
-                        or item.name.__contains__("Ancestral") \
-                        or item.name.__contains__("Dexterous") \
-                        or item.name.__contains__("Arcane") \
-                        or item.name.__contains__("claws") \
-                        or item.name.__contains__("hunter") \
-                        or item.name.__contains__("Dinh's") \
-                        or item.name.__contains__("Elder") \
-                        or item.name.__contains__("Kodai"):
-                    drop_types_to_be_added.append('pre-roll')  # pre-roll
-                else:
-                    drop_types_to_be_added.append('')  # main drop
+    table = get_resolver().resolve_table(table, drop_source)
 
-                break
+    # translate assumed value of each quantity to rolled quantity at cox_points points
+    quantities = loot_quantities(table['name'], cox_points)
+    modeled = quantities.notna()
+    table.loc[modeled, 'quantity'] = quantities[modeled].astype(int).astype(str)
+    table = normalize_quantity(table)  # parses the translated quantities again
 
-    table['id'] = ids_to_be_added
-    table['drop-type'] = drop_types_to_be_added
+    table = classify_table(table, 'cox', drop_source)  # determine the drop type of each item
+    return table
 
-    table.to_json(path_or_buf='C:/Users/Marshall/IdeaProjects/drop-simulator/src/main/resources/chambers.json',
-                  orient='table')
 
+# cox_table_to_json builds the cox table from the osrs wiki and writes the table to an individual json file
+def cox_table_to_json(force=False):
+    table_to_json(build_cox_table, cox, cox_file, force=force)
+    cox_grid_to_json()  # also when the table is unchanged, the grid of an older version of CoxPoints is replaced
 
-# build_slayer_boss_table builds the drop table for a boss that is a slayer boss
-def build_slayer_boss_table(drop_source):
-    table = clean_up_table(drop_source)
-    # store ids in a new column gathered from the osrs-box db
 
-    table = table[table.name != 'Hydra\'s fang']  # remove fang from hydra
-    table = table[table.name != 'Hydra\'s heart']  # remove heart from hydra
+# cox_grid_to_json writes the points grid of the cox table, the unique chance and the quantity of every non unique drop
+# from 0 points in steps of 1k points, to its own json file
+def cox_grid_to_json():
+    import json
+    import pandas as pd
+    from CoxPoints import points_grid
 
-    ids_to_be_added = []  # ids of each item
-    drop_types_to_be_added = []  # type of drop of each item
+    with stage('cox-grid'):
+        from SubTables import expand_table
+        table = expand_table(pd.read_json(output_path(cox_file), orient='table'), output_dir)
+        write_if_changed(output_path(cox_grid_file), json.dumps(points_grid(table)))
 
-    my_items = items.load()
 
-    # get the id of each item gathered from the wiki by using the osrs-box db
+# build_slayer_boss_table builds the drop table for a boss that is a slayer boss
+def build_slayer_boss_table(drop_source):
+    table = clean_up_table(drop_source)  # the fang and heart of hydra are tagged excluded, see TableVariants
+    # store ids in a new column gathered from the osrs-box db
 
-    for row in table.iterrows():
-        for item in my_items:
-            if item.name == row[1]['name'] and item.duplicate is False:
-                print(item.name)
+    table = get_resolver().resolve_table(table, drop_source)
+    table = classify_table(table, 'slayer_boss', drop_source)  # determine the drop type of each item
+    return table
 
-                if item.name == 'Coins':  # special case for coins
-                    ids_to_be_added.append(995)  # specific coin id needed
-                else:
-                    ids_to_be_added.append(int(item.id))
-
-                if row[1]['rarity'] == 1.0:  # if 100% rarity
-                    drop_types_to_be_added.append('always')
-                    break
-                # determine the drop type
-                if item.name.__contains__('Pet') or \
-                        item.name.__contains__("Brimstone") or \
-                        item.name.__contains__('Clue') or \
-                        item.name.__eq__('Hellpuppy') or \
-                        item.name.__eq__('Vorki') or \
-                        item.name.__contains__('Alchemical') or \
-                        item.name.__contains__('Ikkle') or \
-                        item.name.__contains__('Jar'):
-                    drop_types_to_be_added.append('tertiary')  # tertiary
-                elif item.name.__contains__('Hydra\'s') or \
-                        item.name.__contains__('thrownaxe') or \
-                        item.name.__eq__('Hydra tail') or \
-                        item.name.__eq__('Hydra leather') or \
-                        item.name.__eq__('Dragon knife'):
-                    drop_types_to_be_added.append('pre-roll')
-                else:
-                    drop_types_to_be_added.append('')  # main drop
-                break
 
-    table['id'] = ids_to_be_added
-    table['drop-type'] = drop_types_to_be_added
+# build_monster_table builds the table of any monster page with the generic monster rules, used by the bestiary
+# crawler for every npc that has no builder of its own
+def build_monster_table(drop_source):
+    table = clean_up_table(drop_source)
+    table = get_resolver().resolve_table(table, drop_source)
+    table = classify_table(table, 'monster', drop_source)  # determine the drop type of each item
     return table
 
 
 # all_slayer_boss_tables_to_json builds and writes the table of each slayer boss to an individual json file
-def all_slayer_boss_tables_to_json():
-    zulrah = 'zulrah'  # not a slayer boss but fits well here
-    kraken = 'kraken'
-    thermy = 'thermonuclear_smoke_devil'
-    cerberus = 'cerberus'
-    sire = 'abyssal_sire'
-    hydra = 'alchemical_hydra'
-
-    all_slayer_boss_tables = [zulrah, kraken, thermy, cerberus, sire, hydra]
+def all_slayer_boss_tables_to_json(force=False):
+    fetch_sources(all_slayer_boss_tables)  # download every page at once before building
 
     for table in all_slayer_boss_tables:  # for each clue scroll
-        boss_table = build_slayer_boss_table(table)  # builds the table
-        boss_table.to_json(path_or_buf='C:/Users/Marshall/IdeaProjects/drop-simulator/src/main/resources/' + table +
-                                       '.json',
-                           orient='table')
-
-
-# all_tables_to_json writes ALL tables to their own individual json file
-def all_tables_to_json():
-    all_clue_tables_to_json()
-    all_non_npc_tables_to_json()
-    cox_table_to_json()
-    all_gwd_boss_tables_to_json()
-    all_slayer_boss_tables_to_json()
-
-
-def main():
-    all_tables_to_json()
+        table_to_json(build_slayer_boss_table, table, force=force)  # builds the table if its inputs changed
+
+
+# all_tables_to_json writes ALL tables to their own individual json file, tables whose inputs did not change since
+# the last build are skipped unless force is set
+def all_tables_to_json(force=False):
+    sources_to_json(all_drop_sources, force)
+
+
+# sources_to_json writes the tables of the given drop sources to their own json file, the pages of every table are
+# downloaded at once first. Tables whose inputs did not change since the last build are skipped unless force is set
+def sources_to_json(drop_sources, force=False):
+    from SubTables import prune_subtables
+
+    if source_backend == 'wikitext':
+        fetch_sources([drop_source for drop_source in drop_sources if drop_source != cox])
+        if cox in drop_sources:
+            fetch_page(cox)  # cox is always read from the rendered page
+    else:
+        fetch_sources(drop_sources)
+
+    try:
+        for drop_source in drop_sources:
+            if drop_source == cox:
+                cox_table_to_json(force)
+            else:
+                table_to_json(source_builder(drop_source), drop_source, force=force)
+    finally:
+        flush()  # the tables built before a failure are not built again
+    prune_subtables(output_dir)  # sub-tables no table references any more
+    export_tables()
+
+
+# export_tables packs the bundle and exports the database after a build or a crawl, each only if it is turned on
+def export_tables():
+    if bundle_tables:
+        tables_to_bundle()
+    if database_path is not None:
+        tables_to_database()
+
+
+# tables_to_bundle packs the json file of every table in the output directory into a single bundle file, including the
+# tables in its subdirectories, i.e., crawled monsters. Sub-tables and files that are not tables are left out, the
+# tables are always flat. The bundle is only rewritten if its contents changed
+def tables_to_bundle():
+    from TableBundle import pack_bundle
+    from TableDatabase import read_json_table, table_files
+
+    tables = {}
+    with stage('bundle'):
+        for name, path in table_files(output_dir).items():
+            read = read_json_table(path, output_dir)
+            if read is not None:
+                tables[name] = read[0]
+        write_if_changed(os.path.join(output_dir, bundle_name), pack_bundle(tables))
+
+
+# tables_to_database exports every table in the output directory into the database at database_path, only the tables
+# whose json file changed since the last export are written to it
+def tables_to_database():
+    import TableDatabase
+
+    with stage('database'):
+        connection = TableDatabase.connect(database_path)
+        try:
+            written = TableDatabase.export(connection, output_dir)
+        finally:
+            connection.close()
+    logger.info('exported %d changed tables to %s', len(written), database_path)
+
+
+# every group of drop sources that can be built on its own, group -> (builder, drop sources of the group)
+groups = {
+    'clues': (build_clue_table, all_clues),
+    'non-npc': (build_non_npc_table, all_non_npc_tables),
+    'cox': (build_cox_table, [cox]),
+    'gwd': (build_gwd_boss_table, all_gwd_tables),
+    'slayer-bosses': (build_slayer_boss_table, all_slayer_boss_tables),
+}
+
+
+# source_builder returns the builder of a drop source, the generic monster builder for a drop source of no group
+def source_builder(drop_source):
+    for build, drop_sources in groups.values():
+        if drop_source in drop_sources:
+            return build
+    return build_monster_table
+
+
+# find_sources returns the drop sources named by a list of targets, each one 'all', a group or a drop source (or the
+# name of its json file). Raises ValueError for a target that is none of those
+def find_sources(targets):
+    drop_sources = []
+    for target in targets or ['all']:
+        if target == 'all':
+            drop_sources += all_drop_sources
+        elif target in groups:
+            drop_sources += groups[target][1]
+        elif target in all_drop_sources:
+            drop_sources.append(target)
+        elif target in all_output_names:
+            drop_sources.append(all_drop_sources[all_output_names.index(target)])
+        else:
+            raise ValueError('unknown drop source or group: ' + target)
+    return list(dict.fromkeys(drop_sources))  # remove duplicates, keep order
+
+
+# list_sources prints every group with the drop sources in it and the json files of each, the variants of a table are
+# only written if they differ from it
+def list_sources():
+    for group, (build, drop_sources) in groups.items():
+        print(group + ' (' + build.__name__ + ')')
+        for drop_source in drop_sources:
+            name = cox_file if drop_source == cox else drop_source
+            variants = get_variants(drop_source, rule_groups[build.__name__])
+            files = [variant_name(name, variant) + '.json' for variant in variants]
+            print('    ' + drop_source + ' -> ' + ', '.join(files))
+
+
+def main(argv=None):
+    global source_backend, alias_tables, bundle_tables, output_dir, cox_points, output_format, database_path
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0].startswith('-') and argv[0] not in ('-h', '--help'):
+        argv = ['build'] + argv  # building everything is the default, as it was before there were commands
+
+    parser = argparse.ArgumentParser(description='Builds drop tables in .json format from the osrs wiki')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='list every group and drop source that can be built')
+    build_parser = commands.add_parser('build', help='build the tables of drop sources, groups or all of them')
+    build_parser.add_argument('targets', nargs='*', metavar='TARGET',
+                              help='drop sources or groups to build (see list), all of them if none are given')
+    build_parser.add_argument('--offline', action='store_true', help='build entirely from the page cache, no network')
+    build_parser.add_argument('--cache-dir', default=WikiFetcher.settings['cache_dir'],
+                              help='directory of the page cache')
+    build_parser.add_argument('--no-cache', action='store_true', help='do not read or write the page cache')
+    build_parser.add_argument('--backend', choices=['html', 'wikitext'], default=source_backend,
+                              help='read the drop tables from the rendered wiki pages or from their wikitext')
+    build_parser.add_argument('--alias-tables', action='store_true',
+                              help='add precomputed alias tables for constant time sampling to each json file')
+    build_parser.add_argument('--output-dir', default=output_dir,
+                              help='directory the json files and bundle are written to')
+    build_parser.add_argument('--format', choices=['flat', 'shared'], default=output_format,
+                              help='write every row of every table, or write shared sub-tables once and reference '
+                                   'them from the tables')
+    build_parser.add_argument('--bundle', action='store_true',
+                              help='also pack every table into a single memory mappable ' + bundle_name + ' file')
+    build_parser.add_argument('--database', nargs='?', default=None, const='', metavar='PATH',
+                              help='also export every table into a SQLite database, drop_tables.sqlite next to this '
+                                   'script if no path is given')
+    build_parser.add_argument('--force', action='store_true',
+                              help='build every table, even if its inputs did not change')
+    build_parser.add_argument('--cox-points', type=int, default=cox_points,
+                              help='points of the raid the quantities of the cox table are for')
+    build_parser.add_argument('--log-level', choices=BuildReport.LOG_LEVELS, default='info', help='how much is logged')
+    build_parser.add_argument('--report', default=None,
+                              help='write a report of the time and counters of every stage to this .json or .ndjson '
+                                   'file')
+    build_parser.add_argument('--profile', default=None, metavar='DROP_SOURCE',
+                              help='profile the build of one drop source with cProfile and tracemalloc')
+    build_parser.add_argument('--profile-path', default=None, help='file the cProfile stats are written to')
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        list_sources()
+        return
+
+    try:
+        drop_sources = find_sources(args.targets)
+    except ValueError as e:
+        build_parser.error(str(e))
+
+    source_backend = args.backend
+    alias_tables = args.alias_tables
+    bundle_tables = args.bundle
+    output_dir = args.output_dir
+    cox_points = args.cox_points
+    output_format = args.format
+    if args.database is not None:
+        from TableDatabase import DATABASE_PATH
+        database_path = args.database or DATABASE_PATH
+    BuildReport.configure_logging(args.log_level)
+    report = BuildReport.configure(args.report, args.profile, args.profile_path)
+    WikiFetcher.configure(offline=args.offline, cache_dir=None if args.no_cache else args.cache_dir)
+    sources_to_json(drop_sources, args.force)
+    report.write()
+    report.log_summary()
 
 
 if __name__ == '__main__':
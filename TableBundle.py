@@ -0,0 +1,171 @@
+# RuneLite plugins have a file limit, which is why tables can not be shipped for every NPC as one json file each.
+# TableBundle packs every built table into a single binary file that can be memory mapped, so a consumer only decodes
+# the tables it needs.
+#
+# Layout, all numbers little endian:
+#   magic b'DTB1', uint32 format version, uint32 length of the index
+#   index: utf-8 json of table name -> {'offset', 'length', 'rows'}, offsets are from the end of the index
+#   padding up to an 8 byte boundary
+#   one block per table, each starting on an 8 byte boundary, holding n = rows values of each column in this order:
+#     float64 rarity (NaN if unknown)
+#     int64 rarity-numerator, int64 rarity-denominator (0 if unknown)
+#     int32 id
+#     int32 quantity-min, int32 quantity-max (-1 if unknown)
+#     int32 name offsets, n + 1 of them, name i is names[offsets[i]:offsets[i + 1]]
+#     uint8 drop type, an index into DROP_TYPES
+#     utf-8 names
+import json
+import mmap
+import struct
+
+import numpy as np
+import pandas as pd
+
+from PageCache import write_atomic
+
+MAGIC = b'DTB1'
+VERSION = 1
+HEADER = struct.Struct('<4sII')
+
+DROP_TYPES = ['', 'always', 'tertiary', 'pre-roll']  # drop type codes, '' is a main drop
+UNKNOWN_DROP_TYPE = 255
+
+
+# column returns a column of a table as a numpy array of dtype, with missing values or a missing column as fill
+def column(table, name, dtype, fill):
+    if name not in table.columns:
+        return np.full(len(table), fill, dtype=dtype)
+    return pd.to_numeric(table[name], errors='coerce').astype(float).fillna(fill).to_numpy().astype(dtype)
+
+
+# pack_table packs one table into a block, see the layout above
+def pack_table(table):
+    names = [name.encode('utf-8') for name in table['name'].astype(str)]
+    name_offsets = np.zeros(len(names) + 1, dtype='<i4')
+    name_offsets[1:] = np.cumsum([len(name) for name in names])
+
+    drop_type_codes = {drop_type: code for code, drop_type in enumerate(DROP_TYPES)}
+    drop_types = table['drop-type'].fillna('') if 'drop-type' in table.columns else pd.Series('', index=table.index)
+
+    parts = [
+        column(table, 'rarity', '<f8', np.nan),
+        column(table, 'rarity-numerator', '<i8', 0),
+        column(table, 'rarity-denominator', '<i8', 0),
+        column(table, 'id', '<i4', -1),
+        column(table, 'quantity-min', '<i4', -1),
+        column(table, 'quantity-max', '<i4', -1),
+        name_offsets,
+        np.array([drop_type_codes.get(drop_type, UNKNOWN_DROP_TYPE) for drop_type in drop_types], dtype='u1'),
+    ]
+    return b''.join(part.tobytes() for part in parts) + b''.join(names)
+
+
+# padding returns the number of bytes needed to bring a length up to an 8 byte boundary
+def padding(length):
+    return -length % 8
+
+
+# data_start returns where the blocks start in a bundle whose index is index_length bytes long
+def data_start(index_length):
+    return HEADER.size + index_length + padding(HEADER.size + index_length)
+
+
+# pack_bundle packs a dict of table name -> table into the bytes of a bundle
+def pack_bundle(tables):
+    index = {}
+    blocks = []
+    offset = 0
+    for name, table in tables.items():
+        block = pack_table(table)
+        index[name] = {'offset': offset, 'length': len(block), 'rows': len(table)}
+        blocks.append(block + b'\0' * padding(len(block)))
+        offset += len(blocks[-1])
+
+    index_bytes = json.dumps(index).encode('utf-8')
+    header = HEADER.pack(MAGIC, VERSION, len(index_bytes)) + index_bytes
+    return header + b'\0' * padding(len(header)) + b''.join(blocks)
+
+
+class TableBundle:
+    # reader of a bundle, the file is memory mapped and each table is only decoded when it is read
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, index_length = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(path + ' is not a version ' + str(VERSION) + ' drop table bundle')
+        self.index = json.loads(self.buffer[HEADER.size:HEADER.size + index_length].decode('utf-8'))
+        self.data_start = data_start(index_length)
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # names returns the name of every table in the bundle
+    def names(self):
+        return list(self.index)
+
+    # columns returns the columns of a table as numpy arrays that read straight from the memory mapped file, the arrays
+    # are only valid until the bundle is closed
+    def columns(self, name):
+        entry = self.index[name]
+        n = entry['rows']
+        offset = self.data_start + entry['offset']
+
+        columns = {}
+        for column_name, dtype, count in (('rarity', '<f8', n),
+                                          ('rarity-numerator', '<i8', n),
+                                          ('rarity-denominator', '<i8', n),
+                                          ('id', '<i4', n),
+                                          ('quantity-min', '<i4', n),
+                                          ('quantity-max', '<i4', n),
+                                          ('name-offsets', '<i4', n + 1),
+                                          ('drop-type', 'u1', n)):
+            columns[column_name] = np.frombuffer(self.buffer, dtype=dtype, count=count, offset=offset)
+            offset += columns[column_name].nbytes
+        columns['names'] = (offset, self.data_start + entry['offset'] + entry['length'])
+        return columns
+
+    # read decodes a table into a DataFrame with the columns of the json files
+    def read(self, name):
+        columns = self.columns(name)
+        start, end = columns.pop('names')
+        names = self.buffer[start:end]
+        name_offsets = columns.pop('name-offsets')
+
+        table = pd.DataFrame({
+            'name': [names[name_offsets[i]:name_offsets[i + 1]].decode('utf-8') for i in range(len(name_offsets) - 1)],
+            'rarity': columns['rarity'],
+            'rarity-numerator': pd.array(columns['rarity-numerator'], dtype='Int64'),
+            'rarity-denominator': pd.array(columns['rarity-denominator'], dtype='Int64'),
+            'quantity-min': pd.array(columns['quantity-min'], dtype='Int64'),
+            'quantity-max': pd.array(columns['quantity-max'], dtype='Int64'),
+            'id': columns['id'].astype(int),
+            'drop-type': [DROP_TYPES[code] if code < len(DROP_TYPES) else None for code in columns['drop-type']],
+        })
+        table.loc[table['rarity-denominator'] == 0, ['rarity-numerator', 'rarity-denominator']] = pd.NA
+        table.loc[table['quantity-min'] == -1, 'quantity-min'] = pd.NA
+        table.loc[table['quantity-max'] == -1, 'quantity-max'] = pd.NA
+        return table
+
+
+# write_bundle packs a dict of table name -> table into a bundle file, returns the bytes written. The file is replaced
+# atomically, a reader that has the old bundle memory mapped keeps reading the old file
+def write_bundle(path, tables):
+    data = pack_bundle(tables)
+    write_atomic(path, data)
+    return data
+
+
+# read_bundle reads every table of a bundle file, table name -> table
+def read_bundle(path):
+    with TableBundle(path) as bundle:
+        return {name: bundle.read(name) for name in bundle.names()}
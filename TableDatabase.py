@@ -0,0 +1,311 @@
+# Questions across drop sources, like which sources drop an item and at what rate, used to mean reading and scanning
+# every json file. TableDatabase exports every built table into a single SQLite database with one row per drop source,
+# item and drop, indexed by item id, name, drop type and source, with the exact rarity of every drop. An export only
+# rewrites the drops of the tables whose json file changed since the last export, and removes the tables whose file is
+# gone. Tables written in the shared format are expanded, so the database always holds every row of every table. The
+# json files can be written again from the database, in the format and with the alias tables they were exported with.
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+from fractions import Fraction
+
+import pandas as pd
+
+DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'drop_tables.sqlite')
+SCHEMA_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sources (
+    source_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,  -- path of the json file in the output directory, without .json
+    sha256 TEXT NOT NULL,  -- of the json file
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    fields TEXT NOT NULL,  -- json of the schema fields of the table, for writing the json file again
+    shared INTEGER NOT NULL,  -- the json file references shared sub-tables
+    sampling INTEGER NOT NULL  -- the json file has alias tables
+);
+CREATE TABLE IF NOT EXISTS other_files (  -- json files in the output directory that are not tables, i.e., the cox grid
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    item_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS drops (
+    source_id INTEGER NOT NULL REFERENCES sources(source_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,  -- of the row in the table
+    row_index INTEGER,  -- index of the row in the json file
+    item_id INTEGER,
+    name TEXT NOT NULL,
+    quantity TEXT,
+    quantity_min INTEGER,
+    quantity_max INTEGER,
+    rarity REAL,
+    rarity_numerator INTEGER,
+    rarity_denominator INTEGER,
+    rolls INTEGER,
+    section TEXT,
+    drop_type TEXT,
+    PRIMARY KEY (source_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS drops_item_id ON drops (item_id);
+CREATE INDEX IF NOT EXISTS drops_name ON drops (name);
+CREATE INDEX IF NOT EXISTS drops_drop_type ON drops (drop_type, rarity);
+CREATE INDEX IF NOT EXISTS items_name ON items (name);
+'''
+
+# column of a table -> column of the drops table
+DROP_COLUMNS = {
+    'id': 'item_id',
+    'name': 'name',
+    'quantity': 'quantity',
+    'quantity-min': 'quantity_min',
+    'quantity-max': 'quantity_max',
+    'rarity': 'rarity',
+    'rarity-numerator': 'rarity_numerator',
+    'rarity-denominator': 'rarity_denominator',
+    'rolls': 'rolls',
+    'section': 'section',
+    'drop-type': 'drop_type',
+}
+
+# type of a schema field of a json file -> dtype of the column
+FIELD_DTYPES = {'integer': 'int64', 'number': 'float64', 'string': 'str', 'boolean': 'bool'}
+
+
+# connect opens the database at path, creating its tables if they do not exist yet
+def connect(path):
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA foreign_keys = ON')
+    version = connection.execute('PRAGMA user_version').fetchone()[0]
+    if version not in (0, SCHEMA_VERSION):
+        connection.close()
+        raise ValueError(path + ' has schema version ' + str(version) + ', expected ' + str(SCHEMA_VERSION))
+    connection.executescript(SCHEMA)
+    connection.execute('PRAGMA user_version = ' + str(SCHEMA_VERSION))
+    return connection
+
+
+# table_files returns the name and path of the json file of every table in the output directory, including the tables
+# in its subdirectories, i.e., crawled monsters. Sub-tables and files that are not tables, like the cox points grid,
+# are left out
+def table_files(output_dir):
+    from SubTables import SUBTABLE_DIR
+
+    files = {}
+    for directory, directories, file_names in os.walk(output_dir):
+        if directory == output_dir and SUBTABLE_DIR in directories:
+            directories.remove(SUBTABLE_DIR)
+        for file_name in file_names:
+            if file_name.endswith('.json'):
+                path = os.path.join(directory, file_name)
+                name = os.path.relpath(path, output_dir)[:-len('.json')].replace(os.sep, '/')
+                files[name] = path
+    return dict(sorted(files.items()))
+
+
+# read_json_table reads a json file as a flat table, returns the table and the json of the file, or None if the file
+# is not a table
+def read_json_table(path, output_dir):
+    from io import StringIO
+    from SubTables import expand_table
+
+    with open(path, 'rb') as f:
+        text = f.read()
+    data = json.loads(text)
+    if not isinstance(data, dict) or 'schema' not in data:
+        return None
+    table = pd.read_json(StringIO(text.decode('utf-8')), orient='table')
+    if any(field['name'] == 'index' for field in data['schema']['fields']):
+        table.index = [row['index'] for row in data['data']]  # read_json drops an index that is not unique
+    return expand_table(table, output_dir), data, text
+
+
+# store_table replaces the drops of a table in the database with the rows of a flat table
+def store_table(connection, name, table, data, text, stat):
+    fields = [field for field in data['schema']['fields'] if field['name'] != 'subtable']
+    shared = any(field['name'] == 'subtable' for field in data['schema']['fields'])
+    connection.execute('''
+        INSERT INTO sources (name, sha256, size, mtime, fields, shared, sampling) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (name) DO UPDATE SET sha256 = excluded.sha256, size = excluded.size, mtime = excluded.mtime,
+            fields = excluded.fields, shared = excluded.shared, sampling = excluded.sampling
+    ''', (name, hashlib.sha256(text).hexdigest(), stat.st_size, stat.st_mtime_ns, json.dumps(fields), shared,
+          'sampling' in data))
+    source_id = connection.execute('SELECT source_id FROM sources WHERE name = ?', (name,)).fetchone()[0]
+    connection.execute('DELETE FROM drops WHERE source_id = ?', (source_id,))
+
+    rows = table.rename(columns=DROP_COLUMNS)
+    rows = rows.astype(object).where(rows.notna(), None)
+    columns = [column for column in DROP_COLUMNS.values() if column in rows.columns]
+    values = [(source_id, position, row_index, *row) for position, (row_index, row)
+              in enumerate(zip(table.index, rows[columns].itertuples(index=False, name=None)))]
+    connection.executemany(
+        'INSERT INTO drops (source_id, position, row_index, ' + ', '.join(columns) + ') VALUES (?, ?, ?'
+        + ', ?' * len(columns) + ')', values)
+
+    if 'item_id' in rows.columns:
+        items = rows[rows['item_id'].notna() & (table['id'] >= 0).to_numpy()]  # an id of -1 is not an item
+        items = items.drop_duplicates('item_id')
+        connection.executemany('INSERT OR IGNORE INTO items (item_id, name) VALUES (?, ?)',
+                               zip(items['item_id'], items['name']))
+
+
+# export writes every table in the output directory into the database, only the tables whose json file changed since
+# the last export are written again, and the tables whose json file is gone are removed. The size and modification
+# time of the json files that are not tables are kept too, so those are not read again either. Returns the names of
+# the tables written
+def export(connection, output_dir):
+    files = table_files(output_dir)
+    known = {name: (sha256, size, mtime) for name, sha256, size, mtime
+             in connection.execute('SELECT name, sha256, size, mtime FROM sources')}
+    others = {name: (size, mtime) for name, size, mtime
+              in connection.execute('SELECT name, size, mtime FROM other_files')}
+
+    written = []
+    with connection:  # a single transaction, an interrupted export leaves the database as it was
+        for name, path in files.items():
+            stat = os.stat(path)
+            if name in known and known[name][1:] == (stat.st_size, stat.st_mtime_ns):
+                continue  # unchanged since the last export, not even read
+            if others.get(name) == (stat.st_size, stat.st_mtime_ns):
+                continue  # not a table at the last export and unchanged since
+            read = read_json_table(path, output_dir)
+            if read is None:
+                connection.execute('INSERT OR REPLACE INTO other_files (name, size, mtime) VALUES (?, ?, ?)',
+                                   (name, stat.st_size, stat.st_mtime_ns))
+                connection.execute('DELETE FROM sources WHERE name = ?', (name,))
+                continue
+            if name in others:
+                connection.execute('DELETE FROM other_files WHERE name = ?', (name,))
+            table, data, text = read
+            if name in known and known[name][0] == hashlib.sha256(text).hexdigest():
+                connection.execute('UPDATE sources SET size = ?, mtime = ? WHERE name = ?',
+                                   (stat.st_size, stat.st_mtime_ns, name))
+                continue  # rewritten with the same contents
+            store_table(connection, name, table, data, text, stat)
+            written.append(name)
+
+        for name in set(known) - set(files):
+            connection.execute('DELETE FROM sources WHERE name = ?', (name,))
+        for name in set(others) - set(files):
+            connection.execute('DELETE FROM other_files WHERE name = ?', (name,))
+    return written
+
+
+# read_table returns the flat table of a source as it was built, or None if the source is not in the database
+def read_table(connection, name):
+    source = connection.execute('SELECT source_id, fields FROM sources WHERE name = ?', (name,)).fetchone()
+    if source is None:
+        return None
+    source_id, fields = source
+    fields = json.loads(fields)
+
+    rows = pd.read_sql_query('SELECT * FROM drops WHERE source_id = ? ORDER BY position', connection,
+                             params=(source_id,))
+    table = rows.rename(columns={column: name for name, column in DROP_COLUMNS.items()})
+    table.index = rows['row_index'].to_numpy()
+    columns = [field['name'] for field in fields if field['name'] != 'index']
+    dtypes = {field['name']: field.get('extDtype', FIELD_DTYPES.get(field['type'])) for field in fields
+              if field['name'] != 'index' and field['type'] in FIELD_DTYPES}
+    return table[columns].astype(dtypes)
+
+
+# regenerate writes the json file of every table in the database to the output directory, in the format and with the
+# alias tables each one was exported with. Returns the names of the tables whose file changed
+def regenerate(connection, output_dir):
+    from AliasTables import table_json_with_sampling
+    from BuildManifest import write_if_changed
+    from SubTables import expand_table, share_subtables
+
+    changed = []
+    for name, shared, sampling in connection.execute('SELECT name, shared, sampling FROM sources ORDER BY name'):
+        table = read_table(connection, name)
+        if shared:
+            table = share_subtables(table, output_dir)
+        text = table_json_with_sampling(table, expand_table(table, output_dir)) if sampling else \
+            table.to_json(orient='table')
+        path = os.path.join(output_dir, name + '.json')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if write_if_changed(path, text):
+            changed.append(name)
+    return changed
+
+
+# item_sources returns every drop of an item, by id or name, in every source, the most common first
+def item_sources(connection, item):
+    column = 'item_id' if isinstance(item, int) else 'name'
+    return pd.read_sql_query('''
+        SELECT sources.name AS source, drops.name, item_id, quantity, rarity, rarity_numerator, rarity_denominator,
+            drop_type, section
+        FROM drops JOIN sources USING (source_id)
+        WHERE drops.''' + column + ''' = ?
+        ORDER BY rarity DESC, source
+    ''', connection, params=(item,))
+
+
+# find_drops returns every drop of the given drop type and source, all of them if None, rarer than rarer_than, a
+# Fraction compared exactly against the rarity numerator and denominator of each drop
+def find_drops(connection, drop_type=None, source=None, rarer_than=None):
+    conditions = []
+    params = []
+    if drop_type is not None:
+        conditions.append('drop_type = ?')
+        params.append(drop_type)
+    if source is not None:
+        conditions.append('sources.name = ?')
+        params.append(source)
+    if rarer_than is not None:
+        rarer_than = Fraction(rarer_than)
+        conditions.append('rarity_numerator * ? < ? * rarity_denominator')
+        params += [rarer_than.denominator, rarer_than.numerator]
+    return pd.read_sql_query('''
+        SELECT sources.name AS source, drops.name, item_id, quantity, rarity, rarity_numerator, rarity_denominator,
+            drop_type, section
+        FROM drops JOIN sources USING (source_id)
+    ''' + ('WHERE ' + ' AND '.join(conditions) if conditions else '') + '''
+        ORDER BY rarity, source, position
+    ''', connection, params=params)
+
+
+def main():
+    import TableBuilder
+
+    parser = argparse.ArgumentParser(description='Exports the built drop tables into a SQLite database and queries it')
+    parser.add_argument('--database', default=DATABASE_PATH, help='path of the database')
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help='write the tables that changed since the last export')
+    export_parser.add_argument('--output-dir', default=TableBuilder.output_dir, help='directory of the json files')
+    regenerate_parser = commands.add_parser('regenerate', help='write the json file of every table again')
+    regenerate_parser.add_argument('--output-dir', default=TableBuilder.output_dir,
+                                   help='directory the json files are written to')
+    item_parser = commands.add_parser('item', help='every source that drops an item and at what rate')
+    item_parser.add_argument('item', help='item id or name')
+    drops_parser = commands.add_parser('drops', help='every drop of a drop type or source')
+    drops_parser.add_argument('--drop-type', default=None, help="i.e., 'pre-roll', 'tertiary', '' for main drops")
+    drops_parser.add_argument('--source', default=None)
+    drops_parser.add_argument('--rarer-than', type=Fraction, default=None, metavar='FRACTION', help='i.e., 1/500')
+    args = parser.parse_args()
+
+    connection = connect(args.database)
+    if args.command == 'export':
+        written = export(connection, args.output_dir)
+        print('exported ' + str(len(written)) + ' tables to ' + args.database)
+    elif args.command == 'regenerate':
+        changed = regenerate(connection, args.output_dir)
+        print('wrote ' + str(len(changed)) + ' changed tables to ' + args.output_dir)
+    else:
+        with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', None):
+            if args.command == 'item':
+                print(item_sources(connection, int(args.item) if args.item.isdigit() else args.item))
+            else:
+                print(find_drops(connection, args.drop_type, args.source, args.rarer_than))
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
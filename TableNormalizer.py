@@ -0,0 +1,111 @@
+# TableNormalizer cleans the rarity and quantity columns of the wiki drop tables. Every pattern is compiled once and
+# applied to a whole column at a time with the vectorized pandas .str methods, instead of running a dozen
+# apply(lambda x: re.sub(...)) passes and a pd.eval per cell. Rarities are parsed into exact integer numerator and
+# denominator columns along with the float rarity the drop simulator uses, and quantities into min and max columns.
+import re
+
+import numpy as np
+import pandas as pd
+
+# everything in a rarity that is not part of the rarity itself:
+# commas, annotations like [~] or [d 1], row rarities after a ; and rarity intervals after an en dash, i.e., 1/40–1/100
+RARITY_JUNK = re.compile(r',|\[.*?\]|;.*$|–.*$')
+
+# N × a/b, a/b or p%, the roll count N is kept in its own column
+RARITY = re.compile(r'^(?:(?P<rolls>\d+)\s*×\s*)?(?:(?P<numerator>[\d.]+)\s*/\s*(?P<denominator>[\d.]+)'
+                    r'|(?P<percent>[\d.]+)\s*%)')
+
+# everything in a quantity that is not part of the quantity itself:
+# notes like (noted), commas and decimals, i.e., 2,500.5 (noted)
+QUANTITY_JUNK = re.compile(r'[(].*?[)]|,|\.\d*')
+
+# a or a–b
+QUANTITY = re.compile(r'^(?P<min>\d+)(?:\s*-\s*(?P<max>\d+))?$')
+
+
+# clean_rarity cleans a column of rarities down to N × a/b, a/b or p%. Always drops become 1/1
+def clean_rarity(rarity):
+    rarity = rarity.astype(str)
+    rarity = rarity.where(~rarity.str.contains('Always', regex=False), '1/1')
+    return rarity.str.replace(RARITY_JUNK, '', regex=True).str.strip()
+
+
+# decimal_places returns the number of digits after the decimal point of each number in a column of number strings
+def decimal_places(numbers):
+    return numbers.str.extract(r'\.(\d+)$', expand=False).str.len().fillna(0).astype(int)
+
+
+# to_integers turns a column of number strings into integers after scaling them by 10 ** places
+def to_integers(numbers, places):
+    return (numbers.astype(float) * np.power(10.0, places)).round()
+
+
+# parse_rarity parses a column of cleaned rarities into a table with columns
+# rolls: times the drop is rolled, 1 unless the rarity is N × a/b
+# rarity-numerator, rarity-denominator: the exact rarity as integers, decimals are scaled away, i.e., 1/34.5 is 10/345
+# rarity: the rarity as a float
+# Rarities that can not be parsed, i.e., Rare or Unknown, are left empty
+def parse_rarity(rarity):
+    parts = rarity.str.extract(RARITY)
+
+    fraction = parts['numerator'].notna()
+    percent = parts['percent'].notna()
+
+    # a/b, scaled by the decimal places of whichever of a and b has more
+    places = np.maximum(decimal_places(parts['numerator'].fillna('')), decimal_places(parts['denominator'].fillna('')))
+    numerator = to_integers(parts['numerator'].where(fraction), places)
+    denominator = to_integers(parts['denominator'].where(fraction), places)
+
+    # p% is p/100, scaled by the decimal places of p
+    places = decimal_places(parts['percent'].fillna(''))
+    numerator = numerator.where(fraction, to_integers(parts['percent'].where(percent), places))
+    denominator = denominator.where(fraction, 100 * np.power(10.0, places).where(percent))
+
+    parsed = pd.DataFrame(index=rarity.index)
+    parsed['rolls'] = parts['rolls'].fillna('1').astype(int)
+    parsed['rarity-numerator'] = numerator.astype('Int64')
+    parsed['rarity-denominator'] = denominator.astype('Int64')
+    parsed['rarity'] = numerator / denominator
+    return parsed
+
+
+# normalize_rarity replaces the rarity column of a table with the float rarity and adds the other parsed rarity
+# columns, see parse_rarity
+def normalize_rarity(table):
+    table = table.copy()
+    parsed = parse_rarity(clean_rarity(table['rarity']))
+    for column in parsed.columns:
+        table[column] = parsed[column].array  # by position, the index of a joined table is not unique, keeps Int64
+    return table
+
+
+# clean_quantity cleans a column of quantities down to a or a-b, en dashes become regular dashes
+def clean_quantity(quantity):
+    quantity = quantity.astype(str).str.replace(QUANTITY_JUNK, '', regex=True)
+    return quantity.str.replace('–', '-', regex=False).str.strip()
+
+
+# parse_quantity parses a column of cleaned quantities into a table with integer columns quantity-min and quantity-max,
+# quantities that can not be parsed, i.e., N/A, are left empty
+def parse_quantity(quantity):
+    parts = quantity.str.extract(QUANTITY)
+
+    parsed = pd.DataFrame(index=quantity.index)
+    parsed['quantity-min'] = parts['min'].astype(float).astype('Int64')
+    parsed['quantity-max'] = parts['max'].fillna(parts['min']).astype(float).astype('Int64')
+    return parsed
+
+
+# normalize_quantity cleans the quantity column of a table and adds the parsed quantity columns, see parse_quantity
+def normalize_quantity(table):
+    table = table.copy()
+    table['quantity'] = clean_quantity(table['quantity']).to_numpy()
+    parsed = parse_quantity(table['quantity'])
+    for column in parsed.columns:
+        table[column] = parsed[column].array  # by position, the index of a joined table is not unique, keeps Int64
+    return table
+
+
+# normalize_table cleans and parses both the rarity and quantity columns of a table
+def normalize_table(table):
+    return normalize_quantity(normalize_rarity(table))
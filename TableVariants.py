@@ -0,0 +1,132 @@
+# Some drop sources have more than one table: cox in challenge mode, tob in entry and hard mode, and monsters
+# with extra tertiaries when they are killed in the wilderness or in the catacombs of kourend. Instead of parsing a page
+# again for every variant, the builders keep every row of the page and TableVariants tags the rows that are not in every
+# variant. Each variant is a filtered view of that one tagged table: a row is in a variant if the variant enables every
+# tag of the row. Rows tagged excluded are in no variant, they are drops the simulator does not roll from the table.
+TAGS_COLUMN = 'tags'
+EXCLUDED = 'excluded'
+
+# tag -> rules of the rows given the tag. A rule matches rows by name or by the heading of their section, for the drop
+# sources or rule groups (see TableBuilder.rule_groups) it names, or for every drop source if it names neither
+RULES = {
+    EXCLUDED: [
+        {'sources': ['chambers of xeric'], 'names': ['Ancient tablet']},
+        {'groups': ['non_npc'], 'names': [
+            'Cabbage',  # tob
+            'Message (Theatre of Blood)',  # tob
+            'Magic potion(2)',  # grotesque guardians
+            'Ranging potion(2)',  # grotesque guardians
+            'Bludgeon axon',  # unsired
+            'Bludgeon spine',  # unsired
+        ]},
+        {'groups': ['gwd_boss'], 'names': ['Super defence(3)', 'Super restore(3)', 'Super strength(3)']},
+        {'sources': ['kree\'arra', 'k\'ril', 'zilyana'], 'names': ['Super restore(4)']},  # graardor keeps it
+        {'groups': ['slayer_boss'], 'names': ['Hydra\'s fang', 'Hydra\'s heart']},
+    ],
+    'challenge-mode': [
+        {'sources': ['chambers of xeric'], 'names': ['Twisted ancestral colour kit', 'Metamorphic dust']},
+    ],
+    # the tob page has one table for every mode, the rows only in entry or hard mode are in a section of that mode or
+    # are named here
+    'entry-mode': [
+        {'sources': ['theatre'], 'sections': [r'[Ee]ntry [Mm]ode']},
+    ],
+    'hard-mode': [
+        {'sources': ['theatre'], 'sections': [r'[Hh]ard [Mm]ode'],
+         'names': ['Sanguine dust', 'Sanguine ornament kit', 'Holy ornament kit']},
+    ],
+    'wilderness': [
+        {'groups': ['monster'], 'sections': [r'[Ww]ilderness'],
+         'names': ['Larran\'s key', 'Looting bag', 'Slayer\'s enchantment']},
+    ],
+    'catacombs': [
+        {'groups': ['monster'], 'sections': [r'[Cc]atacombs'],
+         'names': ['Ancient shard', 'Dark totem base', 'Dark totem middle', 'Dark totem top']},
+    ],
+}
+
+# drop source or rule group -> variant -> tags enabled in the variant. The variant '' is the table written under the
+# name of the drop source, every other variant is written with its name appended, only if it differs from the table
+# and from every variant before it
+VARIANTS = {
+    'chambers of xeric': {
+        '': [],
+        'challenge_mode': ['challenge-mode'],
+    },
+    'theatre': {
+        '': [],  # normal mode
+        'entry_mode': ['entry-mode'],
+        'hard_mode': ['hard-mode'],
+    },
+    'monster': {
+        '': ['wilderness', 'catacombs'],
+        'outside_wilderness': ['catacombs'],
+        'outside_catacombs': ['wilderness'],
+    },
+}
+
+
+# applies returns true if a rule applies to a drop source of a rule group
+def applies(rule, drop_source, group):
+    if 'sources' not in rule and 'groups' not in rule:
+        return True
+    return drop_source in rule.get('sources', []) or group in rule.get('groups', [])
+
+
+# tag_table returns a table with the tags of every row in the tags column, space separated
+def tag_table(table, drop_source, group):
+    tags = [[] for _ in range(len(table))]
+    for tag, rules in RULES.items():
+        matched = None
+        for rule in rules:
+            if not applies(rule, drop_source, group):
+                continue
+            rule_matched = table['name'].isin(rule.get('names', []))
+            if rule.get('sections'):
+                rule_matched |= table['section'].astype(str).str.contains('|'.join(rule['sections']), regex=True)
+            matched = rule_matched if matched is None else matched | rule_matched
+        if matched is not None:
+            for position in matched.to_numpy().nonzero()[0]:
+                tags[position].append(tag)
+    return table.assign(**{TAGS_COLUMN: [' '.join(row_tags) for row_tags in tags]})
+
+
+# get_variants returns the variants of a drop source of a rule group, variant -> enabled tags
+def get_variants(drop_source, group):
+    return VARIANTS.get(drop_source) or VARIANTS.get(group) or {'': []}
+
+
+# variant_rows returns for every row of a tagged table whether it is in the variant with the given enabled tags
+def variant_rows(table, enabled):
+    enabled = set(enabled)
+    return [set(row_tags.split()) <= enabled for row_tags in table[TAGS_COLUMN]]
+
+
+# derive_variants returns every variant of a tagged table, without the tags column, variant -> table. The table of the
+# drop source is always first, other variants are only returned if they do not have the same rows as the table or as a
+# variant returned before them
+def derive_variants(table, drop_source, group):
+    untagged = table.drop(columns=TAGS_COLUMN)
+    tables = {}
+    derived = []  # rows of every variant returned
+    for variant, enabled in get_variants(drop_source, group).items():
+        rows = variant_rows(table, enabled)
+        if variant == '' or rows not in derived:
+            tables[variant] = untagged[rows]
+            derived.append(rows)
+    return tables
+
+
+# variant_name returns the name of the json file of a variant of a table
+def variant_name(name, variant):
+    return name + '_' + variant if variant else name
+
+
+# split_variant returns the name of the table and the variant of the name of a json file, with the variant '' if it is
+# not the name of a variant
+def split_variant(name):
+    for variant in sorted({variant for variants in VARIANTS.values() for variant in variants if variant}, key=len,
+                          reverse=True):
+        if name.endswith('_' + variant):
+            return name[:-len(variant) - 1], variant
+    return name, ''
@@ -0,0 +1,319 @@
+# WikiFetcher downloads the wiki pages used by the table builders. All requests go through one pooled keep-alive
+# session, and batches of pages are downloaded in parallel by a bounded pool of workers. Requests are rate limited so
+# the wiki is not hammered, and failed requests are retried with exponential backoff. Pages are kept in an on-disk
+# PageCache and revalidated with conditional GETs, and in offline mode pages are only ever read from the cache. Before a
+# batch of pages is downloaded, the version of every page is asked for in a single api request, and cached pages whose
+# version did not change are used without a request of their own. The version of raw wikitext is its revision id. The
+# version of a rendered page is the time it was last touched, which also changes when a template it transcludes is
+# edited, i.e., the rare drop table, without a new revision of the page itself.
+# The pages fetched by a process are kept in memory, up to pages_kept of them, so a page is not read twice by one build.
+# requests is only imported once a request is made, so offline builds and commands that fetch nothing do not import it.
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from BuildReport import count, stage
+from PageCache import PageCache
+
+WIKI_URL = 'https://oldschool.runescape.wiki/w/'
+API_URL = 'https://oldschool.runescape.wiki/api.php'
+USER_AGENT = 'drop-table-builder (https://github.com/mxp190009/drop-table-builder)'
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}  # statuses worth trying again
+REVISION_BATCH = 50  # most pages the api returns the version of in one request
+
+# fetch settings, see configure
+settings = {
+    'max_workers': 4,  # most pages downloaded at once
+    'requests_per_second': 4.0,  # most requests started per second, 0 for no limit
+    'retries': 3,  # times a failed request is tried again
+    'backoff': 1.0,  # seconds waited before the first retry, doubled on every retry after
+    'timeout': 30,  # seconds before a request is given up on
+    'cache_dir': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wiki_cache'),  # None for no page cache
+    'offline': False,  # only read pages from the page cache, never from the network
+    'pages_kept': 128,  # most pages kept in memory, the least recently used are read from the page cache again
+}
+
+_session = None
+_session_lock = threading.Lock()
+_rate_lock = threading.Lock()
+_next_request_time = 0.0
+
+_cache = None
+_cache_lock = threading.Lock()
+
+_pages = OrderedDict()  # url -> text of the pages fetched by this process, least recently used first
+_pages_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+# configure changes the fetch settings, i.e., configure(max_workers=8, requests_per_second=2)
+def configure(**kwargs):
+    global _session, _cache
+    for key, value in kwargs.items():
+        if key not in settings:
+            raise ValueError('unknown fetch setting: ' + key)
+        settings[key] = value
+    with _session_lock:
+        _session = None  # the connection pool is sized by max_workers, so it is rebuilt on the next request
+    with _cache_lock:
+        _cache = None  # the cache directory may have changed
+
+
+# get_session returns the session shared by every request
+def get_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings['max_workers'])
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+            _session = session
+        return _session
+
+
+# get_cache returns the page cache, or None if the page cache is turned off
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None and settings['cache_dir']:
+            _cache = PageCache(settings['cache_dir'])
+        return _cache
+
+
+# wait_for_turn blocks until the rate limit allows another request to be started
+def wait_for_turn():
+    global _next_request_time
+    if not settings['requests_per_second']:
+        return
+    with _rate_lock:
+        now = time.monotonic()
+        start = max(now, _next_request_time)
+        _next_request_time = start + 1.0 / settings['requests_per_second']
+    if start > now:
+        time.sleep(start - now)
+
+
+# page_url returns the url of the wiki page of a drop source
+def page_url(drop_source):
+    return WIKI_URL + drop_source
+
+
+# wikitext_url returns the url of the raw wikitext of the wiki page of a drop source
+def wikitext_url(drop_source):
+    return page_url(drop_source) + '?action=raw'
+
+
+# category_url returns the url of one batch of the pages in a category of the wiki, start is the continue token
+# returned with the batch before
+def category_url(category, start=None):
+    params = {
+        'action': 'query',
+        'list': 'categorymembers',
+        'cmtitle': 'Category:' + category,
+        'cmnamespace': 0,  # only articles
+        'cmlimit': 500,
+        'format': 'json',
+    }
+    if start is not None:
+        params['cmcontinue'] = start
+    return API_URL + '?' + urlencode(params)
+
+
+# info_url returns the url of an api query for the latest revision id and the time each of a batch of pages was last
+# touched
+def info_url(titles):
+    return API_URL + '?' + urlencode({
+        'action': 'query',
+        'prop': 'info',
+        'titles': '|'.join(titles),
+        'redirects': 1,
+        'format': 'json',
+        'formatversion': 2,
+    })
+
+
+# get makes a rate limited GET request, retrying connection errors and retryable statuses with exponential backoff
+def get(url, headers=None):
+    import requests
+
+    delay = settings['backoff']
+    for attempt in range(settings['retries'] + 1):
+        wait_for_turn()
+        try:
+            response = get_session().get(url, headers=headers, timeout=settings['timeout'])
+            if response.status_code not in RETRY_STATUSES:
+                response.raise_for_status()
+                return response
+            error = requests.HTTPError(str(response.status_code) + ' error for url: ' + url, response=response)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+
+        if attempt == settings['retries']:
+            raise error
+        time.sleep(delay)
+        delay *= 2
+
+
+# fetch_url returns the html at a url. Cached pages are revalidated with a conditional GET and only downloaded again
+# if they changed. In offline mode the page is read from the cache, raises CacheMiss if it is not cached
+def fetch_url(url):
+    with stage('fetch'):
+        cache = get_cache()
+        if settings['offline']:
+            if cache is None:
+                raise ValueError('offline mode needs a page cache')
+            html = cache.get(url)
+            count('cache-hits')
+            return html
+        if cache is None:
+            response = get(url)
+            count('bytes-fetched', len(response.content))
+            return response.text
+
+        response = get(url, headers=cache.validators(url))
+        if response.status_code == 304:  # not modified
+            count('cache-hits')
+            cache.touch(url)
+            return cache.get(url)
+
+        count('cache-misses')
+        count('bytes-fetched', len(response.content))
+        html = response.text
+        cache.put(url, html, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return html
+
+
+# fetch_revisions returns the version of each page, title -> version, asking the api for REVISION_BATCH pages at a
+# time. field is the page info used as the version: lastrevid for the id of the latest revision, touched for the time
+# the page was last rendered again. Pages that do not exist, and every page of a batch whose request failed, are left
+# out, those are revalidated one by one
+def fetch_revisions(titles, field='lastrevid'):
+    import requests
+
+    revisions = {}
+    for start in range(0, len(titles), REVISION_BATCH):
+        batch = titles[start:start + REVISION_BATCH]
+        try:
+            with stage('fetch'):
+                query = get(info_url(batch)).json()['query']
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logger.warning('could not get the revisions of %d pages: %s', len(batch), e)
+            continue
+        normalized = {title['from']: title['to'] for title in query.get('normalized', [])}
+        redirects = {title['from']: title['to'] for title in query.get('redirects', [])}
+        latest = {page['title']: page[field] for page in query.get('pages', [])
+                  if not page.get('missing') and page.get(field)}
+        for title in batch:
+            target = normalized.get(title, title)
+            target = redirects.get(target, target)
+            if target in latest:
+                revisions[title] = latest[target]
+    return revisions
+
+
+# check_revisions asks for the version of the page of every drop source and uses the cached text at the url of each
+# page whose version did not change without revalidating it. The version of the wikitext at wikitext_url is its
+# revision id, the version of a rendered page is the time it was last touched. Returns drop source -> version
+def check_revisions(drop_sources, url):
+    cache = get_cache()
+    if settings['offline'] or cache is None or not drop_sources:
+        return {}
+
+    revisions = fetch_revisions(drop_sources, 'lastrevid' if url is wikitext_url else 'touched')
+    current = 0
+    for drop_source, revision in revisions.items():
+        entry = cache.entry(url(drop_source))
+        if entry is not None and entry.get('revision') == revision:
+            remember_page(url(drop_source), cache.get(url(drop_source)))
+            count('cache-hits')
+            current += 1
+    logger.debug('%d of %d pages did not change since they were cached', current, len(drop_sources))
+    return revisions
+
+
+# remember_page keeps the text at a url in memory, dropping the least recently used page if too many are kept
+def remember_page(url, text):
+    with _pages_lock:
+        _pages[url] = text
+        _pages.move_to_end(url)
+        while len(_pages) > settings['pages_kept']:
+            _pages.popitem(last=False)
+
+
+# forget_page drops the text at a url from memory, so it is fetched again the next time it is asked for
+def forget_page(url):
+    with _pages_lock:
+        _pages.pop(url, None)
+
+
+# fetch_once returns the text at a url, a url is only fetched once while it is among the pages kept in memory
+def fetch_once(url):
+    with _pages_lock:
+        if url in _pages:
+            _pages.move_to_end(url)
+            return _pages[url]
+
+    text = fetch_url(url)
+    remember_page(url, text)
+    return text
+
+
+# fetch_page returns the html of the wiki page of a drop source
+def fetch_page(drop_source):
+    return fetch_once(page_url(drop_source))
+
+
+# fetch_wikitext returns the raw wikitext of the wiki page of a drop source
+def fetch_wikitext(drop_source):
+    return fetch_once(wikitext_url(drop_source))
+
+
+# fetch_pages downloads the wiki page of every drop source in parallel and returns a dict of drop source -> html.
+# fetch is the function used to get each page, fetch_wikitext to download the wikitext instead of the html. Pages whose
+# version did not change since they were cached are not requested at all, see check_revisions
+def fetch_pages(drop_sources, fetch=fetch_page):
+    drop_sources = list(dict.fromkeys(drop_sources))  # remove duplicates, keep order
+    url = {fetch_page: page_url, fetch_wikitext: wikitext_url}.get(fetch)
+    revisions = check_revisions(drop_sources, url) if url is not None else {}
+
+    with ThreadPoolExecutor(max_workers=settings['max_workers']) as pool:
+        pages = dict(zip(drop_sources, pool.map(fetch, drop_sources)))
+
+    cache = get_cache()
+    if revisions and cache is not None:
+        for drop_source, revision in revisions.items():
+            cache.set_revision(url(drop_source), revision)
+    flush_cache()
+    return pages
+
+
+# flush_cache writes the index of the page cache to disk if it has changes that are not written yet
+def flush_cache():
+    cache = get_cache()
+    if cache is not None:
+        cache.flush()
+
+
+# fetch_category returns the title of every page in a category of the wiki. The listing is cached like any other page,
+# so a category fetched once can be listed again in offline mode
+def fetch_category(category):
+    titles = []
+    start = None
+    while True:
+        listing = json.loads(fetch_url(category_url(category, start)))
+        titles += [member['title'] for member in listing['query']['categorymembers']]
+        start = listing.get('continue', {}).get('cmcontinue')
+        if start is None:
+            return titles
@@ -0,0 +1,124 @@
+# Rendered wiki pages are several hundred KB each, and the drop data has to be scraped back out of the display text.
+# The wikitext of a page is a fraction of the size and holds the drop data directly in {{DropsLine}} templates, so
+# WikitextParser reads the drop tables straight out of the raw wikitext of a page. Each {{DropsTableHead}} starts a new
+# table, and the section heading above each table is kept just like the DropTableExtractor does. The tables use the
+# same columns as the ones read from the rendered page, so they go through the same cleaning.
+import re
+
+import pandas as pd
+
+HEADING = re.compile(r'^(=+)\s*(.*?)\s*\1\s*$')
+TEMPLATE_START = re.compile(r'\{\{|^=+.*=+\s*$', re.MULTILINE)
+BRACES = re.compile(r'\{\{|\}\}')
+MARKUP = re.compile(r"\[\[(?:[^|\]]*\|)?([^\]]*)\]\]|'''?|<[^>]*>")  # links, bold/italics and html tags
+
+TABLE_HEAD = 'dropstablehead'
+DROPS_LINE = 'dropsline'
+
+
+# find_template_end returns the index just past the }} closing the template opened at start
+def find_template_end(text, start):
+    depth = 0
+    for brace in BRACES.finditer(text, start):
+        depth += 1 if brace.group(0) == '{{' else -1
+        if depth == 0:
+            return brace.end()
+    return len(text)  # unclosed template, runs to the end of the page
+
+
+# split_params splits the body of a template on the | that are not inside a nested template or link
+def split_params(body):
+    parts = []
+    depth = 0
+    current = []
+    i = 0
+    while i < len(body):
+        pair = body[i:i + 2]
+        if pair in ('{{', '[['):
+            depth += 1
+            current.append(pair)
+            i += 2
+        elif pair in ('}}', ']]'):
+            depth -= 1
+            current.append(pair)
+            i += 2
+        elif body[i] == '|' and depth == 0:
+            parts.append(''.join(current))
+            current = []
+            i += 1
+        else:
+            current.append(body[i])
+            i += 1
+    parts.append(''.join(current))
+    return parts
+
+
+# parse_template returns the lower case name and the named parameters of a template, i.e., {{DropsLine|name=Coins}}
+def parse_template(template):
+    parts = split_params(template[2:-2])
+    name = parts[0].strip().lower().replace('_', '').replace(' ', '')
+    params = {}
+    for i, part in enumerate(parts[1:], 1):
+        key, equals, value = part.partition('=')
+        if equals:
+            params[key.strip().lower()] = value.strip()
+        else:
+            params[str(i)] = part.strip()
+    return name, params
+
+
+# strip_markup removes links, bold/italics and html tags from a parameter value, keeping the displayed text
+def strip_markup(value):
+    return ' '.join(MARKUP.sub(lambda match: match.group(1) or '', value).split())
+
+
+# drops_line_row turns the parameters of a {{DropsLine}} into an Item, Quantity, Rarity row. Drops rolled more than
+# once are written as N × rarity, the way the rendered page shows them
+def drops_line_row(params):
+    rarity = strip_markup(params.get('rarity', ''))
+    rolls = params.get('rolls', '').strip()
+    if rolls.isdigit() and int(rolls) > 1:
+        rarity = rolls + ' × ' + rarity
+    return [strip_markup(params.get('name', '')), strip_markup(params.get('quantity', '')), rarity]
+
+
+# parse_drop_tables returns a list with a DataFrame of Item, Quantity, Rarity and section columns for every drop table
+# in the wikitext of a page. Every {{DropsTableHead}} starts a new table, {{DropsLine}} templates before the first
+# {{DropsTableHead}} of a section are a table of their own
+def parse_drop_tables(wikitext):
+    tables = []  # (section, rows)
+    section = ''
+    rows = None
+
+    position = 0
+    while True:
+        match = TEMPLATE_START.search(wikitext, position)
+        if match is None:
+            break
+
+        if match.group(0) != '{{':  # a heading
+            heading = HEADING.match(match.group(0).strip())
+            section = strip_markup(heading.group(2)) if heading else section
+            rows = None  # a new section always starts a new table
+            position = match.end()
+            continue
+
+        end = find_template_end(wikitext, match.start())
+        name, params = parse_template(wikitext[match.start():end])
+        if name == TABLE_HEAD:
+            rows = []
+            tables.append((section, rows))
+        elif name == DROPS_LINE:
+            if rows is None:
+                rows = []
+                tables.append((section, rows))
+            rows.append(drops_line_row(params))
+        position = end
+
+    drop_tables = []
+    for section, rows in tables:
+        if rows:
+            table = pd.DataFrame(rows, columns=['Item', 'Quantity', 'Rarity'])
+            table['section'] = section
+            drop_tables.append(table)
+    return drop_tables
@@ -0,0 +1,54 @@
+# the modules of the drop table builder are top level scripts, the tests import them from the root of the repo
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# quantity_text returns the quantity cell the table normalizer writes for a (min, max) quantity
+def quantity_text(low, high):
+    if pd.isna(low) or pd.isna(high):
+        return 'N/A'
+    return str(low) if low == high else str(low) + '-' + str(high)
+
+
+# drop_table returns a table with the columns and dtypes of a table built by the table builders. rows are (name, rarity,
+# id, drop type) with the rarity a Fraction, or None if it is unknown. sections and rolls add those columns, quantities
+# are the (min, max) of every row, 1 if not given
+def drop_table(rows, sections=None, rolls=None, quantities=None):
+    rows = list(rows)
+    rarities = [row[1] for row in rows]
+    quantities = quantities or [(1, 1)] * len(rows)
+    table = pd.DataFrame({
+        'name': pd.array([row[0] for row in rows], dtype='str'),
+        'quantity': pd.array([quantity_text(low, high) for low, high in quantities], dtype='str'),
+        'rarity': pd.array([float('nan') if rarity is None else float(rarity) for rarity in rarities], dtype='float64'),
+        'rarity-numerator': pd.array([pd.NA if rarity is None else rarity.numerator for rarity in rarities],
+                                     dtype='Int64'),
+        'rarity-denominator': pd.array([pd.NA if rarity is None else rarity.denominator for rarity in rarities],
+                                       dtype='Int64'),
+        'quantity-min': pd.array([low for low, _ in quantities], dtype='Int64'),
+        'quantity-max': pd.array([high for _, high in quantities], dtype='Int64'),
+        'id': pd.array([row[2] for row in rows], dtype='int64'),
+        'drop-type': pd.array([row[3] for row in rows], dtype='object'),
+    })
+    if rolls is not None:
+        table.insert(3, 'rolls', rolls)
+    if sections is not None:
+        table.insert(3, 'section', sections)
+    return table
+
+
+# snapshot_resolver makes the builders resolve ids against the pinned items snapshot of the benchmark for one test, the
+# resolver the other tests use is put back after it
+@pytest.fixture
+def snapshot_resolver(monkeypatch):
+    import ItemResolver
+    import PipelineBenchmark
+
+    resolver = ItemResolver.ItemResolver(PipelineBenchmark.load_snapshot())
+    monkeypatch.setattr(ItemResolver, '_resolver', resolver)
+    return resolver
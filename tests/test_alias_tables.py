@@ -0,0 +1,71 @@
+# the alias tables have to draw every drop with the rarity of its row, and fit in 64 bit integers for any rarities
+from fractions import Fraction
+
+import pytest
+
+from AliasTables import (TOTAL, AliasSampler, MixedRolls, check_alias_table, exact_probabilities, sampling_table,
+                         sampling_tables, slot_probabilities)
+from conftest import drop_table
+
+
+# items returns the rows of a drop table of items with the given rarities
+def items(rarities, drop_types=None):
+    drop_types = drop_types or [None] * len(rarities)
+    return [('Item ' + str(i), rarity, i, drop_type) for i, (rarity, drop_type) in enumerate(zip(rarities, drop_types))]
+
+
+# rare drops of many different denominators, their least common denominator needs more than 64 bits
+COPRIME = [Fraction(1, 128), Fraction(3, 1001), Fraction(1, 3017), Fraction(2, 8191), Fraction(1, 5000),
+           Fraction(1, 16383), Fraction(1, 32767), Fraction(5, 12007), Fraction(1, 49999), Fraction(1, 65521),
+           Fraction(1, 99991)]
+
+
+def test_weights_fit_in_64_bits():
+    alias_table = sampling_table(drop_table(items(COPRIME)), list(range(len(COPRIME))))
+
+    assert alias_table['total'] == TOTAL
+    assert sum(alias_table['weights']) + alias_table['nothing'] == TOTAL
+    assert max(alias_table['threshold']) <= TOTAL < 2 ** 63
+    AliasSampler(alias_table).draw(10)  # np.int64 thresholds
+
+
+@pytest.mark.parametrize('rarities', [COPRIME, [Fraction(1, 2), Fraction(1, 4), Fraction(1, 8)],
+                                      [Fraction(1, 3)] * 3, [Fraction(3, 4), Fraction(1, 2)]])
+def test_slots_reproduce_rarities(rarities):
+    alias_table = sampling_table(drop_table(items(rarities)), list(range(len(rarities))))
+
+    exact = exact_probabilities(alias_table)
+    drawn = slot_probabilities(alias_table)
+    assert sum(drawn) == 1
+    for probability, drawn_probability in zip(exact, drawn):
+        assert abs(drawn_probability - probability) <= Fraction(1, TOTAL)  # off by at most one unit of rounding
+
+    if alias_table['overfull']:
+        rarities = [rarity / sum(rarities) for rarity in rarities]
+    assert exact[:len(rarities)] == rarities
+
+
+def test_sampled_frequencies():
+    alias_table = sampling_table(drop_table(items(COPRIME)), list(range(len(COPRIME))))
+
+    _, worst = check_alias_table(alias_table, trials=2000000, seed=1)
+    assert worst < 5
+
+
+def test_mixed_rolls():
+    table = drop_table(items([Fraction(1, 2), Fraction(1, 4), Fraction(1, 8)]), rolls=[2, 2, 1])
+
+    with pytest.raises(MixedRolls):
+        sampling_table(table, [0, 1, 2])
+    assert sampling_tables(table) == {}
+    assert sampling_table(table, [0, 1])['rolls'] == 2
+
+
+def test_drop_types():
+    table = drop_table(items([Fraction(1, 2), Fraction(1, 10), Fraction(1, 3), Fraction(1, 50)],
+                             [None, 'pre-roll', None, 'tertiary']))
+
+    tables = sampling_tables(table)
+    assert sorted(tables) == ['main', 'pre-roll']
+    assert tables['main']['rows'] == [0, 2]
+    assert tables['pre-roll']['rows'] == [1]
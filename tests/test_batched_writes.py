@@ -0,0 +1,63 @@
+# the page cache index and the build manifest are written to disk in batches, and only so many pages are kept in memory
+import json
+import os
+
+import BuildManifest
+import PageCache
+import WikiFetcher
+from BuildManifest import BuildManifest as Manifest
+from PageCache import PageCache as Cache
+
+
+# read_json reads a json file, or returns None if it does not exist
+def read_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_page_cache_index_written_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(PageCache, 'SAVE_EVERY', 3)
+    cache = Cache(str(tmp_path))
+    index_path = str(tmp_path / 'index.json')
+
+    cache.put('a', '<html>a</html>')
+    cache.put('b', '<html>b</html>')
+    assert read_json(index_path) is None
+    cache.touch('a')
+    assert sorted(read_json(index_path)) == ['a', 'b']
+
+    cache.put('c', '<html>c</html>')
+    assert sorted(read_json(index_path)) == ['a', 'b']
+    cache.flush()
+    assert sorted(read_json(index_path)) == ['a', 'b', 'c']
+    assert Cache(str(tmp_path)).get('c') == '<html>c</html>'
+
+
+def test_manifest_written_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(BuildManifest, 'SAVE_EVERY', 2)
+    path = str(tmp_path / 'build_manifest.json')
+    manifest = Manifest(path, str(tmp_path))
+
+    manifest.record(str(tmp_path / 'a.json'), {'page': 'a'})
+    assert read_json(path) is None
+    manifest.record(str(tmp_path / 'b.json'), {'page': 'b'})
+    assert read_json(path) == {'a.json': {'page': 'a'}, 'b.json': {'page': 'b'}}
+
+    manifest.record(str(tmp_path / 'c.json'), {'page': 'c'})
+    manifest.flush()
+    assert sorted(read_json(path)) == ['a.json', 'b.json', 'c.json']
+    manifest.flush()  # nothing left to write
+
+
+def test_pages_kept_in_memory(monkeypatch):
+    fetched = []
+    monkeypatch.setattr(WikiFetcher, 'fetch_url', lambda url: fetched.append(url) or url.upper())
+    monkeypatch.setattr(WikiFetcher, '_pages', WikiFetcher.OrderedDict())
+    monkeypatch.setitem(WikiFetcher.settings, 'pages_kept', 2)
+
+    for url in ['a', 'b', 'a', 'c', 'a', 'b']:
+        assert WikiFetcher.fetch_once(url) == url.upper()
+    assert fetched == ['a', 'b', 'c', 'b']  # b was the least recently used page when c was fetched
+    assert list(WikiFetcher._pages) == ['a', 'b']
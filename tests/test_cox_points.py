@@ -0,0 +1,37 @@
+# the points grid has to start at 0 points and give the quantities of the cox table at the points it was built for
+import pandas as pd
+
+from CoxPoints import (DEFAULT_POINTS, GRID_STEP, LOOT_POINTS_CAP, POINTS_PER_ITEM, UNIQUE_POINTS_CAP, PointsGrid,
+                       grid_points, loot_quantities, points_grid)
+
+TABLE = pd.DataFrame({'name': ['Death rune', 'Grimy ranarr weed', 'Twisted bow'], 'id': [560, 207, 20997]})
+
+
+def test_grid_starts_at_zero():
+    points = grid_points()
+
+    assert points[0] == 0
+    assert points[1] == GRID_STEP
+    assert points[-1] == UNIQUE_POINTS_CAP
+
+
+def test_no_loot_at_zero_points():
+    grid = PointsGrid(points_grid(TABLE))
+
+    assert grid.unique_chance(0) == 0
+    assert grid.quantities(0) == {560: 0, 207: 0}
+    assert grid.quantities(GRID_STEP - 1) == grid.quantities(0)  # rounded down to a step
+    assert grid.unique_chance(-5) == 0
+
+
+def test_quantities_at_the_table_points():
+    grid = PointsGrid(points_grid(TABLE))
+    expected = loot_quantities(TABLE['name'], DEFAULT_POINTS)
+
+    assert grid.quantities(DEFAULT_POINTS) == {560: expected[0], 207: expected[1]}
+    assert grid.quantities(10 ** 9) == {560: LOOT_POINTS_CAP // POINTS_PER_ITEM['Death rune'],
+                                        207: LOOT_POINTS_CAP // POINTS_PER_ITEM['Grimy ranarr weed']}
+
+
+def test_grid_says_values_are_fitted():
+    assert points_grid(TABLE)['points-per-item-fitted'] is True
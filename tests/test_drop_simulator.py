@@ -0,0 +1,58 @@
+# the pre-roll of the cox table is each unique's share of a unique, the simulator rolls it with the unique chance of
+# the points of the raid
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import CoxPoints
+import DropSimulator
+
+# shares of the uniques of the cox page, they add up to 1
+SHARES = [(20, 69), (20, 69), (4, 69), (4, 69), (4, 69), (3, 69), (3, 69), (3, 69), (2, 69), (2, 69), (2, 69),
+          (2, 69)]
+
+
+# cox_table returns a table shaped like the cox table: the uniques as pre-roll shares and two main drops
+def cox_table():
+    names = ['Unique ' + str(i) for i in range(len(SHARES))] + ['Death rune', 'Blood rune']
+    numerators = [numerator for numerator, _ in SHARES] + [1, 1]
+    denominators = [denominator for _, denominator in SHARES] + [2, 2]
+    return pd.DataFrame({
+        'name': names,
+        'id': range(len(names)),
+        'rarity': [numerator / denominator for numerator, denominator in zip(numerators, denominators)],
+        'rarity-numerator': pd.array(numerators, dtype='Int64'),
+        'rarity-denominator': pd.array(denominators, dtype='Int64'),
+        'drop-type': ['pre-roll'] * len(SHARES) + ['', ''],
+    })
+
+
+@pytest.mark.parametrize('method', ['alias', 'cdf'])
+def test_cox_pre_roll_hits_with_the_unique_chance(method):
+    unique_chance = CoxPoints.unique_chance(30000)
+    result = DropSimulator.simulate(cox_table(), 200000, method=method, seed=1, unique_chance=unique_chance)
+    counts = result.counts
+    uniques = counts['drop-type'] == 'pre-roll'
+
+    assert counts.loc[uniques, 'expected'].sum() == pytest.approx(unique_chance)
+    assert counts.loc[uniques, 'expected'].iloc[0] == pytest.approx(unique_chance * 20 / 69)
+    assert counts.loc[~uniques, 'expected'].sum() == pytest.approx(1 - unique_chance)
+    assert np.abs(counts['error']).max() < 5
+
+
+def test_pre_roll_without_a_unique_chance_is_a_chance_per_kill():
+    result = DropSimulator.simulate(cox_table(), 1000, seed=1)
+    assert result.counts['drops'].iloc[-2:].sum() == 0  # the shares add up to 1, the main drops are never rolled
+
+
+def test_cox_unique_chance_reads_the_points_grid(tmp_path):
+    table_path = tmp_path / 'chambers_challenge_mode.json'
+    with pytest.raises(FileNotFoundError):
+        DropSimulator.cox_unique_chance(str(table_path), 30000)
+
+    grid = CoxPoints.points_grid(pd.DataFrame({'name': ['Death rune'], 'id': [560]}))
+    (tmp_path / 'chambers_points.json').write_text(json.dumps(grid), encoding='utf-8')
+    assert DropSimulator.cox_unique_chance(str(table_path), 30000) == pytest.approx(CoxPoints.unique_chance(30000))
+    assert DropSimulator.cox_unique_chance(str(tmp_path / 'zulrah.json'), 30000) is None
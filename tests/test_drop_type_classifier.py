@@ -0,0 +1,57 @@
+# drop types are tried in the order the rules list them and the first match wins, always drops come before any rule,
+# and section rules match the heading of the section a drop is in
+import pandas as pd
+import pytest
+
+from DropTypeClassifier import DropTypeRules, classify_table
+
+RULES = {
+    'always': True,
+    'types': {
+        'tertiary': {'contains': ['Clue scroll'], 'equals': ['Bones'], 'section': ['[Tt]ertiary']},
+        'pre-roll': {'contains': ['Clue', 'Dragon'], 'regex': [r'^Rune \w+$'], 'section': ['[Pp]re-roll']},
+    },
+}
+
+
+# classify returns the drop type of every row of a table of names, rarities and sections
+def classify(rules, rows):
+    names, rarities, sections = zip(*rows)
+    table = pd.DataFrame({'name': list(names), 'rarity': list(rarities), 'section': list(sections)})
+    return DropTypeRules(rules).classify(table).tolist()
+
+
+def test_first_matching_type_wins():
+    assert classify(RULES, [
+        ('Clue scroll (hard)', 0.01, 'Drops'),  # matches tertiary and pre-roll, tertiary is listed first
+        ('Clue box', 0.01, 'Drops'),  # only pre-roll
+        ('Dragon bones', 0.01, 'Tertiary'),  # pre-roll by name, but tertiary by section comes first
+        ('Rune sword', 0.01, 'Drops'),
+        ('Rune platebody (g)', 0.01, 'Drops'),  # the regex is anchored
+        ('Coins', 0.01, 'Pre-roll'),
+        ('Coins', 0.01, 'Drops'),
+    ]) == ['tertiary', 'pre-roll', 'tertiary', 'pre-roll', '', 'pre-roll', '']
+
+
+def test_equals_matches_the_whole_name():
+    assert classify(RULES, [('Bones', 0.5, 'Drops'), ('Big bones', 0.5, 'Drops')]) == ['tertiary', '']
+
+
+@pytest.mark.parametrize('always, expected', [(True, 'always'), (False, 'tertiary')])
+def test_always_comes_before_every_rule(always, expected):
+    rules = dict(RULES, always=always)
+    assert classify(rules, [('Clue scroll (elite)', 1.0, 'Tertiary'), ('Coins', 1.0, 'Drops')]) == \
+        [expected, 'always' if always else '']
+
+
+def test_section_rules_need_a_section_column():
+    table = pd.DataFrame({'name': ['Coins', 'Clue scroll (hard)'], 'rarity': [0.1, 0.01]})
+    assert DropTypeRules(RULES).classify(table).tolist() == ['', 'tertiary']
+
+
+def test_classify_table_uses_the_rules_of_the_group():
+    table = pd.DataFrame({'name': ['Bones', 'Clue scroll (elite)', 'Twisted bow', 'Metamorphic dust'],
+                          'rarity': [1.0, 1 / 12, 1 / 34.5, 1 / 400]}, index=[0, 0, 1, 1])
+    classified = classify_table(table, 'cox')
+    assert classified['drop-type'].tolist() == ['', 'tertiary', 'pre-roll', 'tertiary']  # cox has no always drops
+    assert list(classified.index) == [0, 0, 1, 1]
@@ -0,0 +1,31 @@
+# every fixture page has to build with the real builder of its drop source, so the benchmark measures those builders
+import os
+
+import PipelineBenchmark
+import TableBuilder
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def test_fixtures_build(snapshot_resolver):  # run sets the resolver, the fixture puts the old one back
+    results = PipelineBenchmark.run(repeat=1, scales=[], fixtures_dir=FIXTURES)
+
+    stages = {(result['case'], result['stage']): result for result in results}
+    built = [drop_source for drop_source in PipelineBenchmark.FIXTURES
+             if os.path.exists(PipelineBenchmark.fixture_path(drop_source, FIXTURES))]
+    assert TableBuilder.cox in built and TableBuilder.tob in built
+    for drop_source in built:
+        for stage in ('build', 'parse', 'clean', 'resolve', 'classify', 'variants', 'serialize-json'):
+            assert (drop_source, stage) in stages
+        assert stages[(drop_source, 'variants')]['rows'] > 0
+
+
+def test_cox_pre_roll_is_built(snapshot_resolver):
+    with open(PipelineBenchmark.fixture_path(TableBuilder.cox, FIXTURES), encoding='utf-8') as f:
+        html = f.read()
+    table, rows, _ = PipelineBenchmark.time_build(TableBuilder.build_cox_table, TableBuilder.cox, html, 1)
+
+    assert 'Twisted bow' in set(table['name'])  # the unique pre-roll table is built, not filtered out
+    assert rows >= len(table)
+    pre_roll = table[table['drop-type'] == 'pre-roll']
+    assert abs(pre_roll['rarity'].sum() - 1) < 0.01  # each unique's share of a unique, they add up to about 1
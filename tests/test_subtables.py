@@ -0,0 +1,78 @@
+# shared sub-tables have to expand back to the rows of the table, tertiary drops stay in the table, and consumers read
+# the flat table
+import json
+import os
+from fractions import Fraction
+
+import pandas as pd
+
+import DropSimulator
+from AliasTables import table_json_with_sampling
+from SubTables import SUBTABLE_DIR, expand_table, prune_subtables, share_subtables
+from conftest import drop_table
+
+ROWS = [
+    # name, rarity, id, drop type
+    ('Rune platebody', Fraction(5, 128), 1127, None),
+    ('Coins', Fraction(20, 128), 995, None),
+    ('Nature talisman', Fraction(3, 128 * 128), 1462, None),
+    ('Loop half of key', Fraction(20, 128 * 128), 987, None),
+    ('Dragon spear', Fraction(1, 128 * 128), 1249, None),
+    ('Clue scroll (elite)', Fraction(1, 100), 12073, 'tertiary'),
+    ('Brimstone key', Fraction(1, 60), 23083, 'tertiary'),
+    ('Pet kraken', Fraction(1, 3000), 12655, 'tertiary'),
+]
+SECTIONS = ['Weapons and armour', 'Other', 'Rare drop table', 'Rare drop table', 'Rare drop table', 'Tertiary',
+            'Tertiary', 'Tertiary']
+
+
+# sorted_rows returns the rows of a table by name, to compare tables whose sub-table rows are in another order
+def sorted_rows(table):
+    return table.sort_values('name').reset_index(drop=True)[['name', 'rarity-numerator', 'rarity-denominator', 'id']]
+
+
+def test_tertiary_rows_stay_in_the_table(tmp_path):
+    shared = share_subtables(drop_table(ROWS, SECTIONS, rolls=1), str(tmp_path))
+
+    references = shared[shared['subtable'].notna()]
+    assert list(references['name']) == ['Rare drop table']
+    assert references['rarity'].iloc[0] == float(Fraction(24, 128 * 128))
+    tertiary = shared[shared['drop-type'] == 'tertiary']
+    assert list(tertiary['name']) == ['Clue scroll (elite)', 'Brimstone key', 'Pet kraken']
+    assert tertiary['subtable'].isna().all()
+
+
+def test_expand_gives_the_rows_back(tmp_path):
+    table = drop_table(ROWS, SECTIONS, rolls=1)
+    flat = expand_table(share_subtables(table, str(tmp_path)), str(tmp_path))
+
+    pd.testing.assert_frame_equal(sorted_rows(flat), sorted_rows(table), check_dtype=False)
+
+
+def test_simulator_loads_the_flat_table(tmp_path):
+    table = drop_table(ROWS, SECTIONS, rolls=1)
+    shared = share_subtables(table, str(tmp_path))
+    path = tmp_path / 'kraken.json'
+    path.write_text(table_json_with_sampling(shared, expand_table(shared, str(tmp_path))))
+
+    loaded = DropSimulator.load_table(str(path))
+    assert 'subtable' not in loaded.columns
+    pd.testing.assert_frame_equal(sorted_rows(loaded), sorted_rows(table), check_dtype=False)
+
+    sampling = json.loads(path.read_text())['sampling']['main']
+    assert [int(loaded['id'].iloc[row]) for row in sampling['rows']] == sampling['ids']  # positions in the flat table
+    assert -1 not in sampling['ids']
+
+
+def test_prune_keeps_referenced_subtables(tmp_path):
+    shared = share_subtables(drop_table(ROWS, SECTIONS, rolls=1), str(tmp_path))
+    (tmp_path / 'kraken.json').write_text(shared.to_json(orient='table'))
+    directory = tmp_path / SUBTABLE_DIR
+    (directory / '0123456789abcdef.json').write_text('{}')
+
+    assert prune_subtables(str(tmp_path)) == ['0123456789abcdef']
+    assert os.listdir(directory) == [shared['subtable'].dropna().iloc[0] + '.json']
+
+    (tmp_path / 'kraken.json').write_text(drop_table(ROWS, SECTIONS, rolls=1).to_json(orient='table'))  # rebuilt flat
+    prune_subtables(str(tmp_path))
+    assert os.listdir(directory) == []
@@ -0,0 +1,122 @@
+# a table has to read back from a bundle the way it was written, for the columns a bundle holds
+from fractions import Fraction
+
+import pandas as pd
+import pytest
+
+from TableBundle import TableBundle, read_bundle, write_bundle
+from conftest import drop_table
+
+COLUMNS = ['name', 'rarity', 'rarity-numerator', 'rarity-denominator', 'quantity-min', 'quantity-max', 'id',
+           'drop-type']
+
+
+TABLES = {
+    'zulrah': drop_table([
+        ('Tanzanite fang', Fraction(1, 1024), 12922, None),
+        ('Zulrah\'s scales', Fraction(1), 12934, 'always'),
+        ('Clue scroll (elite)', Fraction(1, 75), 12073, 'tertiary'),
+    ], quantities=[(1, 1), (100, 299), (1, 1)]),
+    'unknowns': drop_table([
+        ('Brimstone key', None, 23083, 'tertiary'),
+        ('Coins', Fraction(1, 10), 995, None),
+        ('Jar of chemicals', Fraction(1, 2000), 23064, 'pre-roll'),
+    ], quantities=[(pd.NA, pd.NA), (1000, pd.NA), (pd.NA, 1)]),
+    'non_ascii': drop_table([
+        ('Ahrim’s hood', Fraction(1, 350), 4708, None),
+        ('Pâté – ½ portion ✦', Fraction(1, 3), 1, None),
+        ('', Fraction(1, 2), 2, None),
+        ('駒', Fraction(1, 4), 3, 'tertiary'),
+    ], quantities=[(1, 1), (2, 5), (1, 1), (1, 1)]),
+    'empty': drop_table([]),
+}
+
+
+# expected returns a table the way it reads back from a bundle
+def expected(table):
+    table = table[COLUMNS].reset_index(drop=True)
+    return table.assign(**{'drop-type': table['drop-type'].fillna('')})
+
+
+@pytest.fixture
+def bundle_path(tmp_path):
+    path = str(tmp_path / 'drop_tables.bundle')
+    write_bundle(path, TABLES)
+    return path
+
+
+def test_round_trip(bundle_path):
+    tables = read_bundle(bundle_path)
+
+    assert list(tables) == list(TABLES)
+    for name, table in TABLES.items():
+        pd.testing.assert_frame_equal(tables[name], expected(table), check_dtype=False)
+        for column in ('rarity-numerator', 'rarity-denominator', 'quantity-min', 'quantity-max'):
+            assert tables[name][column].dtype == 'Int64'
+            assert list(tables[name][column].isna()) == list(table[column].isna())
+
+
+def test_empty_table(bundle_path):
+    with TableBundle(bundle_path) as bundle:
+        assert bundle.index['empty']['rows'] == 0
+        table = bundle.read('empty')
+    assert table.empty
+    assert list(table.columns) == COLUMNS
+
+
+def test_rewrite_is_atomic(bundle_path):
+    with TableBundle(bundle_path) as bundle:
+        write_bundle(bundle_path, {'zulrah': TABLES['zulrah']})
+        assert bundle.names() == list(TABLES)  # the old file is still mapped
+        assert bundle.read('non_ascii')['name'][1] == 'Pâté – ½ portion ✦'
+    assert list(read_bundle(bundle_path)) == ['zulrah']
+
+
+def test_not_a_bundle(tmp_path):
+    path = tmp_path / 'not.bundle'
+    path.write_bytes(b'{"data": []}')
+    with pytest.raises(ValueError):
+        TableBundle(str(path))
+
+
+# write_output writes the json file of a table to an output directory, under a name that can have a subdirectory
+def write_output(output_dir, name, table):
+    path = output_dir / (name + '.json')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(table.to_json(orient='table'), encoding='utf-8')
+
+
+def test_bundle_holds_every_table_in_the_output_directory(tmp_path, monkeypatch):
+    import TableBuilder
+
+    output_dir = tmp_path / 'output'
+    write_output(output_dir, 'zulrah', TABLES['zulrah'])
+    write_output(output_dir, 'monsters/goblin', TABLES['non_ascii'])
+    (output_dir / 'chambers_points.json').write_text('{"points": [0]}', encoding='utf-8')
+    write_output(output_dir, 'subtables/0123456789abcdef', TABLES['unknowns'])
+    monkeypatch.setattr(TableBuilder, 'output_dir', str(output_dir))
+
+    TableBuilder.tables_to_bundle()
+    tables = read_bundle(str(output_dir / TableBuilder.bundle_name))
+    assert sorted(tables) == ['monsters/goblin', 'zulrah']
+    pd.testing.assert_frame_equal(tables['monsters/goblin'], expected(TABLES['non_ascii']))
+
+
+def test_crawl_updates_the_bundle(tmp_path, monkeypatch):
+    import BestiaryCrawler
+    import TableBuilder
+
+    output_dir = tmp_path / 'output'
+    monkeypatch.setattr(TableBuilder, 'output_dir', str(output_dir))
+    monkeypatch.setattr(TableBuilder, 'manifest_path', str(tmp_path / 'build_manifest.json'))
+    monkeypatch.setattr(TableBuilder, '_manifest', None)
+    monkeypatch.setattr(TableBuilder, 'bundle_tables', True)
+
+    # crawl_page writes the table of a page the way a build does
+    def crawl_page(page, force=False):
+        write_output(output_dir, BestiaryCrawler.file_name(page), TABLES['zulrah'])
+        return 'built', None
+    monkeypatch.setattr(BestiaryCrawler, 'crawl_page', crawl_page)
+
+    BestiaryCrawler.crawl(['Goblin', 'Hill Giant'], str(tmp_path / 'checkpoint.json'), max_workers=2)
+    assert sorted(read_bundle(str(output_dir / TableBuilder.bundle_name))) == ['monsters/goblin', 'monsters/hill_giant']
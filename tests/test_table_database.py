@@ -0,0 +1,55 @@
+# an export only reads the json files that changed since the last export, tables and files that are not tables alike
+import json
+import os
+
+import pandas as pd
+
+import TableDatabase
+
+
+# write_files writes a table and a file that is not a table, like the cox points grid, to an output directory
+def write_files(output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    table = pd.DataFrame({'name': ['Bones', 'Coins'], 'id': [526, 995], 'rarity': [1.0, 0.5]})
+    with open(os.path.join(output_dir, 'goblin.json'), 'w', encoding='utf-8') as f:
+        f.write(table.to_json(orient='table'))
+    with open(os.path.join(output_dir, 'chambers_points.json'), 'w', encoding='utf-8') as f:
+        json.dump({'points': [0, 1000]}, f)
+
+
+# count_reads makes read_json_table record the name of every file it reads
+def count_reads(monkeypatch):
+    reads = []
+    read_json_table = TableDatabase.read_json_table
+
+    def counted(path, output_dir):
+        reads.append(os.path.basename(path))
+        return read_json_table(path, output_dir)
+    monkeypatch.setattr(TableDatabase, 'read_json_table', counted)
+    return reads
+
+
+def test_unchanged_files_are_not_read_again(tmp_path, monkeypatch):
+    output_dir = str(tmp_path / 'output')
+    write_files(output_dir)
+    connection = TableDatabase.connect(str(tmp_path / 'drop_tables.sqlite'))
+    reads = count_reads(monkeypatch)
+
+    assert TableDatabase.export(connection, output_dir) == ['goblin']
+    assert sorted(reads) == ['chambers_points.json', 'goblin.json']
+
+    reads.clear()
+    assert TableDatabase.export(connection, output_dir) == []
+    assert reads == []
+
+    grid_path = os.path.join(output_dir, 'chambers_points.json')
+    with open(grid_path, 'w', encoding='utf-8') as f:
+        json.dump({'points': [0, 1000, 2000]}, f)
+    os.utime(grid_path, ns=(0, os.stat(grid_path).st_mtime_ns + 1))
+    assert TableDatabase.export(connection, output_dir) == []
+    assert reads == ['chambers_points.json']
+
+    os.remove(grid_path)
+    TableDatabase.export(connection, output_dir)
+    assert connection.execute('SELECT COUNT(*) FROM other_files').fetchone()[0] == 0
+    assert TableDatabase.read_table(connection, 'goblin')['name'].tolist() == ['Bones', 'Coins']
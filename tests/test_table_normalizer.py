@@ -0,0 +1,77 @@
+# every rarity and quantity format found on the wiki has to parse to the exact values the simulator rolls with
+import pandas as pd
+import pytest
+
+from TableNormalizer import clean_quantity, clean_rarity, normalize_table, parse_quantity, parse_rarity
+
+
+# rarity parses one rarity cell, returns (rolls, numerator, denominator, rarity)
+def rarity(cell):
+    row = parse_rarity(clean_rarity(pd.Series([cell]))).iloc[0]
+    return row['rolls'], row['rarity-numerator'], row['rarity-denominator'], row['rarity']
+
+
+# quantity parses one quantity cell, returns (min, max)
+def quantity(cell):
+    row = parse_quantity(clean_quantity(pd.Series([cell]))).iloc[0]
+    return row['quantity-min'], row['quantity-max']
+
+
+@pytest.mark.parametrize('cell, rolls, numerator, denominator', [
+    ('1/128', 1, 1, 128),
+    ('2 × 5/128', 2, 5, 128),
+    ('3/25.6', 1, 30, 256),  # decimals are scaled away
+    ('1/34.5', 1, 10, 345),
+    ('28.99%', 1, 2899, 10000),
+    ('0.5%', 1, 5, 1000),
+    ('Always', 1, 1, 1),
+    ('1/2,000', 1, 1, 2000),
+    ('1/512[d 1]', 1, 1, 512),  # annotations
+    ('6/128; 1/20', 1, 6, 128),  # the row rarity after a ; is dropped
+    ('1/40–1/100', 1, 1, 40),  # the first rarity of an interval
+])
+def test_rarity(cell, rolls, numerator, denominator):
+    parsed_rolls, parsed_numerator, parsed_denominator, parsed_rarity = rarity(cell)
+    assert (parsed_rolls, parsed_numerator, parsed_denominator) == (rolls, numerator, denominator)
+    assert parsed_rarity == pytest.approx(numerator / denominator)
+
+
+@pytest.mark.parametrize('cell', ['Rare', 'Unknown', '', 'nan'])
+def test_unparseable_rarity_is_empty(cell):
+    rolls, numerator, denominator, parsed_rarity = rarity(cell)
+    assert rolls == 1
+    assert pd.isna(numerator) and pd.isna(denominator) and pd.isna(parsed_rarity)
+
+
+@pytest.mark.parametrize('cell, low, high', [
+    ('1', 1, 1),
+    ('25–35', 25, 35),
+    ('1,000', 1000, 1000),
+    ('15,000–20,000', 15000, 20000),
+    ('10 (noted)', 10, 10),
+    ('2–4 (noted)', 2, 4),
+    ('2,500.5', 2500, 2500),  # decimals are cut off
+])
+def test_quantity(cell, low, high):
+    assert quantity(cell) == (low, high)
+
+
+@pytest.mark.parametrize('cell', ['N/A', 'Unknown', ''])
+def test_unparseable_quantity_is_empty(cell):
+    low, high = quantity(cell)
+    assert pd.isna(low) and pd.isna(high)
+
+
+def test_normalize_table_keeps_rows_in_place():
+    # a table joined from several drop tables has a repeated index, the parsed columns go by position
+    table = pd.DataFrame({'name': ['Coins', 'Bones', 'Ashes'], 'quantity': ['1,000–2,000', '1', 'N/A'],
+                          'rarity': ['2 × 1/8', 'Always', 'Rare']}, index=[0, 1, 0])
+    normalized = normalize_table(table)
+
+    assert normalized['quantity'].tolist() == ['1000-2000', '1', 'N/A']
+    assert normalized['quantity-min'].tolist() == [1000, 1, pd.NA]
+    assert normalized['quantity-max'].tolist() == [2000, 1, pd.NA]
+    assert normalized['rolls'].tolist() == [2, 1, 1]
+    assert normalized['rarity-numerator'].dtype == 'Int64'
+    assert normalized['rarity-denominator'].tolist() == [8, 1, pd.NA]
+    assert normalized['rarity'].iloc[:2].tolist() == [0.125, 1.0]
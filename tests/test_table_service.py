@@ -0,0 +1,126 @@
+# the service answers a missing table with a 404, a page that could not be fetched with a 502 and a failed build with a
+# 500, and a failed build is not tried again until FAILURE_TTL has passed
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+import DropTableService
+import TableBuilder
+import WikiFetcher
+from DropTableService import Handler, TableStore
+from PageCache import CacheMiss
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(TableBuilder, 'output_dir', str(tmp_path / 'output'))
+    monkeypatch.setattr(TableBuilder, 'manifest_path', str(tmp_path / 'build_manifest.json'))
+    monkeypatch.setattr(TableBuilder, '_manifest', None)
+    monkeypatch.setattr(WikiFetcher, 'flush_cache', lambda: None)
+    return TableStore()
+
+
+# serve serves a store on a free port and returns the url of the server
+@pytest.fixture
+def serve(store, monkeypatch):
+    monkeypatch.setattr(Handler, 'store', store)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:' + str(server.server_port)
+    server.shutdown()
+    server.server_close()
+
+
+# failing_build returns a table_to_json that fails with an error and counts how often it was called
+def failing_build(error):
+    calls = []
+
+    def table_to_json(build, drop_source, file_name=None):
+        calls.append(drop_source)
+        raise error
+    return table_to_json, calls
+
+
+# status returns the status of a GET request
+def status(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_error_status():
+    not_found = requests.Response()
+    not_found.status_code = 404
+    unavailable = requests.Response()
+    unavailable.status_code = 503
+
+    assert DropTableService.error_status(DropTableService.TableNotFound('x')) == 404
+    assert DropTableService.error_status(CacheMiss('x')) == 404
+    assert DropTableService.error_status(requests.HTTPError('x', response=not_found)) == 404
+    assert DropTableService.error_status(requests.HTTPError('x', response=unavailable)) == 502
+    assert DropTableService.error_status(requests.ConnectionError('x')) == 502
+    assert DropTableService.error_status(KeyError('Rarity')) == 500
+
+
+@pytest.mark.parametrize('error, expected', [
+    (requests.ConnectionError('wiki is down'), 502),
+    (KeyError('Rarity'), 500),
+    (CacheMiss('not cached'), 404),
+])
+def test_get_status(serve, monkeypatch, error, expected):
+    table_to_json, _ = failing_build(error)
+    monkeypatch.setattr(TableBuilder, 'table_to_json', table_to_json)
+    assert status(serve + '/tables/Some%20monster') == expected
+
+
+def test_batch_errors_have_a_status(serve, monkeypatch):
+    table_to_json, _ = failing_build(requests.ConnectionError('wiki is down'))
+    monkeypatch.setattr(TableBuilder, 'table_to_json', table_to_json)
+    request = urllib.request.Request(serve + '/batch', json.dumps({'sources': ['Some monster']}).encode('utf-8'))
+    with urllib.request.urlopen(request) as response:
+        body = json.load(response)
+    assert body['tables'] == {}
+    assert body['errors']['Some monster']['status'] == 502
+
+
+def test_failures_are_cached(store, monkeypatch):
+    error = requests.ConnectionError('wiki is down')
+    table_to_json, calls = failing_build(error)
+    monkeypatch.setattr(TableBuilder, 'table_to_json', table_to_json)
+
+    for _ in range(3):
+        with pytest.raises(requests.ConnectionError):
+            store.get('Some monster')
+    assert calls == ['Some monster']
+    assert store.stats['errors'] == 1
+    assert store.stats['failures-cached'] == 2
+
+    monkeypatch.setattr(DropTableService, 'FAILURE_TTL', 0.0)
+    store.failures.clear()
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            store.get('Some monster')
+    assert calls == ['Some monster'] * 3
+
+
+def test_build_fetches_the_page_again(store, monkeypatch):
+    url = WikiFetcher.page_url('Some monster')
+    WikiFetcher.remember_page(url, '<html>old</html>')
+    seen = []
+
+    def table_to_json(build, drop_source, file_name=None):
+        seen.append(url in WikiFetcher._pages)
+        raise KeyError('Rarity')
+    monkeypatch.setattr(TableBuilder, 'table_to_json', table_to_json)
+
+    with pytest.raises(KeyError):
+        store.get('Some monster')
+    assert seen == [False]
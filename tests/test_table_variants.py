@@ -0,0 +1,65 @@
+# the table of a drop source with variants is its default mode, and a variant is only written if it differs from the
+# table and from every other variant
+import os
+
+import pandas as pd
+
+import PipelineBenchmark
+import TableBuilder
+from TableVariants import TAGS_COLUMN, derive_variants, tag_table
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+HARD_MODE_ONLY = {'Sanguine dust', 'Sanguine ornament kit', 'Holy ornament kit'}
+
+
+# fixture_variants builds the fixture page of a drop source with its real builder and returns its variants, the tests
+# calling it resolve ids with the snapshot_resolver fixture
+def fixture_variants(build, drop_source, group):
+    with open(PipelineBenchmark.fixture_path(drop_source, FIXTURES), encoding='utf-8') as f:
+        html = f.read()
+    table, _, _ = PipelineBenchmark.time_build(build, drop_source, html, 1)
+    return derive_variants(tag_table(table, drop_source, group), drop_source, group)
+
+
+# drop_types returns name -> drop type of the rows of a table with the given names
+def drop_types(table, names):
+    rows = table[table['name'].isin(names)]
+    return dict(zip(rows['name'], rows['drop-type'].fillna('')))
+
+
+def test_theatre_is_normal_mode(snapshot_resolver):
+    variants = fixture_variants(TableBuilder.build_non_npc_table, TableBuilder.tob, 'non_npc')
+
+    assert not HARD_MODE_ONLY & set(variants['']['name'])
+    assert set(variants['hard_mode']['name']) - set(variants['']['name']) == HARD_MODE_ONLY
+    assert drop_types(variants['hard_mode'], HARD_MODE_ONLY) == {name: 'tertiary' for name in HARD_MODE_ONLY}
+    assert 'entry_mode' not in variants  # the page has no entry mode rows, entry mode is the same as normal mode
+
+
+def test_challenge_mode_drops_are_tertiary(snapshot_resolver):
+    variants = fixture_variants(TableBuilder.build_cox_table, TableBuilder.cox, 'cox')
+    challenge_mode_only = {'Metamorphic dust', 'Twisted ancestral colour kit'}
+
+    assert not challenge_mode_only & set(variants['']['name'])
+    assert drop_types(variants['challenge_mode'], challenge_mode_only) == \
+        {name: 'tertiary' for name in challenge_mode_only}
+
+
+def test_entry_mode_from_its_section():
+    table = pd.DataFrame({
+        'name': ['Avernic defender hilt', 'Coal', 'Sanguine dust', 'Coal'],
+        'section': ['Uniques', 'Standard loot', 'Tertiary', 'Entry mode'],
+    })
+    variants = derive_variants(tag_table(table, 'theatre', 'non_npc'), 'theatre', 'non_npc')
+
+    assert list(variants) == ['', 'entry_mode', 'hard_mode']
+    assert variants['']['section'].tolist() == ['Uniques', 'Standard loot']
+    assert variants['entry_mode']['section'].tolist() == ['Uniques', 'Standard loot', 'Entry mode']
+    assert variants['hard_mode']['name'].tolist() == ['Avernic defender hilt', 'Coal', 'Sanguine dust']
+    assert all(TAGS_COLUMN not in variant.columns for variant in variants.values())
+
+
+def test_variants_equal_to_each_other_are_not_written():
+    table = pd.DataFrame({'name': ['Bones', 'Coins'], 'section': ['Drops', 'Drops']})
+    variants = derive_variants(tag_table(table, 'goblin', 'monster'), 'goblin', 'monster')
+    assert list(variants) == ['']
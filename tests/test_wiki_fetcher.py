@@ -0,0 +1,107 @@
+# a cached page is only used without a request while its version is unchanged: the time a rendered page was last
+# touched, which changes when a template it transcludes is edited, or the revision id of raw wikitext
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import WikiFetcher
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeWiki:
+    # a session answering page info queries and page requests, with an ETag for every version of a page
+
+    def __init__(self):
+        self.pages = {}  # url -> text
+        self.info = {}  # title -> {'lastrevid', 'touched'}
+        self.requests = []  # url and headers of every page request
+
+    def get(self, url, headers=None, timeout=None):
+        if url.startswith(WikiFetcher.API_URL):
+            titles = parse_qs(urlparse(url).query)['titles'][0].split('|')
+            pages = [dict(self.info[title], title=title) for title in titles]
+            return FakeResponse(200, json.dumps({'query': {'pages': pages}}))
+        self.requests.append((url, headers or {}))
+        etag = '"' + str(hash(self.pages[url])) + '"'
+        if (headers or {}).get('If-None-Match') == etag:
+            return FakeResponse(304)
+        return FakeResponse(200, self.pages[url], {'ETag': etag})
+
+
+@pytest.fixture
+def wiki(tmp_path, monkeypatch):
+    wiki = FakeWiki()
+    monkeypatch.setattr(WikiFetcher, 'settings', dict(WikiFetcher.settings, cache_dir=str(tmp_path), offline=False,
+                                                      requests_per_second=0, retries=0))
+    monkeypatch.setattr(WikiFetcher, 'get_session', lambda: wiki)
+    monkeypatch.setattr(WikiFetcher, '_cache', None)
+    monkeypatch.setattr(WikiFetcher, '_pages', type(WikiFetcher._pages)())
+    return wiki
+
+
+# fetch fetches the pages of drop sources with a fresh process memory, so only the page cache is shared
+def fetch(drop_sources, fetch_page=WikiFetcher.fetch_page):
+    WikiFetcher._pages.clear()
+    return WikiFetcher.fetch_pages(drop_sources, fetch_page)
+
+
+def test_rendered_page_is_revalidated_when_it_is_touched(wiki):
+    url = WikiFetcher.page_url('Goblin')
+    wiki.pages[url] = '<html>bones</html>'
+    wiki.info['Goblin'] = {'lastrevid': 5, 'touched': '2026-01-01T00:00:00Z'}
+
+    assert fetch(['Goblin']) == {'Goblin': '<html>bones</html>'}
+    assert len(wiki.requests) == 1
+
+    assert fetch(['Goblin']) == {'Goblin': '<html>bones</html>'}
+    assert len(wiki.requests) == 1  # same version, the cached page is used without a request
+
+    # a transcluded template is edited: the page is rendered again, with no new revision of its own
+    wiki.pages[url] = '<html>bones, rare drop table</html>'
+    wiki.info['Goblin'] = {'lastrevid': 5, 'touched': '2026-02-01T00:00:00Z'}
+    assert fetch(['Goblin']) == {'Goblin': '<html>bones, rare drop table</html>'}
+    assert len(wiki.requests) == 2
+    assert 'If-None-Match' in wiki.requests[-1][1]  # revalidated with a conditional GET
+
+    # touched again with the same html, the page is revalidated and the cached page kept
+    wiki.info['Goblin'] = {'lastrevid': 5, 'touched': '2026-03-01T00:00:00Z'}
+    assert fetch(['Goblin']) == {'Goblin': '<html>bones, rare drop table</html>'}
+    assert len(wiki.requests) == 3
+    assert fetch(['Goblin']) == {'Goblin': '<html>bones, rare drop table</html>'}
+    assert len(wiki.requests) == 3
+
+
+def test_wikitext_is_revalidated_on_a_new_revision(wiki):
+    url = WikiFetcher.wikitext_url('Goblin')
+    wiki.pages[url] = '{{DropsLine|name=Bones}}'
+    wiki.info['Goblin'] = {'lastrevid': 5, 'touched': '2026-01-01T00:00:00Z'}
+    fetch(['Goblin'], WikiFetcher.fetch_wikitext)
+
+    wiki.info['Goblin'] = {'lastrevid': 5, 'touched': '2026-02-01T00:00:00Z'}
+    fetch(['Goblin'], WikiFetcher.fetch_wikitext)
+    assert len(wiki.requests) == 1  # rendering again does not change the wikitext
+
+    wiki.pages[url] = '{{DropsLine|name=Big bones}}'
+    wiki.info['Goblin'] = {'lastrevid': 6, 'touched': '2026-02-01T00:00:00Z'}
+    assert fetch(['Goblin'], WikiFetcher.fetch_wikitext) == {'Goblin': '{{DropsLine|name=Big bones}}'}
+    assert len(wiki.requests) == 2
+
+
+def test_missing_pages_are_revalidated_one_by_one(wiki):
+    wiki.info['Nobody'] = {'missing': True}
+    assert WikiFetcher.fetch_revisions(['Nobody'], 'touched') == {}
@@ -0,0 +1,62 @@
+# the wikitext backend has to give the same tables as the html backend. Each page in fixtures has its wikitext and the
+# page the wiki renders from it, in the markup the wiki renders {{DropsTableHead}} and {{DropsLine}} to
+import os
+
+import pandas as pd
+import pytest
+
+from DropTableExtractor import extract_drop_tables
+from TableBuilder import clean_tables
+from WikitextParser import parse_drop_tables
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+PAGES = ['alchemical_hydra', 'kraken']
+
+
+# read_fixture returns the contents of a fixture file
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('page', PAGES)
+def test_same_tables_as_html(page):
+    from_wikitext = parse_drop_tables(read_fixture(page + '.wikitext'))
+    from_html = extract_drop_tables(read_fixture(page + '.html'))
+
+    assert [table['section'].iloc[0] for table in from_wikitext] == [table['section'].iloc[0] for table in from_html]
+    assert [len(table) for table in from_wikitext] == [len(table) for table in from_html]
+    for wikitext_table, html_table in zip(from_wikitext, from_html):
+        assert list(wikitext_table['Item']) == list(html_table['Item'])
+
+
+@pytest.mark.parametrize('page', PAGES)
+def test_same_cleaned_table_as_html(page):
+    from_wikitext = clean_tables(parse_drop_tables(read_fixture(page + '.wikitext')))
+    from_html = clean_tables(extract_drop_tables(read_fixture(page + '.html')))
+
+    pd.testing.assert_frame_equal(from_wikitext.reset_index(drop=True), from_html.reset_index(drop=True))
+
+
+def test_rolls_and_markup():
+    tables = parse_drop_tables(read_fixture('alchemical_hydra.wikitext'))
+    weapons = next(table for table in tables if table['section'].iloc[0] == 'Weapons and armour')
+
+    assert list(weapons['Item']) == ['Rune platebody', 'Dragon longsword', 'Battlestaff']
+    assert list(weapons['Rarity']) == ['2 × 5/128', '1/128', '4/128']
+
+
+def test_lines_before_table_head():
+    tables = parse_drop_tables(read_fixture('kraken.wikitext'))
+    other = [list(table['Item']) for table in tables if table['section'].iloc[0] == 'Other']
+
+    assert other == [['Shark', 'Seaweed'], ['Coins', 'Antidote++(4)']]
+
+
+def test_nested_templates():
+    tables = parse_drop_tables('===Main===\n{{DropsTableHead}}\n'
+                               '{{DropsLine|name=Coins|quantity=5|rarity=1/2|raritynotes={{Refn|a [[b|c]]}}}}\n'
+                               '{{DropsLine|name=[[Bones|Big bones]]|quantity=1|rarity=Always}}\n')
+
+    assert len(tables) == 1
+    assert tables[0].values.tolist() == [['Coins', '5', '1/2', 'Main'], ['Big bones', '1', 'Always', 'Main']]